@@ -0,0 +1,75 @@
+"""
+Affinity Rules - Category association rules from segment co-occurrence
+Support, confidence, lift and a strength label per ordered category pair,
+from which rule-based segments buy both categories. The mining is a pure
+function of the dataset, so it lives outside the router: the affinity router
+(precompute) and the "rules" job both run mine_dataset() on the compute pool.
+"""
+
+import numpy as np
+
+import clustering
+from snapshot import load_dataset
+
+MIN_SUPPORT_THRESHOLD = 0.20  # transparent, returned in metadata
+N_SEGMENTS = len(clustering.SEGMENT_LABELS)
+
+
+def mine(df, min_support: float = MIN_SUPPORT_THRESHOLD, top: int = 20) -> list:
+    """
+    Category association rules using segment co-occurrence analysis, highest
+    lift first, one rule per unordered category pair.
+    """
+    if "Category" not in df.columns:
+        return []
+
+    categories = df["Category"].dropna().unique().tolist()
+    n_total    = len(df)
+
+    # Segments present per category: one (category x segment) bincount.
+    codes = df["Category"].map({c: i for i, c in enumerate(categories)}).to_numpy(dtype=float)
+    known = ~np.isnan(codes)
+    seg = clustering.rule_segment_codes(df)
+    present = np.bincount(codes[known].astype(np.int64) * N_SEGMENTS + seg[known],
+                          minlength=len(categories) * N_SEGMENTS).reshape(len(categories), N_SEGMENTS) > 0
+    cat_counts = df["Category"].value_counts().to_dict()
+
+    rules = []
+    for a, cat_a in enumerate(categories):
+        for b, cat_b in enumerate(categories):
+            if a == b:
+                continue
+            shared = int((present[a] & present[b]).sum())
+            if not shared:
+                continue
+
+            support    = round(shared / 4.0, 4)
+            cnt_a      = cat_counts.get(cat_a, 1)
+            cnt_b      = cat_counts.get(cat_b, 1)
+            confidence = round(min(cnt_b / cnt_a, 1.0) * shared / 4.0 + 0.1, 4)
+            lift       = round(confidence / max(cnt_b / n_total, 0.001), 4)
+
+            if support >= min_support:
+                lift_label = "Strong" if lift >= 2.0 else ("Moderate" if lift >= 1.3 else "Weak")
+                rules.append({
+                    "antecedent":    cat_a,
+                    "consequent":    cat_b,
+                    "support":       support,
+                    "confidence":    confidence,
+                    "lift":          lift,
+                    "lift_strength": lift_label,
+                })
+
+    rules.sort(key=lambda r: r["lift"], reverse=True)
+    seen, unique = set(), []
+    for r in rules:
+        key = tuple(sorted([r["antecedent"], r["consequent"]]))
+        if key not in seen:
+            seen.add(key)
+            unique.append(r)
+    return unique[:top]
+
+
+def mine_dataset(min_support: float = MIN_SUPPORT_THRESHOLD, top: int = 20) -> list:
+    """Runs on a compute worker: mine() over the (shared) dataset."""
+    return mine(load_dataset(), min_support, top)
@@ -0,0 +1,210 @@
+"""
+Anomaly Stream - Streaming IsolationForest scoring over ingested transactions
+Each ingested batch is encoded and scored with one vectorised
+decision_function call using the trained anomaly model (anomaly_model,
+anomaly_scaler, anomaly_features). Flagged records enter a time-based sliding
+window, and a bounded min-heap tracks the top-K most anomalous records still
+inside that window.
+
+Latency budget: scoring must stay under BUDGET_MS_PER_1K milliseconds per
+1,000 rows (default 50 ms, i.e. 2x headroom at 10k rows/sec on one thread).
+Batches over budget are counted in stats()["budget_overruns"].
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+from metrics import Histogram
+from model_registry import store as model_store, ModelNotAvailable
+
+WINDOW_SECONDS    = float(os.getenv("SHOPMIND_ANOMALY_WINDOW_SECONDS", "3600"))
+WINDOW_MAX        = int(os.getenv("SHOPMIND_ANOMALY_WINDOW_MAX", "50000"))
+TOP_K             = int(os.getenv("SHOPMIND_ANOMALY_TOP_K", "100"))
+BUDGET_MS_PER_1K  = float(os.getenv("SHOPMIND_ANOMALY_BUDGET_MS_PER_1K", "50"))
+
+LATENCY_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+class AnomalyStream:
+    """Sliding window of flagged records plus a top-K heap over that window."""
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS, max_entries: int = WINDOW_MAX,
+                 top_k: int = TOP_K, budget_ms_per_1k: float = BUDGET_MS_PER_1K):
+        self.window_seconds   = window_seconds
+        self.max_entries      = max_entries
+        self.top_k            = top_k
+        self.budget_ms_per_1k = budget_ms_per_1k
+
+        self._window   = deque()     # (ts, seq, score, record), oldest first
+        self._heap     = []          # min-heap of (score, seq, ts, record), len <= top_k
+        self._in_heap  = set()       # seqs currently in _heap
+        self._seq      = itertools.count()
+        self._lock     = threading.Lock()
+
+        self.rows_scored     = 0
+        self.rows_flagged    = 0
+        self.batches         = 0
+        self.evicted         = 0
+        self.budget_overruns = 0
+        self.last_batch      = {}
+        self.latency_ms      = Histogram(LATENCY_MS_BUCKETS)
+
+    # ── Scoring ──────────────────────────────────────────────────────────────
+
+    def score(self, df, artifact: dict = None, pipeline=None):
+        """
+        Vectorised scores for a CSV-named frame. Returns (anomaly_score,
+        flagged) where anomaly_score = -decision_function (higher is more
+        anomalous) and flagged follows the model's contamination threshold.
+        """
+        models   = model_store.active()
+        artifact = artifact or models.get("anomaly")
+        pipeline = pipeline or models.pipeline()
+        enc = pipeline.transform(df)
+        X = artifact["scaler"].transform(enc.reindex(columns=artifact["features"], fill_value=0))
+        decision = artifact["model"].decision_function(X)
+        return -decision, decision < 0
+
+    def ingest(self, df, now: float = None) -> dict:
+        """Score one batch and fold its flagged records into the window and heap."""
+        models = model_store.active()
+        if not models.available("anomaly"):
+            raise ModelNotAvailable("Anomaly model not available")
+        artifact = models.get("anomaly")    # lazy loads stay outside the budget
+        pipeline = models.pipeline()
+        now = time.time() if now is None else now
+        n = len(df)
+
+        t0 = time.perf_counter()
+        scores, flagged = self.score(df, artifact, pipeline)
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        budget_ms  = self.budget_ms_per_1k * max(n, 1) / 1000.0
+
+        idx = np.flatnonzero(flagged)
+        records = df.iloc[idx].to_dict("records") if len(idx) else []
+
+        with self._lock:
+            self._evict_expired(now)
+            for i, record in zip(idx, records):
+                seq   = next(self._seq)
+                score = float(scores[i])
+                record["anomaly_score"] = round(score, 4)
+                entry = (now, seq, score, record)
+                self._window.append(entry)
+                self._push_top(entry)
+            heap_hit = False
+            while len(self._window) > self.max_entries:
+                heap_hit |= self._drop_oldest()
+            if heap_hit:
+                self._rebuild_top()
+
+            self.rows_scored  += n
+            self.rows_flagged += len(idx)
+            self.batches      += 1
+            self.budget_overruns += elapsed_ms > budget_ms
+            self.latency_ms.observe(elapsed_ms)
+            self.last_batch = {
+                "rows":       n,
+                "flagged":    int(len(idx)),
+                "scoring_ms": round(elapsed_ms, 3),
+                "budget_ms":  round(budget_ms, 3),
+                "within_budget": elapsed_ms <= budget_ms,
+            }
+            return dict(self.last_batch)
+
+    # ── Window / heap maintenance (callers hold _lock) ───────────────────────
+
+    def _push_top(self, entry) -> None:
+        ts, seq, score, record = entry
+        item = (score, seq, ts, record)
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, item)
+            self._in_heap.add(seq)
+        elif score > self._heap[0][0]:
+            dropped = heapq.heappushpop(self._heap, item)
+            self._in_heap.discard(dropped[1])
+            self._in_heap.add(seq)
+
+    def _drop_oldest(self) -> bool:
+        """Evict the oldest window entry; True if it was part of the top-K heap."""
+        _, seq, _, _ = self._window.popleft()
+        self.evicted += 1
+        return seq in self._in_heap
+
+    def _evict_expired(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        heap_hit = False
+        while self._window and self._window[0][0] < cutoff:
+            heap_hit |= self._drop_oldest()
+        if heap_hit:
+            self._rebuild_top()
+
+    def _rebuild_top(self) -> None:
+        best = heapq.nlargest(self.top_k, self._window, key=lambda e: e[2])
+        self._heap = [(score, seq, ts, record) for ts, seq, score, record in best]
+        heapq.heapify(self._heap)
+        self._in_heap = {item[1] for item in self._heap}
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+
+    def recent(self, limit: int = 50, now: float = None) -> list:
+        """Most recently flagged records, newest first."""
+        with self._lock:
+            self._evict_expired(time.time() if now is None else now)
+            tail = list(itertools.islice(reversed(self._window), max(limit, 0)))
+        return [self._view(ts, record) for ts, _, _, record in tail]
+
+    def top(self, k: int = None, now: float = None) -> list:
+        """Top-k most anomalous flagged records inside the window, highest first."""
+        with self._lock:
+            self._evict_expired(time.time() if now is None else now)
+            best = sorted(self._heap, reverse=True)[: (k or self.top_k)]
+        return [self._view(ts, record) for _, _, ts, record in best]
+
+    @staticmethod
+    def _view(ts: float, record: dict) -> dict:
+        out = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in record.items()}
+        out["ingested_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "window_seconds":   self.window_seconds,
+            "window_entries":   len(self._window),
+            "window_max":       self.max_entries,
+            "top_k":            self.top_k,
+            "rows_scored":      self.rows_scored,
+            "rows_flagged":     self.rows_flagged,
+            "batches":          self.batches,
+            "evicted":          self.evicted,
+            "budget_ms_per_1k": self.budget_ms_per_1k,
+            "budget_overruns":  self.budget_overruns,
+            "last_batch":       self.last_batch,
+            "scoring_latency_ms": self.latency_ms.snapshot(),
+        }
+
+
+stream = AnomalyStream()
+
+
+def _anomaly_families():
+    yield ("shopmind_anomaly_scoring_milliseconds", "histogram",
+           "Anomaly scoring time per ingested batch.", [({}, stream.latency_ms)])
+    yield ("shopmind_anomaly_rows_scored_total", "counter", "Ingested rows scored.",
+           [({}, stream.rows_scored)])
+    yield ("shopmind_anomaly_rows_flagged_total", "counter", "Ingested rows flagged as anomalous.",
+           [({}, stream.rows_flagged)])
+    yield ("shopmind_anomaly_window_entries", "gauge", "Flagged records in the sliding window.",
+           [({}, len(stream._window))])
+    yield ("shopmind_anomaly_budget_overruns_total", "counter", "Batches scored over the latency budget.",
+           [({}, stream.budget_overruns)])
+
+
+metrics.register_collector("anomalies", _anomaly_families)
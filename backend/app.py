@@ -5,16 +5,64 @@ FastAPI Backend Entry Point
 import os
 import json
 import datetime
-import numpy as np
-import pandas as pd
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from routers import segments, affinity, sentiment, predictions, strategy, metadata
+from fastapi.responses import PlainTextResponse, JSONResponse
+import startup
+
+# Router imports run the dataset parse and every import-time precompute.
+with startup.phase("import routers"):
+    from routers import segments, affinity, sentiment, predictions, strategy, metadata, ingest, anomalies, debug, geo, customers, distributions, reach
+    from routers import jobs as jobs_router
+from model_registry import store as model_store, ModelNotAvailable
+import model_registry
+import snapshot
+from snapshot import load_dataset, DATASET_PATH
+import metrics
+import profiling
+import attributions
+import compute
+import dataset_metrics
+import jobs
+import paging
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hot-swap watcher for new model versions written by train_models.py
+    model_store.start_watcher()
+    # Background job dispatcher (/jobs); state lives in the SQLite job table.
+    jobs.start()
+    # Lazy caches and model artifacts are filled off the request path; /ready
+    # answers 503 until they are done.
+    startup.run_warmup([
+        ("compute.warm_up", compute.warm_up),
+        ("sentiment._compute_sentiment_data", sentiment._get_sentiment),
+        ("sentiment._breakdown_index", lambda: [sentiment._breakdown_index(by) for by in sentiment.BREAKDOWNS]),
+        ("segments._compute_clusters", lambda: snapshot.aggregate("segments.clusters")),
+        ("segments._compute_projection", lambda: snapshot.aggregate("segments.projection")),
+        ("customers._build_index", lambda: snapshot.aggregate("customers.index")),
+        ("distributions._compute_baseline", lambda: snapshot.aggregate("distributions.baseline")),
+        ("reach._compute_baseline", lambda: snapshot.aggregate("reach.cube")),
+        ("dataset_metrics.compute", lambda: snapshot.aggregate("app.model_metrics")),
+        # Only the required models: the rest keep lazy per-model loading.
+        ("models.warm_up", lambda: model_store.active().warm_up(
+            None if model_registry.WARM_ALL_MODELS else model_registry.REQUIRED_MODELS)),
+        ("attributions.warm_up", lambda: attributions.warm_up(model_store.active())),
+    ])
+    yield
+    model_store.stop_watcher()
+    jobs.stop()
+    compute.shutdown()
+
 
 app = FastAPI(
     title="ShopMind Behavior Intelligence API",
     description="Production-ready shopper behavior analytics platform",
     version="3.0.0",
+    lifespan=lifespan,
+    default_response_class=profiling.TimedJSONResponse,
 )
 
 app.add_middleware(
@@ -24,6 +72,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Opt-in only: without SHOPMIND_PROFILE_TOKEN / SHOPMIND_SERVER_TIMING it is not installed.
+if profiling.ENABLED or profiling.SERVER_TIMING_ALWAYS:
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Added last so it wraps CORS too and times the full request.
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(compute.ComputeBusy)
+async def compute_busy_handler(request, exc: compute.ComputeBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(paging.PagingError)
+async def paging_error_handler(request, exc: paging.PagingError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 # ── Register Routers ──────────────────────────────────────────────────────────
 app.include_router(segments.router)
@@ -32,32 +94,25 @@ app.include_router(sentiment.router)
 app.include_router(predictions.router)
 app.include_router(strategy.router)
 app.include_router(metadata.router)
+app.include_router(ingest.router)
+app.include_router(anomalies.router)
+app.include_router(debug.router)
+app.include_router(jobs_router.router)
+app.include_router(geo.router)
+app.include_router(customers.router)
+app.include_router(distributions.router)
+app.include_router(reach.router)
 
 # ── Shared data loading (for standalone endpoints) ────────────────────────────
 _BASE = os.path.dirname(__file__)
-_CSV  = os.path.join(_BASE, "dataset", "shopping_trends.csv")
 _MODELS_DIR = os.path.join(_BASE, "final_models")
 
 try:
-    _raw_df = pd.read_csv(_CSV)
-    _raw_df.columns = [c.strip() for c in _raw_df.columns]
+    _raw_df = load_dataset()
 except Exception:
     _raw_df = None
 
 
-def _assign_segment(row):
-    disc     = row.get("Discount Applied", "No")
-    disc_flag = disc == "Yes" if isinstance(disc, str) else bool(disc)
-    prev     = float(row.get("Previous Purchases", 0) or 0)
-    rating   = float(row.get("Review Rating", 3.0) or 3.0)
-    sub      = row.get("Subscription Status", "No")
-    sub_flag = sub == "Yes" if isinstance(sub, str) else bool(sub)
-    if disc_flag and prev < 8:        return "Discount-Driven Shoppers"
-    elif sub_flag and prev > 15:      return "Loyal Frequent Buyers"
-    elif rating >= 4.2 and prev > 20: return "Premium Urgent Buyers"
-    else:                             return "Occasional Buyers"
-
-
 def _get_model_mtime(filename):
     """Get ISO timestamp of a model file's last modification."""
     path = os.path.join(_MODELS_DIR, filename)
@@ -74,11 +129,46 @@ def health_check():
     return {
         "status": "healthy",
         "version": "3.0.0",
-        "modules": ["segments", "affinity", "sentiment", "predictions", "strategy"],
+        "ready":   startup.is_ready(),
+        "modules": ["segments", "affinity", "sentiment", "predictions", "strategy", "ingest", "anomalies", "jobs", "geo", "customers", "distributions", "reach"],
     }
 
 
+@app.get("/health/startup")
+def startup_report():
+    """Per-phase startup timing and memory (dataset load, precomputes, model warm-up)."""
+    return startup.report()
+
+
+@app.get("/health/compute")
+def compute_report():
+    """Compute pool utilisation and per-operation counts / timings."""
+    return compute.stats()
+
+
+@app.get("/ready")
+def readiness():
+    """503 until every startup precompute and warm-up task has finished."""
+    if not startup.is_ready():
+        return JSONResponse(status_code=503, content={"ready": False, "pending": startup.pending()})
+    return {"ready": True}
+
+
+# ── Prometheus Metrics ────────────────────────────────────────────────────────
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Request, model, dataset, cache, batching and LLM metrics in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ── Model Metrics ─────────────────────────────────────────────────────────────
+def _dataset_metrics():
+    return compute.run_sync("model_metrics", dataset_metrics.compute_snapshot)
+
+
+snapshot.register("app.model_metrics", _dataset_metrics)
+
+
 @app.get("/model-metrics")
 def model_metrics():
     """
@@ -88,108 +178,45 @@ def model_metrics():
     if _raw_df is None:
         return {"error": "Dataset not available"}
 
-    df = _raw_df.copy()
-    df["_seg"] = df.apply(_assign_segment, axis=1)
-    spend_col = "Purchase Amount (USD)"
-    rating_col = "Review Rating"
-
-    # ── Clustering Metrics ───────────────────────────────────────────────────
-    # Silhouette score approximation using within-segment compactness
-    # (proper silhouette needs full feature matrix; we approximate via
-    #  spend and rating coefficient of variation within segments vs across)
-    features = [c for c in [spend_col, rating_col, "Previous Purchases", "Age"]
-                if c in df.columns]
-    seg_means, seg_stds, seg_ns = {}, {}, {}
-    for label in df["_seg"].unique():
-        seg = df[df["_seg"] == label]
-        seg_means[label] = seg[features].mean()
-        seg_stds[label]  = seg[features].std().fillna(0)
-        seg_ns[label]    = len(seg)
-
-    # Intra-cluster avg std (compactness proxy)
-    intra_var = np.mean([seg_stds[l].mean() for l in seg_stds])
-    # Inter-cluster spread (separation proxy)
-    means_df = pd.DataFrame(seg_means).T
-    inter_var = means_df.std().mean() if len(means_df) > 1 else 1.0
-    # Silhouette proxy: normalize separation vs compactness
-    sil_score = round(float(min(inter_var / max(intra_var + inter_var, 1e-9), 0.99)), 3)
-
-    # ── Regression Metrics (Revenue) ─────────────────────────────────────────
-    # Compute R² and MAE by predicting segment avg spend for each customer
-    if spend_col in df.columns:
-        seg_avgs = df.groupby("_seg")[spend_col].mean()
-        df["_pred_spend"] = df["_seg"].map(seg_avgs)
-        residuals = df[spend_col] - df["_pred_spend"]
-        ss_res = (residuals ** 2).sum()
-        ss_tot = ((df[spend_col] - df[spend_col].mean()) ** 2).sum()
-        r2  = round(float(1 - ss_res / max(ss_tot, 1e-9)), 3)
-        mae = round(float(residuals.abs().mean()), 2)
-    else:
-        r2, mae = 0.0, 0.0
-
-    # ── Classification Metrics (Subscription) ────────────────────────────────
-    # Accuracy: simple rule accuracy on subscription label
-    if "Subscription Status" in df.columns:
-        # Premium & Loyal segments → predict subscribed, others → not
-        df["_pred_sub"] = df["_seg"].isin(["Premium Urgent Buyers", "Loyal Frequent Buyers"])
-        df["_actual_sub"] = df["Subscription Status"].str.lower() == "yes"
-        acc = round(float((df["_pred_sub"] == df["_actual_sub"]).mean()), 3)
-        # ROC-AUC proxy: based on positive class rate agreement
-        tp = int((df["_pred_sub"] & df["_actual_sub"]).sum())
-        fp = int((df["_pred_sub"] & ~df["_actual_sub"]).sum())
-        tn = int((~df["_pred_sub"] & ~df["_actual_sub"]).sum())
-        fn = int((~df["_pred_sub"] & df["_actual_sub"]).sum())
-        tpr = tp / max(tp + fn, 1)
-        fpr = fp / max(fp + tn, 1)
-        roc_auc = round(float(0.5 + (tpr - fpr) / 2), 3)
-    else:
-        acc, roc_auc = 0.0, 0.0
-
-    # ── Dataset Stats ────────────────────────────────────────────────────────
-    seg_dist = df["_seg"].value_counts().to_dict()
-
+    with profiling.phase("dataset"):
+        computed = snapshot.aggregate("app.model_metrics")
     return {
-        "clustering": {
-            "algorithm":       "KMeans (rule-based assignment)",
-            "n_clusters":      4,
-            "silhouette_score": sil_score,
-            "silhouette_note":  "Approximation based on spend/rating/purchases/age compactness vs inter-cluster separation",
-            "segment_sizes":   seg_dist,
-        },
-        "regression": {
-            "model":   "Segment-mean revenue estimator",
-            "r2":      r2,
-            "mae_usd": mae,
-            "target":  "Purchase Amount (USD)",
-            "note":    "R² and MAE computed against segment-mean prediction baseline",
-        },
-        "classification": {
-            "model":    "Rule-based subscription classifier",
-            "accuracy": acc,
-            "roc_auc":  roc_auc,
-            "target":   "Subscription Status",
-            "note":     "Accuracy/ROC-AUC computed against binary subscription ground truth",
-        },
-        "association_rules": {
-            "algorithm":    "Segment co-occurrence analysis",
-            "min_support":  0.20,
-            "min_lift":     1.0,
-            "n_rules_found": None,  # populated by affinity router
-        },
-        "dataset": {
-            "total_rows":   int(len(df)),
-            "features_used": features,
-            "csv_file":     "shopping_trends.csv",
-        },
+        **computed,
         "model_files": {
             "kmeans":   _get_model_mtime("kmeans_model.pkl"),
             "pipeline": _get_model_mtime("preprocessing_pipeline.pkl"),
-            "advanced": _get_model_mtime("advanced_models.pkl"),
+            "advanced": _get_model_mtime(os.path.join(model_store.active().models_dir, "manifest.json")),
+            "active_version":   model_store.version,
+            "previous_version": model_store.status()["previous_version"],
         },
+        "model_registry": model_store.active().stats(),
+        "fallbacks_active": [n for n in model_registry.FALLBACKS if not model_store.active().available(n)],
         "last_evaluated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
     }
 
 
+@app.get("/model-metrics/versions")
+def model_versions():
+    """Active/previous model versions, versions on disk and recent swap events."""
+    return model_store.status()
+
+
+@app.post("/model-metrics/rollback")
+def model_rollback(x_admin_token: str = Header("")):
+    """
+    Instantly switch back to the previously active (already warm) model
+    version. Requires X-Admin-Token; 404 unless SHOPMIND_MODEL_ADMIN_TOKEN is set.
+    """
+    if not model_registry.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Model rollback is not enabled")
+    if not model_registry.admin_authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+    try:
+        return model_store.rollback()
+    except ModelNotAvailable as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @app.get("/")
 def root():
     return {"message": "ShopMind Behavior Intelligence API v3.0", "docs": "/docs"}
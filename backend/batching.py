@@ -0,0 +1,151 @@
+"""
+Micro-batching - Async request coalescing for model inference
+Concurrent single-row prediction requests are gathered for up to a short
+window (or until a batch fills), scored with one vectorised model call in the
+threadpool, and the per-row results are fanned back out to the waiting
+requests. Queue depth, batch size and queue wait are recorded per batcher.
+"""
+
+import asyncio
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from metrics import Histogram
+
+BATCHING_ENABLED = os.getenv("SHOPMIND_BATCHING", "1") != "0"
+BATCH_WINDOW_MS  = float(os.getenv("SHOPMIND_BATCH_WINDOW_MS", "2"))
+BATCH_MAX_ITEMS  = int(os.getenv("SHOPMIND_BATCH_MAX_ITEMS", "64"))
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BUCKETS    = [0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250]
+
+_batchers = {}     # name -> MicroBatcher, for /metrics
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submit() calls into batched handler(items) calls.
+
+    handler takes a list of items and must return a list of results of the
+    same length and order; it runs in the threadpool so the event loop keeps
+    accepting requests while a batch is being scored. An exception raised by
+    the handler is propagated to every request in that batch.
+    """
+
+    def __init__(self, name: str, handler, max_items: int = BATCH_MAX_ITEMS,
+                 window_ms: float = BATCH_WINDOW_MS, enabled: bool = BATCHING_ENABLED):
+        self.name      = name
+        self.handler   = handler
+        self.max_items = max(1, max_items)
+        self.window_s  = max(0.0, window_ms) / 1000.0
+        self.enabled   = enabled
+        self._queue    = None
+        self._worker   = None
+        self._loop     = None
+
+        self.reset_stats()
+        _batchers[name] = self
+
+    def reset_stats(self) -> None:
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms     = Histogram(WAIT_MS_BUCKETS)
+        self.max_depth   = 0
+        self.batches     = 0
+        self.errors      = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop   = loop
+            self._queue  = asyncio.Queue()
+            self._worker = loop.create_task(self._run(), name=f"batcher-{self.name}")
+
+    async def submit(self, item):
+        """Queue one item and wait for its result."""
+        if not self.enabled:
+            self.batch_sizes.observe(1)
+            self.wait_ms.observe(0.0)
+            self.batches += 1
+            return (await run_in_threadpool(self.handler, [item]))[0]
+
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.wait_ms.observe((started - enqueued) * 1000)
+            self.batch_sizes.observe(len(batch))
+            self.batches += 1
+
+            items = [item for item, _, _ in batch]
+            try:
+                results = await run_in_threadpool(self.handler, items)
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "enabled":         self.enabled,
+            "window_ms":       self.window_s * 1000,
+            "max_items":       self.max_items,
+            "queue_depth":     self.queue_depth,
+            "max_queue_depth": self.max_depth,
+            "batches":         self.batches,
+            "errors":          self.errors,
+            "batch_size":      self.batch_sizes.snapshot(),
+            "wait_ms":         self.wait_ms.snapshot(),
+        }
+
+
+def _batcher_families():
+    batchers = sorted(_batchers.items())
+    yield ("shopmind_batch_size", "histogram", "Items per micro-batch handler call.",
+           [({"batcher": n}, b.batch_sizes) for n, b in batchers])
+    yield ("shopmind_batch_queue_wait_milliseconds", "histogram",
+           "Time an item waited in the queue before its batch started.",
+           [({"batcher": n}, b.wait_ms) for n, b in batchers])
+    yield ("shopmind_batch_queue_depth", "gauge", "Items waiting for a batch.",
+           [({"batcher": n}, b.queue_depth) for n, b in batchers])
+    yield ("shopmind_batch_errors_total", "counter", "Batches whose handler raised.",
+           [({"batcher": n}, b.errors) for n, b in batchers])
+
+
+metrics.register_collector("batching", _batcher_families)
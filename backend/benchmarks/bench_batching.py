@@ -0,0 +1,94 @@
+"""
+Micro-batching load test - throughput of /predictions/* with and without batching.
+
+Drives the app in-process through httpx's ASGI transport with a fixed number
+of concurrent clients, once with micro-batching disabled and once enabled,
+and prints requests/sec, latency percentiles and the observed batch sizes.
+
+    python benchmarks/bench_batching.py --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app                      # noqa: E402
+from routers import predictions          # noqa: E402
+
+PAYLOADS = {
+    "/predictions/subscription": {
+        "age": 41, "purchase_amount": 72.0, "previous_purchases": 18, "review_rating": 4.1,
+        "discount_applied": 1, "promo_code_used": 0, "frequency_score": 4,
+        "category": "Clothing", "season": "Winter",
+    },
+    "/predictions/revenue": {
+        "age": 35, "previous_purchases": 12, "review_rating": 3.8, "discount_applied": 0,
+        "promo_code_used": 1, "subscription_status": 0, "frequency_score": 3,
+        "category": "Footwear", "season": "Fall", "gender": "Male", "purchase_amount": 55.0,
+    },
+    "/predictions/customer-profile": {
+        "age": 52, "gender": "Male", "category": "Outerwear", "season": "Spring",
+        "purchase_amount": 88.0, "previous_purchases": 30, "review_rating": 4.6,
+        "frequency_score": 5,
+    },
+}
+
+
+async def _drive(path: str, total: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            for _ in counter:
+                t0 = time.perf_counter()
+                r = await client.post(path, json=PAYLOADS[path])
+                latencies.append((time.perf_counter() - t0) * 1000)
+                errors += r.status_code != 200
+
+        await client.post(path, json=PAYLOADS[path])   # warm lazy model loads
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    lat = np.array(latencies)
+    return {
+        "rps":    round(total / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--paths", nargs="*", default=list(PAYLOADS))
+    args = parser.parse_args()
+
+    for path in args.paths:
+        batcher = next(b for b in predictions.BATCHERS if path.endswith(b.name))
+        results = {}
+        for enabled in (False, True):
+            batcher.enabled = enabled
+            batcher.reset_stats()
+            results[enabled] = asyncio.run(_drive(path, args.requests, args.concurrency))
+        gain = results[True]["rps"] / max(results[False]["rps"], 1e-9)
+        print(f"{path}")
+        print(f"  unbatched: {results[False]}")
+        print(f"  batched:   {results[True]}  mean batch size {batcher.batch_sizes.snapshot()['mean']}")
+        print(f"  throughput gain: {gain:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Per-worker memory vs dataset size - shared snapshot (serve.py) vs plain uvicorn.
+
+For each dataset size, starts N uvicorn workers both ways, waits for /ready,
+touches the data-heavy endpoints, and reads every worker's memory from
+/proc/<pid>/smaps_rollup:
+
+    rss_mb   resident pages, shared ones included (mapped snapshot columns
+             count in full in every worker that touched them)
+    pss_mb   proportional share: shared pages divided by the processes mapping them
+    uss_mb   private pages only - what the worker really costs
+
+Exits 1 when a snapshot worker's USS grows by more than --max-growth-mb from
+the smallest to the largest dataset, i.e. when per-worker memory scales with
+the dataset again:
+
+    python benchmarks/bench_workers.py --rows 100000 1000000 --workers 2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SOURCE_ROWS = 3900
+TOUCH = ["/segments", "/affinity", "/sentiment", "/model-metrics"]
+
+
+def _dataset_for(rows: int) -> str:
+    if rows in (0, SOURCE_ROWS):
+        return os.path.join(_BACKEND, "dataset", "shopping_trends.csv")
+    import synth
+    path = synth.default_path(rows)
+    if not os.path.exists(path):
+        print(f"generating {rows:,} rows -> {path}", file=sys.stderr)
+        synth.generate(rows, path)
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode()
+    except OSError:
+        return ""
+
+
+def _memory(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) * 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 2**20, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 2**20, 1),
+        "uss_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 2**20, 1),
+    }
+
+
+def _workers(master: int) -> list:
+    return [p for p in _children(master) if "resource_tracker" not in _cmdline(p)]
+
+
+def measure(mode: str, dataset: str, workers: int, timeout: float) -> dict:
+    port = _free_port()
+    env = dict(os.environ, SHOPMIND_DATASET=dataset)
+    env.pop("SHOPMIND_SNAPSHOT_DIR", None)
+    common = ["--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    if mode == "snapshot":
+        snap_dir = os.path.join(_BACKEND, "dataset", f"snapshot-bench-{port}")
+        cmd = [sys.executable, "serve.py", *common, "--snapshot-dir", snap_dir, "--", "--log-level", "warning"]
+    else:
+        snap_dir = None
+        cmd = [sys.executable, "-m", "uvicorn", "app:app", *common, "--log-level", "warning"]
+
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=_BACKEND, env=env, stdout=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        # Every worker must answer /ready; connections are spread over workers
+        # by the kernel, so require a run of consecutive 200s.
+        ok, deadline = 0, time.time() + timeout
+        while ok < workers * 4:
+            if proc.poll() is not None:
+                raise SystemExit(f"{mode}: server exited with code {proc.returncode}")
+            if time.time() > deadline:
+                raise SystemExit(f"{mode}: not ready within {timeout:.0f}s")
+            try:
+                ok = ok + 1 if httpx.get(f"{base}/ready", timeout=2).status_code == 200 else 0
+            except httpx.HTTPError:
+                ok = 0
+            time.sleep(0.1 if ok else 0.5)
+        ready_s = time.perf_counter() - started
+
+        for _ in range(workers * 2):
+            for path in TOUCH:
+                httpx.get(f"{base}{path}", timeout=120)
+
+        pids = _workers(proc.pid)
+        per_worker = [_memory(p) for p in pids]
+        return {
+            "workers":        len(pids),
+            "seconds_to_ready": round(ready_s, 2),
+            "per_worker":     per_worker,
+            "max_uss_mb":     max(w["uss_mb"] for w in per_worker),
+            "mean_pss_mb":    round(sum(w["pss_mb"] for w in per_worker) / len(per_worker), 1),
+            "max_rss_mb":     max(w["rss_mb"] for w in per_worker),
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if snap_dir:
+            shutil.rmtree(snap_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory vs dataset size")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", choices=["snapshot", "per-worker"],
+                        default=["snapshot", "per-worker"])
+    parser.add_argument("--max-growth-mb", type=float, default=32.0,
+                        help="allowed snapshot-worker USS growth from smallest to largest dataset")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+
+    rows = sorted(args.rows)
+    report = {"workers": args.workers, "results": {}}
+    for mode in args.modes:
+        for n in rows:
+            result = measure(mode, _dataset_for(n), args.workers, args.timeout)
+            report["results"].setdefault(mode, {})[str(n)] = result
+            print(f"{mode:<10} {n:>10,} rows  uss {result['max_uss_mb']:>7.1f} MB  "
+                  f"pss {result['mean_pss_mb']:>7.1f} MB  rss {result['max_rss_mb']:>7.1f} MB  "
+                  f"ready {result['seconds_to_ready']:.1f}s", file=sys.stderr)
+
+    failed = False
+    if "snapshot" in report["results"] and len(rows) > 1:
+        snap = report["results"]["snapshot"]
+        growth = snap[str(rows[-1])]["max_uss_mb"] - snap[str(rows[0])]["max_uss_mb"]
+        failed = growth > args.max_growth_mb
+        report["snapshot_uss_growth_mb"] = round(growth, 1)
+        report["max_growth_mb"] = args.max_growth_mb
+        report["passed"] = not failed
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(text + "\n")
+    if failed:
+        raise SystemExit(f"snapshot worker USS grew {report['snapshot_uss_growth_mb']} MB "
+                         f"(> {args.max_growth_mb} MB) from {rows[0]:,} to {rows[-1]:,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Load test - replays the frontend's call patterns against the API at a target rate.
+
+Each "flow" is one user action in the React app and issues its requests
+concurrently, exactly like the page's Promise.all:
+
+    dashboard   DashboardPage     GET /segments, /segments/projection/all, /model-metrics
+    analyzer    AnalyzerPage      POST /predictions/revenue + /predictions/subscription
+    affinity    AffinityPage      GET /affinity
+    segment     SegmentPage       GET /segments/{id}, /affinity/segment/{id}, /sentiment/segment/{id}
+    executive   ExecutiveSummary  GET /segments, /sentiment, /model-metrics, /strategy
+    insights    (LLM)             POST /predictions/customer-profile?insights=true
+
+Flows start open-loop at --rps (Poisson arrivals, so a slow server builds a
+backlog instead of slowing the test down) and are picked from --mix by weight.
+The report gives per-endpoint and per-flow p50/p95/p99 latency, throughput
+and error rate.
+
+    python benchmarks/loadtest.py --rps 50 --duration 30 --mix dashboard=1,analyzer=3,affinity=1
+    python benchmarks/loadtest.py --target uvicorn --workers 2 --rps 200
+    python benchmarks/loadtest.py --url http://staging:8000 --mix dashboard=1
+    python benchmarks/loadtest.py --stub-llm --mix insights=1 --rps 5
+
+--stub-llm starts benchmarks/stub_llm.py and points HF_API_URL at it, so
+insight endpoints are measured offline without a Hugging Face token.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+
+import stub_llm     # noqa: E402
+
+SEGMENT_IDS = ["premium", "loyal", "occasional", "discount"]
+
+REVENUE_BODY = {
+    "age": 35, "previous_purchases": 12, "review_rating": 3.8, "discount_applied": 0,
+    "promo_code_used": 1, "subscription_status": 0, "frequency_score": 3,
+    "category": "Footwear", "season": "Fall", "gender": "Male", "purchase_amount": 55.0,
+}
+SUBSCRIPTION_BODY = {
+    "age": 41, "purchase_amount": 72.0, "previous_purchases": 18, "review_rating": 4.1,
+    "discount_applied": 1, "promo_code_used": 0, "frequency_score": 4,
+    "category": "Clothing", "season": "Winter",
+}
+PROFILE_BODY = {
+    "age": 52, "gender": "Male", "category": "Outerwear", "season": "Spring",
+    "purchase_amount": 88.0, "previous_purchases": 30, "review_rating": 4.6,
+    "frequency_score": 5,
+}
+
+
+def _segment_flow():
+    seg = random.choice(SEGMENT_IDS)
+    return [("GET", f"/segments/{seg}", None, "/segments/{id}"),
+            ("GET", f"/affinity/segment/{seg}", None, "/affinity/segment/{id}"),
+            ("GET", f"/sentiment/segment/{seg}", None, "/sentiment/segment/{id}")]
+
+
+# name -> callable returning [(method, path, json_body, report_key), ...]
+FLOWS = {
+    "dashboard": lambda: [("GET", "/segments", None, "/segments"),
+                          ("GET", "/segments/projection/all", None, "/segments/projection/all"),
+                          ("GET", "/model-metrics", None, "/model-metrics")],
+    "analyzer":  lambda: [("POST", "/predictions/revenue", REVENUE_BODY, "/predictions/revenue"),
+                          ("POST", "/predictions/subscription", SUBSCRIPTION_BODY, "/predictions/subscription")],
+    "affinity":  lambda: [("GET", "/affinity", None, "/affinity")],
+    "segment":   _segment_flow,
+    "executive": lambda: [("GET", "/segments", None, "/segments"),
+                          ("GET", "/sentiment", None, "/sentiment"),
+                          ("GET", "/model-metrics", None, "/model-metrics"),
+                          ("GET", "/strategy", None, "/strategy")],
+    "insights":  lambda: [("POST", "/predictions/customer-profile?insights=true", PROFILE_BODY,
+                           "/predictions/customer-profile?insights=true")],
+}
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in filter(None, spec.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in FLOWS:
+            raise SystemExit(f"unknown flow '{name}' (choose from {', '.join(FLOWS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _summary(latencies: list, errors: int, elapsed: float) -> dict:
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    total = len(latencies)
+    return {
+        "requests":   total,
+        "errors":     errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms":     round(float(np.percentile(lat, 50)), 2),
+        "p95_ms":     round(float(np.percentile(lat, 95)), 2),
+        "p99_ms":     round(float(np.percentile(lat, 99)), 2),
+        "max_ms":     round(float(lat.max()), 2),
+    }
+
+
+# ── Driver ───────────────────────────────────────────────────────────────────
+
+async def run_load(client: httpx.AsyncClient, mix: dict, rps: float, duration: float,
+                   warmup: float = 0.0, timeout: float = 30.0) -> dict:
+    names, weights = list(mix), list(mix.values())
+    by_endpoint, by_flow = {}, {}
+    status_counts = {}
+    tasks = set()
+
+    async def call(method, path, body, key, record):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            r = await client.request(method, path, json=body, timeout=timeout)
+            status_counts[r.status_code] = status_counts.get(r.status_code, 0) + 1
+            ok = r.status_code < 400
+        except Exception as e:
+            label = type(e).__name__
+            status_counts[label] = status_counts.get(label, 0) + 1
+        elapsed = (time.perf_counter() - t0) * 1000
+        if record:
+            entry = by_endpoint.setdefault(key, [[], 0])
+            entry[0].append(elapsed)
+            entry[1] += not ok
+        return ok
+
+    async def flow(name, record):
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(call(*req, record) for req in FLOWS[name]()))
+        if record:
+            entry = by_flow.setdefault(name, [[], 0])
+            entry[0].append((time.perf_counter() - t0) * 1000)
+            entry[1] += not all(results)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from = start + warmup
+    end = measure_from + duration
+    next_at = start
+    while next_at < end:
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        name = random.choices(names, weights)[0]
+        task = asyncio.ensure_future(flow(name, loop.time() >= measure_from))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += random.expovariate(rps)
+
+    sent_window = loop.time() - measure_from
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+    elapsed = max(sent_window, 1e-9)
+
+    return {
+        "config": {"mix": mix, "target_rps": rps, "duration_s": duration, "warmup_s": warmup},
+        "flows":     {k: _summary(v[0], v[1], elapsed) for k, v in sorted(by_flow.items())},
+        "endpoints": {k: _summary(v[0], v[1], elapsed) for k, v in sorted(by_endpoint.items())},
+        "status_counts": {str(k): v for k, v in status_counts.items()},
+    }
+
+
+# ── Targets ──────────────────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_uvicorn(workers: int, env: dict) -> tuple:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=_BACKEND, env=env)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit("uvicorn did not become healthy within 120s")
+
+
+async def _main(args) -> dict:
+    mix = parse_mix(args.mix)
+    env = dict(os.environ)
+    stub = None
+    if args.stub_llm:
+        stub = stub_llm.start(latency_ms=args.llm_latency_ms)
+        env.update(HF_API_URL=stub_llm.url(stub), HF_TOKEN=env.get("HF_TOKEN") or "stub")
+        os.environ.update(HF_API_URL=env["HF_API_URL"], HF_TOKEN=env["HF_TOKEN"])
+
+    proc = None
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits)
+        target = args.url
+    elif args.target == "uvicorn":
+        proc, base = _start_uvicorn(args.workers, env)
+        client = httpx.AsyncClient(base_url=base, limits=limits)
+        target = f"uvicorn x{args.workers} ({base})"
+    else:
+        from app import app    # imported after HF_* are set so the stub is used
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://inproc")
+        target = "in-process (ASGI transport)"
+
+    try:
+        async with client:
+            report = await run_load(client, mix, args.rps, args.duration, args.warmup, args.timeout)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if stub is not None:
+            stub.shutdown()
+
+    report["config"].update(target=target, stub_llm=bool(stub))
+    return report
+
+
+def _print_table(report: dict) -> None:
+    cols = ("requests", "throughput_rps", "error_rate", "p50_ms", "p95_ms", "p99_ms")
+    for section in ("flows", "endpoints"):
+        print(f"\n{section:<48}" + "".join(f"{c:>15}" for c in cols))
+        for name, row in report[section].items():
+            print(f"{name:<48}" + "".join(f"{row[c]:>15}" for c in cols))
+    print(f"\nstatus counts: {report['status_counts']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShopMind load test")
+    parser.add_argument("--mix", default="dashboard=1,analyzer=3,affinity=1",
+                        help=f"comma-separated flow=weight from: {', '.join(FLOWS)}")
+    parser.add_argument("--rps", type=float, default=20, help="target flow starts per second")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unrecorded seconds before measuring")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--connections", type=int, default=256)
+    parser.add_argument("--target", choices=["inproc", "uvicorn"], default="inproc")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (--target uvicorn)")
+    parser.add_argument("--url", help="drive an already running server instead")
+    parser.add_argument("--stub-llm", action="store_true", help="serve LLM calls from stub_llm.py")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = asyncio.run(_main(args))
+    _print_table(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
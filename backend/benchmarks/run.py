@@ -0,0 +1,229 @@
+"""
+Benchmark suite - startup, per-router precompute, endpoint latency and memory.
+
+Each dataset size is measured in a fresh interpreter (so startup time and
+peak RSS are not polluted by earlier runs) with SHOPMIND_DATASET pointing at
+the synthetic file; missing files are generated with benchmarks/synth.py.
+The result is one JSON report with stable keys, meant to be diffed between
+releases:
+
+    python benchmarks/run.py --rows 3900 100000 1000000 --out bench-3.1.json
+    python benchmarks/run.py --compare bench-3.0.json bench-3.1.json
+
+--rows 3900 (or 0) means the original shopping_trends.csv.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND)
+
+SOURCE_ROWS = 3900
+RESULTS_DIR = os.path.join(_BACKEND, "benchmarks", "results")
+
+# (router module, function) timed again after startup; each runs at import.
+PRECOMPUTES = [
+    ("routers.segments",    "_compute_stats"),
+    ("routers.affinity",    "_compute_normalized_affinity"),
+    ("routers.affinity",    "_compute_rules"),
+    ("routers.sentiment",   "_compute_sentiment_data"),
+    ("routers.predictions", "_compute_centroids"),
+]
+
+ENDPOINTS = [
+    ("GET",  "/health", None),
+    ("GET",  "/segments", None),
+    ("GET",  "/segments/projection/all", None),
+    ("GET",  "/segments/premium", None),
+    ("GET",  "/affinity", None),
+    ("GET",  "/affinity/rules", None),
+    ("GET",  "/sentiment", None),
+    ("GET",  "/sentiment/categories", None),
+    ("GET",  "/strategy", None),
+    ("GET",  "/metadata/options", None),
+    ("GET",  "/model-metrics", None),
+    ("POST", "/predictions/revenue", {
+        "age": 35, "previous_purchases": 12, "review_rating": 3.8, "discount_applied": 0,
+        "promo_code_used": 1, "subscription_status": 0, "frequency_score": 3,
+        "category": "Footwear", "season": "Fall", "gender": "Male", "purchase_amount": 55.0,
+    }),
+    ("POST", "/predictions/subscription", {
+        "age": 41, "purchase_amount": 72.0, "previous_purchases": 18, "review_rating": 4.1,
+        "discount_applied": 1, "promo_code_used": 0, "frequency_score": 4,
+        "category": "Clothing", "season": "Winter",
+    }),
+]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentiles(samples: list) -> dict:
+    import numpy as np
+    arr = np.asarray(samples)
+    return {
+        "n":       int(arr.size),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms":  round(float(np.percentile(arr, 50)), 3),
+        "p95_ms":  round(float(np.percentile(arr, 95)), 3),
+        "max_ms":  round(float(arr.max()), 3),
+    }
+
+
+# ── Child: measures one dataset in this interpreter ──────────────────────────
+
+def measure(requests: int, precompute_repeat: int) -> dict:
+    import importlib
+
+    t0 = time.perf_counter()
+    import snapshot
+    rows = len(snapshot.load_dataset())
+    dataset_seconds = time.perf_counter() - t0
+
+    from app import app     # runs every router's import-time precompute
+    startup_seconds = time.perf_counter() - t0
+    rss_after_startup = _peak_rss_mb()
+
+    precompute = {}
+    for module, func in PRECOMPUTES:
+        fn = getattr(importlib.import_module(module), func)
+        samples = []
+        for _ in range(precompute_repeat):
+            t = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t) * 1000)
+        precompute[f"{module.split('.')[-1]}.{func}"] = _percentiles(samples)
+
+    from fastapi.testclient import TestClient
+    client = TestClient(app)
+    endpoints = {}
+    for method, path, body in ENDPOINTS:
+        client.request(method, path, json=body)      # warm caches / lazy loads
+        samples, statuses = [], set()
+        for _ in range(requests):
+            t = time.perf_counter()
+            r = client.request(method, path, json=body)
+            samples.append((time.perf_counter() - t) * 1000)
+            statuses.add(r.status_code)
+        endpoints[f"{method} {path}"] = dict(_percentiles(samples), status=sorted(statuses))
+
+    return {
+        "dataset":         snapshot.DATASET_PATH,
+        "rows":            rows,
+        "dataset_seconds": round(dataset_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "precompute":      precompute,
+        "endpoints":       endpoints,
+        "memory": {
+            "peak_rss_after_startup_mb": rss_after_startup,
+            "peak_rss_mb":               _peak_rss_mb(),
+        },
+    }
+
+
+# ── Parent: one child per dataset, merged report ─────────────────────────────
+
+def _dataset_for(rows: int) -> str:
+    if rows in (0, SOURCE_ROWS):
+        return os.path.join(_BACKEND, "dataset", "shopping_trends.csv")
+    import synth
+    path = synth.default_path(rows)
+    if not os.path.exists(path):
+        print(f"generating {rows:,} rows -> {path}", file=sys.stderr)
+        synth.generate(rows, path)
+    return path
+
+
+def _run_child(dataset: str, args) -> dict:
+    env = dict(os.environ, SHOPMIND_DATASET=dataset)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child",
+           "--requests", str(args.requests), "--precompute-repeat", str(args.precompute_repeat)]
+    proc = subprocess.run(cmd, cwd=_BACKEND, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"dataset": dataset, "error": proc.stderr.strip().splitlines()[-1:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_BACKEND,
+                              capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _flatten(node, prefix=""):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, node
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print every numeric metric present in both reports with its relative change."""
+    with open(old_path) as f:
+        old = {run["rows"]: run for run in json.load(f)["runs"] if "rows" in run}
+    with open(new_path) as f:
+        new = {run["rows"]: run for run in json.load(f)["runs"] if "rows" in run}
+    for rows in sorted(old.keys() & new.keys()):
+        print(f"\n== {rows:,} rows")
+        before = dict(_flatten(old[rows]))
+        for key, value in _flatten(new[rows]):
+            if key in before and key != "rows" and not key.endswith(".n"):
+                change = (value - before[key]) / before[key] * 100 if before[key] else 0.0
+                print(f"{key:<70} {before[key]:>12} -> {value:>12}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShopMind benchmark suite")
+    parser.add_argument("--rows", type=int, nargs="+", default=[SOURCE_ROWS, 100_000])
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per endpoint")
+    parser.add_argument("--precompute-repeat", type=int, default=3)
+    parser.add_argument("--out", help="report path (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        print(json.dumps(measure(args.requests, args.precompute_repeat)))
+        return
+
+    report = {
+        "meta": {
+            "created":  time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git":      _git_revision(),
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "cpus":     os.cpu_count(),
+            "requests_per_endpoint": args.requests,
+        },
+        "runs": [],
+    }
+    for rows in args.rows:
+        dataset = _dataset_for(rows)
+        print(f"benchmarking {dataset}", file=sys.stderr)
+        report["runs"].append(_run_child(dataset, args))
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
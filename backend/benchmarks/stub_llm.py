@@ -0,0 +1,100 @@
+"""
+Stub LLM server - offline stand-in for the Hugging Face chat-completions router.
+
+Answers POST /v1/chat/completions with a fixed OpenAI-style response after a
+configurable delay. The content is valid StrategyOutput JSON, so both
+genai_insights.py and strategy_ai.py parse it. Point the backend at it with
+HF_API_URL (and any non-empty HF_TOKEN):
+
+    python benchmarks/stub_llm.py --port 8099 --latency-ms 800
+    HF_API_URL=http://127.0.0.1:8099/v1/chat/completions HF_TOKEN=stub uvicorn app:app
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT = json.dumps({
+    "discount_strategy": "Targeted 10% bundle discount on second item",
+    "campaign_type": "Loyalty re-engagement email",
+    "margin_risk": "Low",
+    "pricing_intensity": "Light",
+    "recommended_discount_percent": 10,
+    "upsell_ideas": ["Matching accessories", "Seasonal outerwear pre-order"],
+    "churn_risk_level": "Medium",
+    "inventory_focus": "Core clothing sizes M and L",
+    "strategic_summary_for_store_owner": "Stub response generated offline for load testing.",
+})
+
+
+def _handler(latency_ms: float, jitter_ms: float, error_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+            if random.random() < error_rate:
+                status, body = 503, {"error": "stub overloaded"}
+            else:
+                status, body = 200, {
+                    "id": "stub-completion",
+                    "object": "chat.completion",
+                    "model": request.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": CONTENT},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port: int = 0, latency_ms: float = 800, jitter_ms: float = 200,
+          error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; the chat-completions URL is url(server)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(latency_ms, jitter_ms, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Hugging Face chat-completions server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"stub LLM listening on {url(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Synthetic dataset generator - scales shopping_trends.csv to N rows.
+
+Rows are bootstrapped whole from the source file, so every categorical
+column keeps its marginal distribution and its joint distribution with the
+other columns (Category x Item Purchased, Subscription x Discount x Promo,
+Location x Season, ...). Numeric columns get small jitter clipped to the
+source range and kept at the source precision, so the scaled file is not 100
+copies of 3,900 rows; their means and ranges match the source. Customer IDs
+are renumbered 1..N.
+
+Output is written in chunks, so 10M rows never sit in memory at once:
+
+    python benchmarks/synth.py --rows 100000 1000000 10000000
+    SHOPMIND_DATASET=dataset/synthetic/shopping_trends_1m.csv uvicorn app:app
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE   = os.path.join(_BACKEND, "dataset", "shopping_trends.csv")
+OUT_DIR  = os.path.join(_BACKEND, "dataset", "synthetic")
+
+CHUNK_ROWS = 500_000
+
+# column -> (jitter half-width, decimals); values are clipped to the source min/max
+JITTER = {
+    "Age":                   (2,   0),
+    "Purchase Amount (USD)": (3,   0),
+    "Review Rating":         (0.2, 1),
+    "Previous Purchases":    (2,   0),
+}
+
+
+def _label(rows: int) -> str:
+    for unit, size in (("m", 1_000_000), ("k", 1_000)):
+        if rows >= size and rows % size == 0:
+            return f"{rows // size}{unit}"
+    return str(rows)
+
+
+def default_path(rows: int) -> str:
+    return os.path.join(OUT_DIR, f"shopping_trends_{_label(rows)}.csv")
+
+
+def generate(rows: int, out_path: str = None, seed: int = 42,
+             source: str = SOURCE, chunk_rows: int = CHUNK_ROWS) -> str:
+    """Write a `rows`-row synthetic copy of `source`; returns the output path."""
+    out_path = out_path or default_path(rows)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    src = pd.read_csv(source)
+    src.columns = [c.strip() for c in src.columns]
+    bounds = {col: (src[col].min(), src[col].max()) for col in JITTER}
+    rng = np.random.default_rng(seed)
+
+    tmp_path = f"{out_path}.tmp"
+    written = 0
+    with open(tmp_path, "w", newline="") as f:
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            chunk = src.iloc[rng.integers(0, len(src), n)].reset_index(drop=True)
+            for col, (width, decimals) in JITTER.items():
+                lo, hi = bounds[col]
+                values = chunk[col].to_numpy(dtype=float) + rng.uniform(-width, width, n)
+                values = np.clip(np.round(values, decimals), lo, hi)
+                chunk[col] = values.astype(src[col].dtype) if decimals == 0 else values
+            chunk["Customer ID"] = np.arange(written + 1, written + n + 1)
+            chunk.to_csv(f, header=(written == 0), index=False)
+            written += n
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale shopping_trends.csv with synthetic rows.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--out", help="output path (only with a single --rows value)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.out and len(args.rows) > 1:
+        sys.exit("--out needs exactly one --rows value")
+
+    for rows in args.rows:
+        t0 = time.perf_counter()
+        path = generate(rows, args.out, seed=args.seed)
+        print(f"{rows:>11,} rows -> {path} ({time.perf_counter() - t0:.1f}s, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Clustering - The shipped KMeans segmentation applied to the whole dataset
+final_models/kmeans_model.pkl was fitted in dataset_processing/preprocess.ipynb
+on the output of final_models/preprocessing_pipeline.pkl (scaled numerics,
+0/1 yes/no flags, one-hot categoricals); cluster i is SEGMENT_LABELS[i].
+assign() rebuilds that 13-column input from raw CSV rows and runs
+pipeline.transform + kmeans.predict in fixed-size chunks, so memory stays
+bounded whatever the dataset size.
+
+The dataset-wide result is the snapshot's derived "Cluster" column: computed
+once by serve.py at snapshot-build time and memory-mapped by every worker,
+or computed once per process without a snapshot. The "recluster" job
+(job_kinds.py) refits the same feature space with mini-batch KMeans, and
+projection() is the 2-D PCA view of it for the segment scatter chart.
+"""
+
+import functools
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import snapshot
+from feature_pipeline import FREQ_MAP
+
+_BASE = os.path.dirname(__file__)
+KMEANS_PATH   = os.path.join(_BASE, "final_models", "kmeans_model.pkl")
+PIPELINE_PATH = os.path.join(_BASE, "final_models", "preprocessing_pipeline.pkl")
+CHUNK_ROWS    = int(os.getenv("SHOPMIND_CLUSTER_CHUNK_ROWS", "200000"))
+PROJECTION_POINTS = int(os.getenv("SHOPMIND_PROJECTION_POINTS", "2000"))
+COLUMN        = "Cluster"
+
+# Label of each KMeans cluster, as assigned in preprocess.ipynb.
+SEGMENT_LABELS = ["Premium Urgent Buyers", "Loyal Frequent Buyers", "Occasional Buyers", "Discount-Driven Shoppers"]
+YES_NO_COLUMNS = ["Subscription Status", "Discount Applied", "Promo Code Used"]
+PROFILE_COLUMNS = ["Age", "Purchase Amount (USD)", "Previous Purchases", "Review Rating", "Frequency Score"]
+
+
+@functools.lru_cache(maxsize=1)
+def load_model():
+    """(preprocessing pipeline, kmeans), or None when either pickle is missing."""
+    if not (os.path.exists(KMEANS_PATH) and os.path.exists(PIPELINE_PATH)):
+        return None
+    from sklearn.exceptions import InconsistentVersionWarning
+    with warnings.catch_warnings():
+        # Pickled with scikit-learn 1.8; the estimators are plain arrays and load fine.
+        warnings.simplefilter("ignore", InconsistentVersionWarning)
+        return joblib.load(PIPELINE_PATH), joblib.load(KMEANS_PATH)
+
+
+def model_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Raw CSV rows -> the pipeline's 13 input columns, encoded as in preprocess.ipynb."""
+    out = {
+        "Age":                   df["Age"].to_numpy(dtype=float),
+        "Purchase Amount (USD)": df["Purchase Amount (USD)"].to_numpy(dtype=float),
+        "Previous Purchases":    df["Previous Purchases"].to_numpy(dtype=float),
+        "Review Rating":         df["Review Rating"].to_numpy(dtype=float),
+        "Frequency Score":       df["Frequency of Purchases"].astype(str).str.strip().map(FREQ_MAP).fillna(3)
+                                   .to_numpy(dtype=float),
+    }
+    for col in YES_NO_COLUMNS:
+        out[col] = df[col].astype(str).str.strip().isin(("Yes", "1")).to_numpy(dtype=np.int64)
+    for col in ("Category", "Season", "Payment Method", "Shipping Type", "Gender"):
+        out[col] = df[col].astype(str).str.strip().to_numpy(dtype=object)
+    pipeline, _ = load_model()
+    return pd.DataFrame(out)[list(pipeline.feature_names_in_)]
+
+
+def features(df: pd.DataFrame) -> np.ndarray:
+    """The KMeans feature space (pipeline output) for raw rows."""
+    pipeline, _ = load_model()
+    return np.asarray(pipeline.transform(model_frame(df)), dtype=float)
+
+
+def assign(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> np.ndarray:
+    """Cluster id per row (int8; -1 for every row when the model is missing)."""
+    out = np.full(len(df), -1, dtype=np.int8)
+    model = load_model()
+    if model is None:
+        return out
+    _, kmeans = model
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        out[start:start + len(chunk)] = kmeans.predict(features(chunk))
+    return out
+
+
+snapshot.register_column(COLUMN, assign)
+
+
+def cluster_ids() -> np.ndarray:
+    """The dataset's "Cluster" column."""
+    return snapshot.column(COLUMN)
+
+
+def rule_segment_codes(df: pd.DataFrame) -> np.ndarray:
+    """The routers' rule-based segment per row, vectorised -> index into SEGMENT_LABELS."""
+    disc   = (df["Discount Applied"].astype(str) == "Yes").to_numpy()
+    sub    = (df["Subscription Status"].astype(str) == "Yes").to_numpy()
+    prev   = df["Previous Purchases"].to_numpy(dtype=float)
+    rating = df["Review Rating"].to_numpy(dtype=float)
+    return np.select(
+        [disc & (prev < 8), sub & (prev > 15), (rating >= 4.2) & (prev > 20)],
+        [3, 1, 0], default=2,
+    ).astype(np.int64)
+
+
+def summary(df: pd.DataFrame, ids: np.ndarray, labels: list = None) -> list:
+    """Per-cluster size, share and profile means (one bincount per column) for cluster ids 0..k-1."""
+    k = len(labels) if labels is not None else int(ids.max()) + 1 if len(ids) else 0
+    ids = np.asarray(ids, dtype=np.int64)
+    sizes = np.bincount(ids, minlength=k)
+    profile = {col: df[col].to_numpy(dtype=float) for col in PROFILE_COLUMNS[:4]}
+    profile["Frequency Score"] = (df["Frequency of Purchases"].astype(str).str.strip().map(FREQ_MAP).fillna(3)
+                                  .to_numpy(dtype=float))
+    means = {col: np.bincount(ids, weights=v, minlength=k) / np.maximum(sizes, 1) for col, v in profile.items()}
+    return [{
+        "cluster": c,
+        "label":   labels[c] if labels is not None else f"Cluster {c}",
+        "size":    int(sizes[c]),
+        "share":   round(int(sizes[c]) / max(len(ids), 1), 4),
+        "means":   {col: round(float(means[col][c]), 3) for col in PROFILE_COLUMNS},
+    } for c in range(k)]
+
+
+# ── 2-D projection ────────────────────────────────────────────────────────────
+
+def _stratified_quota(sizes: np.ndarray, total: int) -> np.ndarray:
+    """Points per cluster proportional to its size (largest remainder), summing to min(total, rows)."""
+    n = int(sizes.sum())
+    total = min(total, n)
+    exact = sizes * (total / max(n, 1))
+    quota = np.floor(exact).astype(np.int64)
+    short = total - int(quota.sum())
+    if short > 0:
+        quota[np.argsort(-(exact - quota), kind="stable")[:short]] += 1
+    return np.minimum(quota, sizes)
+
+
+def projection(df: pd.DataFrame, ids: np.ndarray, max_points: int = PROJECTION_POINTS,
+               chunk_rows: int = CHUNK_ROWS, seed: int = 0) -> dict:
+    """
+    PCA of the KMeans feature space to 2-D, per group in `ids` (0..k-1: KMeans
+    clusters or rule segment codes). One chunked pass accumulates the feature
+    sums, the (features x features) Gram matrix and per-group sums, so memory
+    is bounded by chunk_rows; the top two eigenvectors of the covariance are
+    then the exact principal axes. Group centroids project exactly (PCA is
+    linear); the scatter points are a per-group uniform sample proportional
+    to group size, so relative densities are kept, and each point carries the
+    number of rows it stands for.
+    """
+    pipeline, _ = load_model()
+    names = [str(f).split("__", 1)[-1] for f in pipeline.get_feature_names_out()]
+    ids = np.asarray(ids, dtype=np.int64)
+    k = max(len(SEGMENT_LABELS), int(ids.max()) + 1 if len(ids) else 0)
+    d = len(names)
+    total, gram, cluster_sums = np.zeros(d), np.zeros((d, d)), np.zeros((k, d))
+    for start in range(0, len(df), chunk_rows):
+        X = features(df.iloc[start:start + chunk_rows])
+        total += X.sum(axis=0)
+        gram += X.T @ X
+        cluster_sums += np.eye(k)[ids[start:start + len(X)]].T @ X
+
+    n = len(df)
+    mean = total / n
+    variances, vectors = np.linalg.eigh(gram / n - np.outer(mean, mean))
+    order = np.argsort(variances)[::-1][:2]
+    axes = vectors[:, order]
+    axes *= np.sign(axes[np.abs(axes).argmax(axis=0), [0, 1]])     # deterministic sign: largest loading positive
+
+    sizes = np.bincount(ids, minlength=k)
+    centroids = (cluster_sums / np.maximum(sizes, 1)[:, None] - mean) @ axes
+
+    rng = np.random.default_rng(seed)
+    quota = _stratified_quota(sizes, max_points)
+    sample = np.sort(np.concatenate([rng.choice(np.flatnonzero(ids == c), quota[c], replace=False)
+                                     for c in range(k) if quota[c] > 0]))
+    points = (features(df.iloc[sample]) - mean) @ axes if len(sample) else np.zeros((0, 2))
+    weights = sizes / np.maximum(quota, 1)
+
+    explained = np.clip(variances[order], 0, None) / max(float(np.clip(variances, 0, None).sum()), 1e-12)
+    return {
+        "features":   names,
+        "rows":       int(n),
+        "explained_variance_ratio": [float(v) for v in explained],
+        "loadings":   axes.T,                       # (2, features)
+        "sizes":      sizes,
+        "centroids":  centroids,                    # (k, 2)
+        "points":     points,                       # (sampled, 2)
+        "point_clusters": ids[sample],
+        "point_weights":  weights[ids[sample]],
+    }
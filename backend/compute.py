@@ -0,0 +1,295 @@
+"""
+Compute - Process-pool executor for CPU-heavy operations
+Routes run on Starlette's threadpool and share the GIL, so a dataset-wide
+pass (model metrics, rule mining, batch scoring) slows every cheap lookup
+served next to it. Designated operations are handed to a pool of worker
+processes instead; the calling thread (or coroutine) only waits.
+
+    SHOPMIND_COMPUTE_WORKERS   pool processes per API process (default 2;
+                               0 runs every operation inline)
+    SHOPMIND_COMPUTE_QUEUE     max operations running + waiting (default
+                               4 x workers); beyond it submit raises
+                               ComputeBusy, which routes turn into a 503
+    SHOPMIND_COMPUTE_OPS       comma-separated operations sent to the pool
+                               (default "*"); others run inline
+
+Workers are spawned (not forked: the API process has threads) on first use
+or by warm_up(). Operation functions are pickled by reference, so they must
+be module-level functions in modules that do not import the routers; a
+worker loads the dataset (memory-mapped when SHOPMIND_SNAPSHOT_DIR is set)
+and models lazily, once. With uvicorn --workers N there are N pools.
+
+Light routes (predictions, lookups) never call into the pool, so a full
+queue cannot reject them: anything they need from a pooled operation (e.g.
+global SHAP importances) is computed at warm-up and only read per request.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from metrics import Histogram
+
+logger = logging.getLogger("shopmind.compute")
+
+COMPUTE_WORKERS = max(0, int(os.getenv("SHOPMIND_COMPUTE_WORKERS", "2")))
+COMPUTE_QUEUE   = max(1, int(os.getenv("SHOPMIND_COMPUTE_QUEUE", str(max(COMPUTE_WORKERS, 1) * 4))))
+COMPUTE_OPS     = {op.strip() for op in os.getenv("SHOPMIND_COMPUTE_OPS", "*").split(",") if op.strip()}
+
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+class ComputeBusy(Exception):
+    """The compute queue is full; the caller should retry later (HTTP 503)."""
+
+    def __init__(self, op: str, depth: int):
+        super().__init__(f"Compute queue full ({depth} operations in flight); retry '{op}' later")
+        self.op = op
+        self.retry_after = 1
+
+
+class _OpStats:
+    def __init__(self):
+        self.submitted = 0
+        self.rejected  = 0
+        self.errors    = 0
+        self.offloaded = 0
+        self.seconds   = Histogram(SECONDS_BUCKETS)    # execution time
+        self.wait      = Histogram(SECONDS_BUCKETS)    # pool queue wait
+
+
+_lock          = threading.Lock()
+_executor      = None
+_in_flight     = 0          # operations accepted and not finished (pool + inline)
+_pool_flight   = 0          # of those, submitted to the pool
+_busy_seconds  = 0.0        # summed execution time on pool workers
+_started_at    = time.time()
+_ops           = {}         # op -> _OpStats
+
+
+def offloaded(op: str) -> bool:
+    return COMPUTE_WORKERS > 0 and ("*" in COMPUTE_OPS or op in COMPUTE_OPS)
+
+
+def _stats(op: str) -> _OpStats:
+    stats = _ops.get(op)
+    if stats is None:
+        stats = _ops.setdefault(op, _OpStats())
+    return stats
+
+
+# ── Pool ──────────────────────────────────────────────────────────────────────
+
+def _init_worker() -> None:
+    logging.basicConfig(level=logging.WARNING)
+
+
+def _call(fn, args: tuple, submitted_at: float) -> tuple:
+    """Runs in the worker: (result, queue wait, execution seconds)."""
+    started = time.time()
+    result = fn(*args)
+    return result, max(started - submitted_at, 0.0), time.time() - started
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+def _pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=COMPUTE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _discard_broken(executor) -> None:
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    logger.error("Compute pool broke (a worker died); a new pool is started on next use")
+
+
+def warm_up() -> None:
+    """Spawn every pool worker now rather than on the first heavy request."""
+    if COMPUTE_WORKERS == 0:
+        return
+    executor = _pool()
+    pids = {f.result() for f in [executor.submit(_noop) for _ in range(COMPUTE_WORKERS * 2)]}
+    logger.info("Compute pool ready: %d worker(s) %s", len(pids), sorted(pids))
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ── Submission ────────────────────────────────────────────────────────────────
+
+def _admit(op: str) -> _OpStats:
+    global _in_flight
+    stats = _stats(op)
+    with _lock:
+        if _in_flight >= COMPUTE_QUEUE:
+            stats.rejected += 1
+            raise ComputeBusy(op, _in_flight)
+        _in_flight += 1
+        stats.submitted += 1
+    return stats
+
+
+def _finish(pooled: bool) -> None:
+    global _in_flight, _pool_flight
+    with _lock:
+        _in_flight -= 1
+        if pooled:
+            _pool_flight -= 1
+
+
+def _submit_to_pool(stats: _OpStats, fn, args: tuple):
+    global _pool_flight
+    with _lock:
+        _pool_flight += 1
+    stats.offloaded += 1
+    executor = _pool()
+    return executor, executor.submit(_call, fn, args, time.time())
+
+
+def _record(stats: _OpStats, outcome: tuple):
+    global _busy_seconds
+    result, waited, seconds = outcome
+    stats.wait.observe(waited)
+    stats.seconds.observe(seconds)
+    with _lock:
+        _busy_seconds += seconds
+    return result
+
+
+def _run_inline(stats: _OpStats, fn, args: tuple):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        stats.seconds.observe(time.perf_counter() - started)
+
+
+def run_sync(op: str, fn, *args):
+    """Run fn(*args) as operation `op` and block until it finishes."""
+    stats = _admit(op)
+    pooled = offloaded(op)
+    try:
+        if not pooled:
+            return _run_inline(stats, fn, args)
+        executor, future = _submit_to_pool(stats, fn, args)
+        try:
+            return _record(stats, future.result())
+        except BrokenProcessPool:
+            _discard_broken(executor)
+            raise
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        _finish(pooled)
+
+
+async def run(op: str, fn, *args):
+    """Awaitable run_sync() for async routes; the event loop is never blocked."""
+    stats = _admit(op)
+    pooled = offloaded(op)
+    try:
+        if not pooled:
+            return await run_in_threadpool(_run_inline, stats, fn, args)
+        executor, future = _submit_to_pool(stats, fn, args)
+        try:
+            return _record(stats, await asyncio.wrap_future(future))
+        except BrokenProcessPool:
+            _discard_broken(executor)
+            raise
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        _finish(pooled)
+
+
+# ── Introspection ─────────────────────────────────────────────────────────────
+
+def utilisation() -> dict:
+    with _lock:
+        in_flight, pool_flight, busy = _in_flight, _pool_flight, _busy_seconds
+    running = min(pool_flight, COMPUTE_WORKERS)
+    uptime = max(time.time() - _started_at, 1e-9)
+    return {
+        "workers":          COMPUTE_WORKERS,
+        "queue_limit":      COMPUTE_QUEUE,
+        "in_flight":        in_flight,
+        "pool_running":     running,
+        "pool_waiting":     pool_flight - running,
+        "busy_now":         round(running / COMPUTE_WORKERS, 3) if COMPUTE_WORKERS else 0.0,
+        "busy_seconds":     round(busy, 3),
+        "busy_since_start": round(busy / (uptime * COMPUTE_WORKERS), 4) if COMPUTE_WORKERS else 0.0,
+    }
+
+
+def stats() -> dict:
+    return {
+        "pool": utilisation(),
+        "offloaded_ops": sorted(COMPUTE_OPS),
+        "ops": {
+            op: {
+                "submitted": s.submitted,
+                "offloaded": s.offloaded,
+                "rejected":  s.rejected,
+                "errors":    s.errors,
+                "seconds":   s.seconds.snapshot(),
+                "pool_wait_seconds": s.wait.snapshot(),
+            }
+            for op, s in sorted(_ops.items())
+        },
+    }
+
+
+def _compute_families():
+    pool = utilisation()
+    ops = sorted(_ops.items())
+    yield ("shopmind_compute_workers", "gauge", "Compute pool worker processes.",
+           [({}, pool["workers"])])
+    yield ("shopmind_compute_in_flight", "gauge", "Heavy operations running or waiting (pool and inline).",
+           [({}, pool["in_flight"])])
+    yield ("shopmind_compute_pool_waiting", "gauge", "Operations queued for a free pool worker.",
+           [({}, pool["pool_waiting"])])
+    yield ("shopmind_compute_utilisation", "gauge", "Fraction of pool workers busy right now.",
+           [({}, pool["busy_now"])])
+    yield ("shopmind_compute_busy_seconds_total", "counter",
+           "Execution seconds summed over pool workers; rate() / workers is utilisation.",
+           [({}, pool["busy_seconds"])])
+    yield ("shopmind_compute_operations_total", "counter", "Heavy operations accepted.",
+           [({"op": op}, s.submitted) for op, s in ops])
+    yield ("shopmind_compute_rejected_total", "counter", "Heavy operations refused because the queue was full.",
+           [({"op": op}, s.rejected) for op, s in ops])
+    yield ("shopmind_compute_errors_total", "counter", "Heavy operations that raised.",
+           [({"op": op}, s.errors) for op, s in ops])
+    yield ("shopmind_compute_duration_seconds", "histogram", "Execution time of heavy operations.",
+           [({"op": op}, s.seconds) for op, s in ops])
+    yield ("shopmind_compute_pool_wait_seconds", "histogram", "Time operations waited for a pool worker.",
+           [({"op": op}, s.wait) for op, s in ops])
+
+
+metrics.register_collector("compute", _compute_families)
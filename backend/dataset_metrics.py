@@ -0,0 +1,174 @@
+"""
+Dataset Metrics - The dataset-derived part of /model-metrics
+A full pass over the dataset (row-wise segment rules, per-segment moments,
+rule-based classifier scores) plus the shipped KMeans model's cluster sizes
+and silhouette (on a sample of its pipeline feature space). It depends only on the dataset, so app.py
+keeps it as a snapshot aggregate, computed on the compute pool once per
+process (or once by serve.py for all workers). This module imports no
+routers so pool workers can load it cheaply.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import clustering
+from snapshot import load_dataset, DATASET_PATH
+
+SILHOUETTE_ROWS = int(os.getenv("SHOPMIND_SILHOUETTE_ROWS", "2000"))
+
+
+def _assign_segment(row):
+    disc     = row.get("Discount Applied", "No")
+    disc_flag = disc == "Yes" if isinstance(disc, str) else bool(disc)
+    prev     = float(row.get("Previous Purchases", 0) or 0)
+    rating   = float(row.get("Review Rating", 3.0) or 3.0)
+    sub      = row.get("Subscription Status", "No")
+    sub_flag = sub == "Yes" if isinstance(sub, str) else bool(sub)
+    if disc_flag and prev < 8:        return "Discount-Driven Shoppers"
+    elif sub_flag and prev > 15:      return "Loyal Frequent Buyers"
+    elif rating >= 4.2 and prev > 20: return "Premium Urgent Buyers"
+    else:                             return "Occasional Buyers"
+
+
+def _kmeans_metrics(df: pd.DataFrame, rule_sizes: dict, rule_silhouette: float) -> dict:
+    """
+    KMeans sizes (cluster_sizes) over every row and the exact silhouette on a
+    sample, in the model's own feature space. segment_sizes stays the
+    rule-based counts, as consumers of this section expect.
+    """
+    from sklearn.metrics import silhouette_score
+    _, kmeans = clustering.load_model()
+    ids = clustering.cluster_ids()
+    if len(ids) != len(df):             # not this process's dataset
+        ids = clustering.assign(df)
+    ids = np.asarray(ids, dtype=np.int64)
+    sizes = np.bincount(ids, minlength=kmeans.n_clusters)
+    rows = np.arange(len(df))
+    if len(rows) > SILHOUETTE_ROWS:
+        rows = np.sort(np.random.default_rng(0).choice(len(df), SILHOUETTE_ROWS, replace=False))
+    sample = ids[rows]
+    X = clustering.features(df.iloc[rows])
+    sil = float(silhouette_score(X, sample)) if len(np.unique(sample)) > 1 else 0.0
+    return {
+        "algorithm":        "KMeans (final_models/kmeans_model.pkl)",
+        "n_clusters":       int(kmeans.n_clusters),
+        "silhouette_score": round(sil, 3),
+        "silhouette_note":  f"Exact silhouette on a {len(rows):,}-row sample of the {kmeans.n_features_in_}-column "
+                            "preprocessing pipeline space",
+        "inertia_per_row":  round(float(-kmeans.score(X)) / max(len(rows), 1), 4),
+        "segment_sizes":    rule_sizes,
+        "cluster_sizes":    {clustering.SEGMENT_LABELS[c]: int(n) for c, n in enumerate(sizes)},
+        "rule_based": {
+            "silhouette_proxy": rule_silhouette,
+        },
+    }
+
+
+def compute(df: pd.DataFrame) -> dict:
+    """Clustering, regression, classification and dataset sections of /model-metrics."""
+    df = df.copy()
+    df["_seg"] = df.apply(_assign_segment, axis=1)
+    spend_col = "Purchase Amount (USD)"
+    rating_col = "Review Rating"
+
+    # ── Clustering Metrics ───────────────────────────────────────────────────
+    # Silhouette score approximation using within-segment compactness
+    # (proper silhouette needs full feature matrix; we approximate via
+    #  spend and rating coefficient of variation within segments vs across)
+    features = [c for c in [spend_col, rating_col, "Previous Purchases", "Age"]
+                if c in df.columns]
+    seg_means, seg_stds, seg_ns = {}, {}, {}
+    for label in df["_seg"].unique():
+        seg = df[df["_seg"] == label]
+        seg_means[label] = seg[features].mean()
+        seg_stds[label]  = seg[features].std().fillna(0)
+        seg_ns[label]    = len(seg)
+
+    # Intra-cluster avg std (compactness proxy)
+    intra_var = np.mean([seg_stds[l].mean() for l in seg_stds])
+    # Inter-cluster spread (separation proxy)
+    means_df = pd.DataFrame(seg_means).T
+    inter_var = means_df.std().mean() if len(means_df) > 1 else 1.0
+    # Silhouette proxy: normalize separation vs compactness
+    sil_score = round(float(min(inter_var / max(intra_var + inter_var, 1e-9), 0.99)), 3)
+
+    # ── Regression Metrics (Revenue) ─────────────────────────────────────────
+    # Compute R² and MAE by predicting segment avg spend for each customer
+    if spend_col in df.columns:
+        seg_avgs = df.groupby("_seg")[spend_col].mean()
+        df["_pred_spend"] = df["_seg"].map(seg_avgs)
+        residuals = df[spend_col] - df["_pred_spend"]
+        ss_res = (residuals ** 2).sum()
+        ss_tot = ((df[spend_col] - df[spend_col].mean()) ** 2).sum()
+        r2  = round(float(1 - ss_res / max(ss_tot, 1e-9)), 3)
+        mae = round(float(residuals.abs().mean()), 2)
+    else:
+        r2, mae = 0.0, 0.0
+
+    # ── Classification Metrics (Subscription) ────────────────────────────────
+    # Accuracy: simple rule accuracy on subscription label
+    if "Subscription Status" in df.columns:
+        # Premium & Loyal segments → predict subscribed, others → not
+        df["_pred_sub"] = df["_seg"].isin(["Premium Urgent Buyers", "Loyal Frequent Buyers"])
+        df["_actual_sub"] = df["Subscription Status"].str.lower() == "yes"
+        acc = round(float((df["_pred_sub"] == df["_actual_sub"]).mean()), 3)
+        # ROC-AUC proxy: based on positive class rate agreement
+        tp = int((df["_pred_sub"] & df["_actual_sub"]).sum())
+        fp = int((df["_pred_sub"] & ~df["_actual_sub"]).sum())
+        tn = int((~df["_pred_sub"] & ~df["_actual_sub"]).sum())
+        fn = int((~df["_pred_sub"] & df["_actual_sub"]).sum())
+        tpr = tp / max(tp + fn, 1)
+        fpr = fp / max(fp + tn, 1)
+        roc_auc = round(float(0.5 + (tpr - fpr) / 2), 3)
+    else:
+        acc, roc_auc = 0.0, 0.0
+
+    # ── Dataset Stats ────────────────────────────────────────────────────────
+    seg_dist = df["_seg"].value_counts().to_dict()
+
+    if clustering.load_model() is not None and len(df):
+        clustering_metrics = _kmeans_metrics(df, seg_dist, sil_score)
+    else:
+        clustering_metrics = {
+            "algorithm":       "KMeans (rule-based assignment)",
+            "n_clusters":      4,
+            "silhouette_score": sil_score,
+            "silhouette_note":  "Approximation based on spend/rating/purchases/age compactness vs inter-cluster separation",
+            "segment_sizes":   seg_dist,
+        }
+
+    return {
+        "clustering": clustering_metrics,
+        "regression": {
+            "model":   "Segment-mean revenue estimator",
+            "r2":      r2,
+            "mae_usd": mae,
+            "target":  "Purchase Amount (USD)",
+            "note":    "R² and MAE computed against segment-mean prediction baseline",
+        },
+        "classification": {
+            "model":    "Rule-based subscription classifier",
+            "accuracy": acc,
+            "roc_auc":  roc_auc,
+            "target":   "Subscription Status",
+            "note":     "Accuracy/ROC-AUC computed against binary subscription ground truth",
+        },
+        "association_rules": {
+            "algorithm":    "Segment co-occurrence analysis",
+            "min_support":  0.20,
+            "min_lift":     1.0,
+            "n_rules_found": None,  # populated by affinity router
+        },
+        "dataset": {
+            "total_rows":   int(len(df)),
+            "features_used": features,
+            "csv_file":     os.path.basename(DATASET_PATH),
+        },
+    }
+
+
+def compute_snapshot() -> dict:
+    """compute() over this process's dataset; the compute-pool entry point."""
+    return compute(load_dataset())
@@ -0,0 +1,145 @@
+"""
+Feature Store - Cached feature-engineering stage for the training pipeline.
+
+The engineered feature matrix (Discount_Sensitivity, RFM scores, High_Value,
+CLV, one-hot encodings and the training labels) is materialised once as a
+memory-mappable .npy artifact, keyed by the SHA-256 of the raw CSV and the
+feature-code version. Re-runs with unchanged inputs load the cached matrix
+with mmap_mode="r" and skip straight to model fitting.
+
+The feature transform itself is backend/feature_pipeline.FeaturePipeline,
+fitted here on the training frame; its state (bin edges, threshold,
+vocabularies) is cached in the manifest and shipped with the models so the
+API encodes requests with exactly the same code and parameters.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feature_pipeline
+from feature_pipeline import FeaturePipeline
+
+# Bump when the semantics of engineer_features change in a way the source
+# hash would not catch (e.g. an upstream pandas behaviour change).
+FEATURE_VERSION = "2"
+
+CACHE_DIR = os.path.join("dataset", "feature_cache")
+
+
+def raw_data_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the raw CSV, streamed so large files never sit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def engineer_features(df: pd.DataFrame, pipeline: FeaturePipeline = None):
+    """
+    Turn the raw shopping-trends frame into the purely numeric matrix every
+    model in train_models.py fits on, labels included. Returns
+    (features, pipeline) where pipeline is fitted on df unless one is given.
+    """
+    pipeline = pipeline or FeaturePipeline.fit(df)
+    out = pipeline.transform(df, customer_history=True)
+    out.index = df.index
+
+    # ── Labels ───────────────────────────────────────────────────────────────
+    out["Subscription_enc"] = df["Subscription Status"].map({"Yes": 1, "No": 0})
+
+    subscription_bonus = df["Subscription Status"].map({"Yes": 0.3, "No": 0.0})
+    loyalty_multiplier = 1 + (out["RFM_Score"] / out["RFM_Score"].max())
+    out["CLV"] = (df["Purchase Amount (USD)"] * df["Previous Purchases"]
+                  * (1 + subscription_bonus) * loyalty_multiplier) * 2
+    out["CLV_log"] = np.log1p(out["CLV"])
+
+    low_freq = df["Frequency of Purchases"].isin(["Quarterly", "Annually"])
+    low_rfm = out["RFM_Score"] <= out["RFM_Score"].quantile(0.30)
+    no_sub = df["Subscription Status"] == "No"
+    low_rating = df["Review Rating"] <= 3
+    no_promo = df["Promo Code Used"] == "No"
+    out["Churn"] = ((low_freq & low_rfm) | (no_sub & low_rating & no_promo)).astype(int)
+
+    out["Sentiment_Label"] = pd.cut(
+        df["Review Rating"], bins=[0, 2.9, 3.9, 5], labels=[0, 1, 2]
+    ).astype(int)
+
+    one_hot = pipeline.one_hot_columns()
+    out = out[[c for c in out.columns if c not in one_hot] + one_hot]
+    return out.astype(np.float64), pipeline
+
+
+def feature_code_version() -> str:
+    """FEATURE_VERSION plus a hash of the engineering code itself."""
+    source = inspect.getsource(engineer_features) + inspect.getsource(feature_pipeline)
+    return f"v{FEATURE_VERSION}-{hashlib.sha256(source.encode()).hexdigest()[:8]}"
+
+
+def _cache_path(data_hash: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{feature_code_version()}-{data_hash[:16]}")
+
+
+def load_features(data_path: str, cache_dir: str = CACHE_DIR, rebuild: bool = False):
+    """
+    Return (features_df, info) for the CSV at data_path; info["pipeline"] is
+    the fitted FeaturePipeline state the features were built with.
+
+    On a cache hit the frame is backed by a read-only memory map of the cached
+    matrix; on a miss the features are engineered, written atomically and then
+    served from the freshly written file so both paths behave identically.
+    """
+    t0 = time.perf_counter()
+    data_hash = raw_data_hash(data_path)
+    path = _cache_path(data_hash, cache_dir)
+    matrix_path = os.path.join(path, "features.npy")
+    manifest_path = os.path.join(path, "manifest.json")
+
+    hit = not rebuild and os.path.exists(matrix_path) and os.path.exists(manifest_path)
+    if not hit:
+        df = pd.read_csv(data_path)
+        df = df.drop_duplicates().dropna()
+        features, pipeline = engineer_features(df)
+
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "features.npy"),
+                np.ascontiguousarray(features.to_numpy(dtype=np.float64)))
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump({
+                "columns":         list(features.columns),
+                "shape":           list(features.shape),
+                "raw_sha256":      data_hash,
+                "feature_version": feature_code_version(),
+                "source":          os.path.abspath(data_path),
+                "built_at":        time.strftime("%Y-%m-%d %H:%M:%S"),
+                "pipeline":        pipeline.state,
+            }, f, indent=2)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    matrix = np.load(matrix_path, mmap_mode="r")
+    features = pd.DataFrame(matrix, columns=manifest["columns"], copy=False)
+
+    info = {
+        "cache_hit":  hit,
+        "path":       path,
+        "shape":      tuple(matrix.shape),
+        "seconds":    round(time.perf_counter() - t0, 3),
+        "raw_sha256": data_hash,
+        "pipeline":   manifest["pipeline"],
+    }
+    return features, info
@@ -1,19 +1,25 @@
-import pandas as pd
+import argparse
+import json
 import numpy as np
 import joblib
 import os
+import time
 import warnings
 
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import IsolationForest
 from xgboost import XGBClassifier, XGBRegressor
 
+from feature_store import load_features
+
 warnings.filterwarnings("ignore")
 
 
-def train_models():
+def train_models(rebuild_features=False):
     """
-    A script to train all advanced models and bundle them into a single artifact.
+    A script to train all advanced models and save each one as its own artifact.
+    Feature engineering is served from the feature store cache when the raw CSV
+    and feature code are unchanged (see feature_store.py).
     """
     DATA_PATH = "dataset/shopping_trends.csv"
     MODEL_DIR = "final_models"
@@ -21,40 +27,15 @@ def train_models():
 
     print("--- Starting Model Training Pipeline ---")
 
-    df = pd.read_csv(DATA_PATH)
-    df = df.drop_duplicates().dropna()
-    print(f"Data loaded. Shape: {df.shape}")
-
-
-    print("Step 1: Performing Feature Engineering...")
+    print("Step 1: Loading engineered features...")
 
-    df["Discount_Flag"] = df["Discount Applied"].map({"Yes": 1, "No": 0})
-    df["Discount_Sensitivity"] = df.groupby("Customer ID")["Discount_Flag"].transform("mean")
-
-    df["F_score"] = pd.qcut(df["Previous Purchases"], 5,
-                            labels=[1, 2, 3, 4, 5],
-                            duplicates="drop").astype(int)
-
-    df["M_score"] = pd.qcut(df["Purchase Amount (USD)"], 5,
-                            labels=[1, 2, 3, 4, 5],
-                            duplicates="drop").astype(int)
-
-    freq_map = {
-        "Weekly": 5, "Bi-Weekly": 4, "Fortnightly": 4, "Monthly": 3,
-        "Quarterly": 2, "Annually": 1, "Every 3 Months": 2
-    }
-
-    df["R_score"] = df["Frequency of Purchases"].str.strip().map(freq_map).fillna(1).astype(int)
-    df["RFM_Score"] = df["R_score"] + df["F_score"] + df["M_score"]
-
-    threshold = df["Purchase Amount (USD)"].quantile(0.75)
-    df["High_Value"] = (df["Purchase Amount (USD)"] > threshold).astype(int)
+    df, info = load_features(DATA_PATH, rebuild=rebuild_features)
+    state = "cache hit" if info["cache_hit"] else "built"
+    print(f"Features {state} in {info['seconds']}s. Shape: {df.shape} ({info['path']})")
 
 
     print("Step 2: Training Subscription Model...")
 
-    df["Subscription_enc"] = df["Subscription Status"].map({"Yes": 1, "No": 0})
-
     sub_features = [
         "Age", "Purchase Amount (USD)", "Review Rating",
         "Previous Purchases", "High_Value",
@@ -99,35 +80,20 @@ def train_models():
 
     print("Step 4: Training CLV Model...")
 
-    subscription_bonus = df["Subscription Status"].map({"Yes": 0.3, "No": 0.0})
-    loyalty_multiplier = 1 + (df["RFM_Score"] / df["RFM_Score"].max())
-    df["CLV"] = (df["Purchase Amount (USD)"] * df["Previous Purchases"] * (1 + subscription_bonus) * loyalty_multiplier) * 2
-    df["CLV_log"] = np.log1p(df["CLV"])
-
-    df_encoded = pd.get_dummies(df, columns=["Gender", "Category", "Season"], drop_first=True)
-
     adv_features = [
         "Age", "Previous Purchases", "Discount_Sensitivity", "RFM_Score"
-    ] + [col for col in df_encoded.columns if col.startswith(("Gender_", "Category_", "Season_"))]
+    ] + [col for col in df.columns if col.startswith(("Gender_", "Category_", "Season_"))]
 
     scaler_adv = StandardScaler()
-    X_adv_scaled = scaler_adv.fit_transform(df_encoded[adv_features])
+    X_adv_scaled = scaler_adv.fit_transform(df[adv_features])
 
     clv_model = XGBRegressor(
         n_estimators=300, max_depth=4, learning_rate=0.05, random_state=42
     )
-    clv_model.fit(X_adv_scaled, df_encoded["CLV_log"])
+    clv_model.fit(X_adv_scaled, df["CLV_log"])
 
     print("Step 5: Training Churn Model...")
 
-    low_freq = df["Frequency of Purchases"].isin(["Quarterly", "Annually"])
-    low_rfm = df["RFM_Score"] <= df["RFM_Score"].quantile(0.30)
-    no_sub = df["Subscription Status"] == "No"
-    low_rating = df["Review Rating"] <= 3
-    no_promo = df["Promo Code Used"] == "No"
-    df["Churn"] = ((low_freq & low_rfm) | (no_sub & low_rating & no_promo)).astype(int)
-
-
     predicted_clv = clv_model.predict(X_adv_scaled)
     X_churn_features = np.c_[X_adv_scaled, predicted_clv]
 
@@ -143,10 +109,6 @@ def train_models():
     
     print("Step 6: Training Sentiment Model...")
 
-    df["Sentiment_Label"] = pd.cut(
-        df["Review Rating"], bins=[0, 2.9, 3.9, 5], labels=[0, 1, 2]
-    ).astype(int)
-
     sent_model = XGBClassifier(
         n_estimators=200, max_depth=4, learning_rate=0.05,
         random_state=42, eval_metric="mlogloss", use_label_encoder=False
@@ -155,31 +117,67 @@ def train_models():
     sent_model.fit(X_adv_scaled, df["Sentiment_Label"])
 
    
-    print("Step 7: Bundling and saving all models...")
-
-    model_bundle = {
-        "subscription_model": sub_model,
-        "subscription_scaler": scaler_sub,
-        "subscription_features": sub_features,
+    print("Step 7: Saving one artifact per model...")
+
+    artifacts = {
+        "subscription": {
+            "model": sub_model,
+            "scaler": scaler_sub,
+            "features": sub_features,
+        },
+        "anomaly": {
+            "model": iso_model,
+            "scaler": scaler_anom,
+            "features": anomaly_features,
+        },
+        "advanced": {
+            "scaler": scaler_adv,
+            "features": adv_features,
+            "churn_features_ordered": churn_features_ordered,
+        },
+        "clv": {"model": clv_model},
+        "churn": {"model": churn_model, "features": churn_features_ordered},
+        "sentiment": {"model": sent_model},
+        # Bin edges / threshold / vocabularies the API must encode requests with.
+        "features": info["pipeline"],
+    }
 
-        "anomaly_model": iso_model,
-        "anomaly_scaler": scaler_anom,
-        "anomaly_features": anomaly_features,
+    # Each run becomes a new version directory; the API hot-swaps to it once
+    # versions/CURRENT is repointed. Uncompressed dumps so the API can
+    # joblib.load(..., mmap_mode="r") them.
+    versions_dir = os.path.join(MODEL_DIR, "versions")
+    version = time.strftime("%Y%m%d-%H%M%S")
+    staging_dir = os.path.join(versions_dir, f".{version}.tmp")
+    os.makedirs(staging_dir, exist_ok=True)
+
+    manifest = {
+        "version": version,
+        "feature_cache": info["path"],
+        "raw_sha256": info["raw_sha256"],
+        "artifacts": {},
+    }
+    for name, artifact in artifacts.items():
+        path = os.path.join(staging_dir, f"{name}.joblib")
+        joblib.dump(artifact, path)
+        manifest["artifacts"][name] = {"file": f"{name}.joblib", "bytes": os.path.getsize(path)}
 
-        "clv_model": clv_model,
-        "churn_model": churn_model,
-        "sentiment_model": sent_model,
+    with open(os.path.join(staging_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
 
-        "advanced_scaler": scaler_adv,
-        "advanced_features": adv_features,
-        "churn_features_ordered": churn_features_ordered
-    }
+    version_dir = os.path.join(versions_dir, version)
+    os.replace(staging_dir, version_dir)
 
-    save_path = os.path.join(MODEL_DIR, "advanced_models.pkl")
-    joblib.dump(model_bundle, save_path)
-    print(f"All models bundled and saved successfully to '{save_path}'")
+    pointer_tmp = os.path.join(versions_dir, ".CURRENT.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(versions_dir, "CURRENT"))
+    print(f"Saved {len(artifacts)} model artifacts as version '{version}' in '{version_dir}'")
 
 
 if __name__ == "__main__":
-    
-    train_models()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train and save the advanced models.")
+    parser.add_argument("--rebuild-features", action="store_true",
+                        help="ignore the cached feature matrix and re-engineer it from the raw CSV")
+    args = parser.parse_args()
+
+    train_models(rebuild_features=args.rebuild_features)
\ No newline at end of file
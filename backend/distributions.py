@@ -0,0 +1,242 @@
+"""
+Distributions - Mergeable quantile sketches for spend, rating and purchases
+A KLL sketch keeps a stack of compactors: level h holds items of weight 2^h,
+and a level over its capacity (k * (2/3)^depth) is sorted and every other
+item (random offset) promoted to the next level. Memory stays ~3k items
+whatever the row count, the normalised rank error is ~2.3/k^0.97 (~1.3% at
+the default k=200), and two sketches merge by concatenating their levels and
+compacting, so chunk and worker sketches combine into one.
+
+SKETCHED columns are sketched per rule-based segment, per category and
+overall. The dataset baseline is built chunk by chunk on the compute pool
+and merged (one snapshot aggregate); batches posted to /ingest/transactions
+update a separate live set, and queries merge the two.
+"""
+
+import copy
+import os
+import threading
+
+import numpy as np
+
+import clustering
+import compute
+import snapshot
+from snapshot import load_dataset
+
+SKETCH_K   = int(os.getenv("SHOPMIND_SKETCH_K", "200"))
+CHUNK_ROWS = int(os.getenv("SHOPMIND_SKETCH_CHUNK_ROWS", "200000"))
+
+SKETCHED  = {"spend": "Purchase Amount (USD)", "rating": "Review Rating", "previous_purchases": "Previous Purchases"}
+GROUPINGS = ("overall", "segment", "category")
+
+
+class KLLSketch:
+    """KLL quantile sketch over floats; update() takes whole arrays."""
+
+    def __init__(self, k: int = SKETCH_K, seed: int = 0):
+        self.k      = k
+        self.levels = [np.empty(0)]
+        self.n      = 0
+        self.min    = np.inf
+        self.max    = -np.inf
+        self._rng   = np.random.default_rng(seed)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(int(np.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) <= self._capacity(h):
+                h += 1
+                continue
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            keep = items[:len(items) % 2]                  # an odd item stays at this level
+            items = items[len(keep):]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[self._rng.integers(2)::2]])
+            self.levels[h] = keep
+            h = 0                                           # capacities shrink as the stack grows
+
+    def update(self, values) -> "KLLSketch":
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold `other` into this sketch (other is unchanged)."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self) -> tuple:
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantiles(self, qs) -> list:
+        """Estimated values at the given ranks (0..1); q=0 and q=1 are the exact min and max."""
+        if self.n == 0:
+            return [None] * len(qs)
+        items, weights = self._weighted()
+        cum = np.cumsum(weights)
+        out = []
+        for q in qs:
+            if q <= 0:
+                out.append(self.min)
+            elif q >= 1:
+                out.append(self.max)
+            else:
+                out.append(float(items[min(np.searchsorted(cum, q * cum[-1]), len(items) - 1)]))
+        return out
+
+    def histogram(self, bins: int) -> tuple:
+        """(edges, estimated counts) over [min, max] in equal-width bins."""
+        if self.n == 0:
+            return [], []
+        items, weights = self._weighted()
+        counts, edges = np.histogram(items, bins=bins, range=(self.min, max(self.max, self.min + 1e-9)),
+                                     weights=weights)
+        return edges, counts * (self.n / max(counts.sum(), 1))
+
+    @property
+    def size(self) -> int:
+        return sum(len(level) for level in self.levels)
+
+    @staticmethod
+    def rank_error(k: int = SKETCH_K) -> float:
+        """Approximate normalised rank error of one quantile at 99% confidence (KLL empirical fit)."""
+        return 2.296 / k ** 0.9723
+
+
+class SketchSet:
+    """One KLLSketch per (grouping, key, metric)."""
+
+    def __init__(self, k: int = SKETCH_K):
+        self.k = k
+        self.sketches = {}      # (grouping, key) -> {metric: KLLSketch}
+        self.rows = 0
+
+    def _group(self, by: str, key: str) -> dict:
+        group = self.sketches.get((by, key))
+        if group is None:
+            group = self.sketches[(by, key)] = {m: KLLSketch(self.k, seed=len(self.sketches)) for m in SKETCHED}
+        return group
+
+    def update_frame(self, df) -> "SketchSet":
+        """Fold a CSV-named frame into the sketches: one sorted slice per group, no per-row work."""
+        values = {m: df[col].to_numpy(dtype=float) for m, col in SKETCHED.items() if col in df.columns}
+        groupings = [("overall", np.zeros(len(df), dtype=np.int64), ["overall"])]
+        if {"Discount Applied", "Subscription Status"} <= set(df.columns):
+            groupings.append(("segment", clustering.rule_segment_codes(df), clustering.SEGMENT_LABELS))
+        if "Category" in df.columns:
+            codes, keys = np.unique(df["Category"].astype(str).to_numpy(), return_inverse=True)
+            groupings.append(("category", keys.astype(np.int64), [str(c) for c in codes]))
+        for by, codes, keys in groupings:
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+            for g, key in enumerate(keys):
+                rows = order[bounds[g]:bounds[g + 1]]
+                if len(rows):
+                    group = self._group(by, key)
+                    for m, v in values.items():
+                        group[m].update(v[rows])
+        self.rows += len(df)
+        return self
+
+    def merge(self, other: "SketchSet") -> "SketchSet":
+        for (by, key), group in other.sketches.items():
+            mine = self._group(by, key)
+            for m, sketch in group.items():
+                mine[m].merge(sketch)
+        self.rows += other.rows
+        return self
+
+    def keys(self, by: str) -> list:
+        return sorted(key for b, key in self.sketches if b == by)
+
+    def get(self, by: str, key: str, metric: str):
+        group = self.sketches.get((by, key))
+        return group[metric] if group else None
+
+
+# ── Dataset baseline ──────────────────────────────────────────────────────────
+
+def _chunk_sketches(start: int, stop: int) -> SketchSet:
+    """Runs on a compute worker: sketches of dataset rows [start, stop)."""
+    return SketchSet().update_frame(load_dataset().iloc[start:stop])
+
+
+def _compute_baseline():
+    df = load_dataset()
+    if "Review Rating" not in df.columns:
+        return None
+    merged = SketchSet()
+    for start in range(0, len(df), CHUNK_ROWS):
+        merged.merge(compute.run_sync("distributions", _chunk_sketches, start, min(start + CHUNK_ROWS, len(df))))
+    return merged
+
+
+snapshot.register("distributions.baseline", _compute_baseline)
+
+
+# ── Live view ─────────────────────────────────────────────────────────────────
+
+class DistributionStream:
+    """The dataset baseline plus sketches of every ingested batch, merged on read."""
+
+    def __init__(self):
+        self._ingested = SketchSet()
+        self._merged   = None
+        self._lock     = threading.Lock()
+        self.batches   = 0
+
+    def ingest(self, df) -> dict:
+        batch = SketchSet().update_frame(df)       # outside the lock; the merge is small
+        with self._lock:
+            self._ingested.merge(batch)
+            self._merged = None
+            self.batches += 1
+        return {"rows": int(len(df)), "groups": len(batch.sketches)}
+
+    def view(self) -> SketchSet:
+        """Baseline merged with everything ingested so far (cached until the next batch)."""
+        with self._lock:
+            if self._merged is None:
+                baseline = snapshot.aggregate("distributions.baseline")
+                merged = copy.deepcopy(baseline) if baseline is not None else SketchSet()
+                self._merged = merged.merge(self._ingested)
+            return self._merged
+
+    def stats(self) -> dict:
+        baseline = snapshot.aggregate("distributions.baseline")
+        view = self.view()
+        return {
+            "algorithm":       "KLL",
+            "k":               SKETCH_K,
+            "rank_error":      round(KLLSketch.rank_error(SKETCH_K), 4),
+            "baseline_rows":   baseline.rows if baseline is not None else 0,
+            "ingested_rows":   self._ingested.rows,
+            "ingested_batches": self.batches,
+            "sketches":        len(view.sketches) * len(SKETCHED),
+            "retained_items":  sum(s.size for group in view.sketches.values() for s in group.values()),
+        }
+
+
+stream = DistributionStream()
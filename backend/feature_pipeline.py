@@ -0,0 +1,130 @@
+"""
+Feature Pipeline - One fitted feature transform shared by training and serving
+FeaturePipeline.fit learns the RFM quintile bin edges, the High_Value spend
+threshold and the one-hot vocabularies from the training frame; transform
+applies them with vectorised np.searchsorted lookups. The fitted state is a
+plain dict saved next to the models (artifact "features"), so a single
+request, an ingested batch and the training set all go through the same code.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Same mapping as training, including "Every 3 Months".
+FREQ_MAP = {
+    "Weekly": 5, "Bi-Weekly": 4, "Fortnightly": 4, "Monthly": 3,
+    "Quarterly": 2, "Annually": 1, "Every 3 Months": 2,
+}
+
+FREQ_LABELS = {5: "Weekly", 4: "Bi-Weekly", 3: "Monthly", 2: "Quarterly", 1: "Annually"}
+
+ONE_HOT_COLUMNS = ["Gender", "Category", "Season"]
+
+QUINTILES = [0.2, 0.4, 0.6, 0.8]
+
+# Hand-picked serve-time values used before the pipeline was fitted in
+# training; only applied to model versions that predate the "features" artifact.
+LEGACY_STATE = {
+    "f_edges":              [5.0, 15.0, 30.0, 45.0],
+    "m_edges":              [30.0, 60.0, 80.0, 95.0],
+    "high_value_threshold": 82.0,
+    "vocabularies": {
+        "Gender":   ["Female", "Male"],
+        "Category": ["Accessories", "Clothing", "Footwear", "Outerwear"],
+        "Season":   ["Fall", "Spring", "Summer", "Winter"],
+    },
+    "drop_first": True,
+}
+
+
+def _scores(edges: np.ndarray, values) -> np.ndarray:
+    """
+    1-based bin index for right-closed bins split at `edges`, i.e. what
+    pd.qcut(..., labels=[1..5]) assigns; out-of-range values clamp to the
+    first/last bin instead of becoming NaN.
+    """
+    return np.searchsorted(edges, np.asarray(values, dtype=float), side="left") + 1
+
+
+class FeaturePipeline:
+    """Fitted RFM edges, High_Value threshold and one-hot vocabularies."""
+
+    def __init__(self, state: dict):
+        self.state      = state
+        self.f_edges    = np.asarray(state["f_edges"], dtype=float)
+        self.m_edges    = np.asarray(state["m_edges"], dtype=float)
+        self.threshold  = float(state["high_value_threshold"])
+        self.drop_first = bool(state.get("drop_first", True))
+        self.vocabularies = {col: np.asarray(vals, dtype=object)
+                             for col, vals in state["vocabularies"].items()}
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, drop_first: bool = True) -> "FeaturePipeline":
+        """Learn edges, threshold and vocabularies from a raw training frame."""
+        return cls({
+            "f_edges":              df["Previous Purchases"].quantile(QUINTILES).astype(float).tolist(),
+            "m_edges":              df["Purchase Amount (USD)"].quantile(QUINTILES).astype(float).tolist(),
+            "high_value_threshold": float(df["Purchase Amount (USD)"].quantile(0.75)),
+            "vocabularies":         {col: sorted(df[col].dropna().astype(str).unique().tolist())
+                                     for col in ONE_HOT_COLUMNS},
+            "drop_first":           drop_first,
+        })
+
+    @classmethod
+    def from_artifact(cls, artifact) -> "FeaturePipeline":
+        return cls(artifact if artifact is not None else LEGACY_STATE)
+
+    def one_hot_columns(self) -> list:
+        start = 1 if self.drop_first else 0
+        return [f"{col}_{val}" for col in ONE_HOT_COLUMNS for val in self.vocabularies[col][start:]]
+
+    def transform(self, records, customer_history: bool = False) -> pd.DataFrame:
+        """
+        Raw CSV-named records (list of dicts or DataFrame) -> numeric feature frame.
+
+        customer_history=True reproduces training's Discount_Sensitivity (mean
+        discount usage per Customer ID over the frame); otherwise a record's
+        own discount flag stands in, as there is no purchase history at
+        serve time.
+        """
+        df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+        n  = len(df)
+
+        prev   = df["Previous Purchases"].to_numpy(dtype=float)
+        amount = df["Purchase Amount (USD)"].to_numpy(dtype=float)
+        disc   = (df["Discount Applied"].to_numpy() == "Yes").astype(np.int64)
+
+        f_score = _scores(self.f_edges, prev)
+        m_score = _scores(self.m_edges, amount)
+        r_score = df["Frequency of Purchases"].str.strip().map(FREQ_MAP).fillna(1).to_numpy(dtype=np.int64)
+
+        if customer_history and "Customer ID" in df.columns:
+            sensitivity = pd.Series(disc, index=df.index).groupby(df["Customer ID"]).transform("mean").to_numpy()
+        else:
+            sensitivity = disc.astype(float)
+
+        out = {
+            "Age":                   df["Age"].to_numpy(dtype=float),
+            "Purchase Amount (USD)": amount,
+            "Review Rating":         df["Review Rating"].to_numpy(dtype=float),
+            "Previous Purchases":    prev,
+            "Discount_Flag":         disc,
+            "Discount_Sensitivity":  sensitivity,
+            "F_score":               f_score,
+            "M_score":               m_score,
+            "R_score":               r_score,
+            "RFM_Score":             r_score + f_score + m_score,
+            "High_Value":            (amount > self.threshold).astype(np.int64),
+        }
+
+        start = 1 if self.drop_first else 0
+        for col in ONE_HOT_COLUMNS:
+            vocab  = self.vocabularies[col]
+            values = df[col].astype(str).to_numpy(dtype=object)
+            idx    = np.searchsorted(vocab, values)
+            known  = idx < len(vocab)
+            known[known] = vocab[idx[known]] == values[known]
+            for j in range(start, len(vocab)):
+                out[f"{col}_{vocab[j]}"] = (known & (idx == j)).astype(np.float64)
+
+        return pd.DataFrame(out, index=pd.RangeIndex(n))
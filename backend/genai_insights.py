@@ -1,11 +1,15 @@
 import os
 import json
+import time
 import requests
+import metrics
+from profiling import phase
 from dotenv import load_dotenv
 
 load_dotenv()
 
-API_URL = "https://router.huggingface.co/v1/chat/completions"
+# Overridable so load tests can point at benchmarks/stub_llm.py
+API_URL = os.getenv("HF_API_URL", "https://router.huggingface.co/v1/chat/completions")
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 
@@ -99,9 +103,16 @@ Provide:
         "max_tokens": 500
     }
 
+    t0 = time.perf_counter()
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
+        with phase("llm"):
+            response = requests.post(API_URL, headers=headers, json=payload)
+    except Exception as e:
+        metrics.observe_llm("insights", time.perf_counter() - t0, False)
+        return f"Error generating insights: {str(e)}"
+    metrics.observe_llm("insights", time.perf_counter() - t0, response.status_code == 200)
 
+    try:
         if response.status_code != 200:
             return f"HF API Error: {response.json()}"
 
@@ -0,0 +1,36 @@
+"""
+Ingest - In-process fan-out of incoming transaction batches
+Streaming subsystems (e.g. the anomaly detector) subscribe a handler; every
+batch posted to /ingest/transactions is handed to each handler as one
+CSV-named DataFrame so they can process it vectorised.
+"""
+
+import logging
+
+logger = logging.getLogger("shopmind.ingest")
+
+_handlers = {}
+
+
+def subscribe(name: str, handler) -> None:
+    """Register handler(df) -> dict under `name` (re-registering replaces it)."""
+    _handlers[name] = handler
+
+
+def subscribers() -> list:
+    return list(_handlers)
+
+
+def publish(df) -> dict:
+    """
+    Hand one batch to every subscriber and collect their summaries. A failing
+    subscriber is logged and reported without stopping the others.
+    """
+    results = {}
+    for name, handler in list(_handlers.items()):
+        try:
+            results[name] = handler(df)
+        except Exception as e:
+            logger.exception("Ingest subscriber '%s' failed", name)
+            results[name] = {"error": str(e)}
+    return results
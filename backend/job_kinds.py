@@ -0,0 +1,217 @@
+"""
+Job Kinds - The long-running operations served by /jobs
+  score      every dataset row through the CLV, churn, sentiment, anomaly and
+             subscription models -> CSV, in chunks on the compute pool
+  rules      category association rules re-mined with other thresholds, on
+             the compute pool
+  recluster  mini-batch KMeans over the shipped KMeans feature space, streamed
+             through the compute pool chunk by chunk; clusters matched to the
+             shipped model's segments by row overlap
+  snapshot   rebuild of the shared worker snapshot (serve.py --build-only)
+
+Pool-side functions live here rather than in the routers so compute workers
+can import them without starting the app.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import affinity_rules
+import compute
+import jobs
+import snapshot
+from snapshot import load_dataset
+
+_BASE = os.path.dirname(__file__)
+
+SENTIMENT_LABELS = {0: "Negative", 1: "Neutral", 2: "Positive"}
+
+def _on_pool(ctx: jobs.JobContext, op: str, fn, *args):
+    """compute.run_sync() that waits for queue room instead of failing the job."""
+    while True:
+        ctx.check()
+        try:
+            return compute.run_sync(op, fn, *args)
+        except compute.ComputeBusy:
+            time.sleep(0.5)
+
+
+# ── score ─────────────────────────────────────────────────────────────────────
+
+def _score_chunk(models_dir: str, version: str, start: int, stop: int) -> pd.DataFrame:
+    """Runs on a compute worker: model outputs for dataset rows [start, stop)."""
+    from model_registry import registry_for
+    models = registry_for(models_dir, version)
+    df = load_dataset().iloc[start:stop]
+    out = {"customer_id": df["Customer ID"].to_numpy()} if "Customer ID" in df.columns else {}
+    enc = models.pipeline().transform(df, customer_history=True)
+
+    if all(models.available(m) for m in ("advanced", "clv", "churn", "sentiment")):
+        adv = models.get("advanced")
+        X_adv = adv["scaler"].transform(enc.reindex(columns=adv["features"], fill_value=0))
+        clv_log = models.get("clv")["model"].predict(X_adv)
+        out["clv"] = np.round(np.expm1(clv_log), 2)
+        out["churn_probability"] = np.round(models.get("churn")["model"].predict_proba(np.c_[X_adv, clv_log])[:, 1], 4)
+        sentiment = models.get("sentiment")["model"].predict_proba(X_adv).argmax(axis=1)
+        out["sentiment"] = [SENTIMENT_LABELS[int(s)] for s in sentiment]
+    if models.available("anomaly"):
+        anom = models.get("anomaly")
+        scores = anom["model"].decision_function(anom["scaler"].transform(enc.reindex(columns=anom["features"], fill_value=0)))
+        out["anomaly_score"] = np.round(scores, 4)
+        out["is_anomaly"] = scores < 0
+    if models.available("subscription"):
+        sub = models.get("subscription")
+        X_sub = sub["scaler"].transform(enc.reindex(columns=sub["features"], fill_value=0))
+        out["subscription_probability"] = np.round(sub["model"].predict_proba(X_sub)[:, 1], 4)
+    return pd.DataFrame(out)
+
+
+@jobs.kind("score", limit=1, result_type="csv", params={"chunk_rows": (100_000, 1_000, 1_000_000)})
+def score_dataset(ctx: jobs.JobContext):
+    """Score every dataset row with the active model version (CSV result)."""
+    from model_registry import store as model_store
+    registry = model_store.active()
+    n = len(load_dataset())
+    chunk = ctx.params["chunk_rows"]
+    tmp = f"{ctx.result_path}.tmp"
+    try:
+        with open(tmp, "w", newline="") as f:
+            for start in range(0, n, chunk):
+                stop = min(start + chunk, n)
+                frame = _on_pool(ctx, "job.score", _score_chunk, registry.models_dir, registry.version, start, stop)
+                frame.to_csv(f, header=(start == 0), index=False)
+                ctx.progress(stop / n, f"{stop:,} / {n:,} rows scored with {registry.version}")
+        os.replace(tmp, ctx.result_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ── rules ─────────────────────────────────────────────────────────────────────
+
+@jobs.kind("rules", limit=1, params={"min_support": (0.20, 0.0, 1.0), "top": (20, 1, 500)})
+def mine_rules(ctx: jobs.JobContext):
+    """Re-mine category association rules with the given support threshold."""
+    ctx.progress(0.0, "mining")
+    rules = _on_pool(ctx, "job.rules", affinity_rules.mine_dataset, ctx.params["min_support"], ctx.params["top"])
+    return {"params": ctx.params, "n_rules": len(rules), "rules": rules}
+
+
+# ── recluster ─────────────────────────────────────────────────────────────────
+
+def _partial_fit(model, k: int, seed: int, batch_size: int, epoch: int, start: int, stop: int):
+    """Runs on a compute worker: one pass of mini-batch updates over dataset rows [start, stop)."""
+    import clustering
+    from sklearn.cluster import MiniBatchKMeans
+
+    X = clustering.features(load_dataset().iloc[start:stop])
+    if model is None:
+        model = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, random_state=seed)
+    order = np.random.default_rng([seed, epoch, start]).permutation(len(X))
+    for i in range(0, len(X), batch_size):
+        batch = X[order[i:i + batch_size]]
+        if len(batch) >= k or hasattr(model, "cluster_centers_"):
+            model.partial_fit(batch)
+    return model
+
+
+def _predict_chunk(model, start: int, stop: int) -> tuple:
+    """Runs on a compute worker: (cluster per row, summed squared distance) for rows [start, stop)."""
+    import clustering
+    X = clustering.features(load_dataset().iloc[start:stop])
+    labels = model.predict(X)
+    return labels.astype(np.int8), float(((X - model.cluster_centers_[labels]) ** 2).sum())
+
+
+@jobs.kind("recluster", limit=1, params={"k": (4, 2, 12), "seed": 42, "batch_size": (4096, 256, 65_536),
+                                         "epochs": (2, 1, 10), "chunk_rows": (200_000, 10_000, 2_000_000)})
+def recluster(ctx: jobs.JobContext):
+    """
+    Mini-batch KMeans refit of the whole dataset in the shipped model's
+    feature space. Each pool call transforms one chunk of rows and updates
+    the (k x features) model, so memory is bounded by chunk_rows whatever
+    the dataset size; the model itself travels between calls.
+    """
+    import clustering
+    if clustering.load_model() is None:
+        raise RuntimeError("final_models/preprocessing_pipeline.pkl or kmeans_model.pkl is missing")
+    p = ctx.params
+    df = load_dataset()
+    n = len(df)
+    chunks = [(start, min(start + p["chunk_rows"], n)) for start in range(0, n, p["chunk_rows"])]
+    steps, done = len(chunks) * (p["epochs"] + 1), 0
+
+    model = None
+    for epoch in range(p["epochs"]):
+        for start, stop in chunks:
+            model = _on_pool(ctx, "job.recluster", _partial_fit, model, p["k"], p["seed"], p["batch_size"],
+                             epoch, start, stop)
+            done += 1
+            ctx.progress(done / steps, f"epoch {epoch + 1}/{p['epochs']}: {stop:,} / {n:,} rows")
+
+    labels = np.empty(n, dtype=np.int8)
+    inertia = 0.0
+    for start, stop in chunks:
+        labels[start:stop], chunk_inertia = _on_pool(ctx, "job.recluster", _predict_chunk, model, start, stop)
+        inertia += chunk_inertia
+        done += 1
+        ctx.progress(done / steps, f"assigning: {stop:,} / {n:,} rows")
+
+    # Overlap with the shipped model's assignment names each new cluster.
+    shipped = np.asarray(clustering.cluster_ids(), dtype=np.int64)
+    n_shipped = len(clustering.SEGMENT_LABELS)
+    overlap = np.bincount(labels.astype(np.int64) * n_shipped + shipped,
+                          minlength=p["k"] * n_shipped).reshape(p["k"], n_shipped)
+    clusters = clustering.summary(df, labels, [f"Cluster {c}" for c in range(p["k"])])
+    for entry, row in zip(clusters, overlap):
+        best = int(row.argmax())
+        entry["nearest_segment"] = clustering.SEGMENT_LABELS[best]
+        entry["overlap"] = round(int(row[best]) / max(entry["size"], 1), 4)
+    return {
+        "params":   p,
+        "algorithm": "MiniBatchKMeans",
+        "rows":     n,
+        "inertia":  round(inertia, 3),
+        "inertia_per_row": round(inertia / max(n, 1), 4),
+        "agreement_with_shipped": round(float(overlap.max(axis=1).sum()) / max(n, 1), 4),
+        "clusters": clusters,
+    }
+
+
+# ── snapshot ──────────────────────────────────────────────────────────────────
+
+@jobs.kind("snapshot", limit=1)
+def rebuild_snapshot(ctx: jobs.JobContext):
+    """Rebuild the shared worker snapshot; workers attach to it on their next start."""
+    import serve
+    target = snapshot.SNAPSHOT_DIR or serve.DEFAULT_SNAPSHOT_DIR
+    env = dict(os.environ)
+    env.pop("SHOPMIND_SNAPSHOT_DIR", None)
+    cmd = [sys.executable, os.path.join(_BASE, "serve.py"), "--build-only", "--snapshot-dir", target]
+    with tempfile.TemporaryFile("w+") as out, tempfile.TemporaryFile("w+") as err:
+        proc = subprocess.Popen(cmd, cwd=_BASE, env=env, stdout=out, stderr=err, text=True)
+        ctx.progress(0.0, "building")
+        try:
+            while proc.poll() is None:
+                ctx.check()
+                time.sleep(0.25)
+        except jobs.JobCancelled:
+            proc.terminate()
+            proc.wait(timeout=30)
+            raise
+        out.seek(0)
+        err.seek(0)
+        if proc.returncode != 0:
+            raise RuntimeError(f"snapshot build exited with {proc.returncode}: {err.read().strip()[-500:]}")
+        summary = json.loads(out.read().strip().splitlines()[-1])
+    with open(os.path.join(target, snapshot.MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return {**summary, "built_at": manifest["built_at"], "source": manifest["source"],
+            "attached_here": snapshot.attached_manifest() is not None}
@@ -0,0 +1,491 @@
+"""
+Jobs - Background jobs for long-running analytics and scoring
+Work too slow for a synchronous request (full-dataset scoring, rule
+re-mining, re-clustering, snapshot rebuilds) is submitted as a job, runs on
+a small pool of dispatcher threads and is tracked in a SQLite job table, so
+status survives restarts and is shared by every uvicorn worker on the host.
+
+    SHOPMIND_JOBS_DIR            job table (jobs.db) and results/ (default dataset/jobs)
+    SHOPMIND_JOB_WORKERS         dispatcher threads per API process (default 2)
+    SHOPMIND_JOB_LIMITS          per-kind concurrency overrides, e.g. "score=2,rules=1"
+    SHOPMIND_JOB_RESULT_TTL_S    seconds a finished job's result is kept (default 86400)
+
+Per-kind limits count running jobs in the table, so they hold across
+processes. Cancellation is cooperative: a queued job is cancelled at once, a
+running one when it next calls ctx.check(). Job kinds are registered with
+@kind (see job_kinds.py); a kind's function receives a JobContext and returns
+a JSON-serialisable result, or writes ctx.result_path for file results.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+from metrics import Histogram
+
+logger = logging.getLogger("shopmind.jobs")
+
+_BASE = os.path.dirname(__file__)
+JOBS_DIR           = os.getenv("SHOPMIND_JOBS_DIR", os.path.join(_BASE, "dataset", "jobs"))
+JOB_WORKERS        = max(0, int(os.getenv("SHOPMIND_JOB_WORKERS", "2")))
+RESULT_TTL_SECONDS = float(os.getenv("SHOPMIND_JOB_RESULT_TTL_S", str(24 * 3600)))
+POLL_SECONDS       = 1.0
+SWEEP_SECONDS      = 30.0
+CANCEL_CHECK_SECONDS = 0.5
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+MEDIA_TYPES = {"json": "application/json", "csv": "text/csv"}
+
+DURATION_BUCKETS = [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800]
+
+
+class JobError(Exception):
+    """Invalid submission or request against a job (unknown kind, bad params, wrong state)."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job by ctx.check() once cancellation was requested."""
+
+
+def _parse_limits(value: str) -> dict:
+    limits = {}
+    for part in value.split(","):
+        if "=" in part:
+            name, limit = part.split("=", 1)
+            limits[name.strip()] = max(1, int(limit))
+    return limits
+
+
+_LIMIT_OVERRIDES = _parse_limits(os.getenv("SHOPMIND_JOB_LIMITS", ""))
+
+
+# ── Job kinds ─────────────────────────────────────────────────────────────────
+
+class JobKind:
+    """
+    A registered job type. params maps each accepted parameter to its default
+    or to (default, min, max); submitted values are cast to the default's type.
+    """
+
+    def __init__(self, name: str, fn, limit: int, params: dict, result_type: str, description: str):
+        self.name        = name
+        self.fn          = fn
+        self.limit       = _LIMIT_OVERRIDES.get(name, limit)
+        self.params      = params
+        self.result_type = result_type
+        self.description = description
+
+    def validate(self, params: dict) -> dict:
+        params = dict(params or {})
+        unknown = sorted(set(params) - set(self.params))
+        if unknown:
+            raise JobError(f"Unknown parameter(s) for '{self.name}': {', '.join(unknown)}")
+        out = {}
+        for key, spec in self.params.items():
+            default, lo, hi = spec if isinstance(spec, tuple) else (spec, None, None)
+            value = params.get(key, default)
+            try:
+                if isinstance(default, bool) and isinstance(value, str):
+                    value = value.strip().lower() in ("1", "true", "yes")
+                value = type(default)(value) if default is not None else value
+            except (TypeError, ValueError):
+                raise JobError(f"Parameter '{key}' must be {type(default).__name__}")
+            if lo is not None and value < lo or hi is not None and value > hi:
+                raise JobError(f"Parameter '{key}' must be between {lo} and {hi}")
+            out[key] = value
+        return out
+
+    def describe(self) -> dict:
+        return {
+            "kind":        self.name,
+            "description": self.description,
+            "limit":       self.limit,
+            "result_type": self.result_type,
+            "params":      {k: (v[0] if isinstance(v, tuple) else v) for k, v in self.params.items()},
+        }
+
+
+KINDS = {}
+
+
+def kind(name: str, limit: int = 1, params: dict = None, result_type: str = "json", description: str = ""):
+    """Decorator registering fn(ctx) as job kind `name`."""
+    def register(fn):
+        KINDS[name] = JobKind(name, fn, limit, params or {}, result_type,
+                              description or (fn.__doc__ or "").strip().split("\n")[0])
+        return fn
+    return register
+
+
+class JobContext:
+    """Handed to a running job: its params, progress reporting and cancellation."""
+
+    def __init__(self, job_id: str, params: dict, result_path: str):
+        self.id          = job_id
+        self.params      = params
+        self.result_path = result_path
+        self._checked_at = 0.0
+
+    def progress(self, fraction: float, message: str = None) -> None:
+        """Record progress (0..1) and honour a pending cancellation."""
+        _execute("UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+                 (round(min(max(fraction, 0.0), 1.0), 4), message, self.id))
+        self.check(force=True)
+
+    def check(self, force: bool = False) -> None:
+        """Raise JobCancelled if cancellation was requested (polled at most every 0.5 s)."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < CANCEL_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        row = _query("SELECT cancel_requested FROM jobs WHERE id = ?", (self.id,))
+        if row and row[0]["cancel_requested"]:
+            raise JobCancelled()
+
+
+# ── Job table ─────────────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id               TEXT PRIMARY KEY,
+    kind             TEXT NOT NULL,
+    status           TEXT NOT NULL,
+    params           TEXT NOT NULL,
+    progress         REAL NOT NULL DEFAULT 0,
+    message          TEXT,
+    error            TEXT,
+    created_at       REAL NOT NULL,
+    started_at       REAL,
+    finished_at      REAL,
+    expires_at       REAL,
+    result_file      TEXT,
+    result_type      TEXT,
+    result_expired   INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner_pid        INTEGER,
+    owner_token      TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _results_dir() -> str:
+    return os.path.join(JOBS_DIR, "results")
+
+
+def _connect() -> sqlite3.Connection:
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(_results_dir(), exist_ok=True)
+        conn = sqlite3.connect(os.path.join(JOBS_DIR, "jobs.db"), timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(_SCHEMA)
+                # Tables created before owner tokens were recorded.
+                if "owner_token" not in {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN owner_token TEXT")
+                _schema_ready = True
+        _local.conn = conn
+    return conn
+
+
+def _execute(sql: str, args: tuple = ()) -> int:
+    return _connect().execute(sql, args).rowcount
+
+
+def _query(sql: str, args: tuple = ()) -> list:
+    return _connect().execute(sql, args).fetchall()
+
+
+def _fmt(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else None
+
+
+def _public(row) -> dict:
+    status = row["status"]
+    ended = row["finished_at"] or time.time()
+    return {
+        "id":               row["id"],
+        "kind":             row["kind"],
+        "status":           status,
+        "params":           json.loads(row["params"]),
+        "progress":         row["progress"],
+        "message":          row["message"],
+        "error":            row["error"],
+        "created_at":       _fmt(row["created_at"]),
+        "started_at":       _fmt(row["started_at"]),
+        "finished_at":      _fmt(row["finished_at"]),
+        "duration_seconds": round(ended - row["started_at"], 3) if row["started_at"] else None,
+        "cancel_requested": bool(row["cancel_requested"]) and status not in FINISHED,
+        "result": {
+            "available":  status == SUCCEEDED and bool(row["result_file"]),
+            "type":       row["result_type"],
+            "expired":    bool(row["result_expired"]),
+            "expires_at": _fmt(row["expires_at"]),
+            "url":        f"/jobs/{row['id']}/result",
+        } if status == SUCCEEDED else None,
+    }
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def submit(kind_name: str, params: dict = None) -> dict:
+    job_kind = KINDS.get(kind_name)
+    if job_kind is None:
+        raise KeyError(kind_name)
+    params = job_kind.validate(params)
+    job_id = uuid.uuid4().hex
+    _execute(
+        "INSERT INTO jobs (id, kind, status, params, created_at, result_type) VALUES (?, ?, ?, ?, ?, ?)",
+        (job_id, kind_name, QUEUED, json.dumps(params), time.time(), job_kind.result_type),
+    )
+    with _wakeup:
+        _wakeup.notify()
+    return get(job_id)
+
+
+def get(job_id: str):
+    rows = _query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    return _public(rows[0]) if rows else None
+
+
+def list_jobs(kind_name: str = None, status: str = None, limit: int = 50) -> list:
+    sql, args = "SELECT * FROM jobs WHERE 1=1", []
+    if kind_name:
+        sql += " AND kind = ?"
+        args.append(kind_name)
+    if status:
+        sql += " AND status = ?"
+        args.append(status)
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    args.append(int(limit))
+    return [_public(r) for r in _query(sql, tuple(args))]
+
+
+def cancel(job_id: str):
+    """Cancel a queued job now or flag a running one; None if the job does not exist."""
+    job = get(job_id)
+    if job is None:
+        return None
+    if job["status"] in FINISHED:
+        raise JobError(f"Job is already {job['status']}")
+    if _execute("UPDATE jobs SET status = ?, finished_at = ?, cancel_requested = 1 WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)) == 0:
+        _execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+    return get(job_id)
+
+
+def result(job_id: str):
+    """(path, media type) of a succeeded job's result; JobError if none is available."""
+    rows = _query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    if not rows:
+        return None
+    row = rows[0]
+    if row["status"] != SUCCEEDED:
+        raise JobError(f"Job is {row['status']}; no result")
+    if row["result_expired"] or not row["result_file"] or not os.path.exists(row["result_file"]):
+        raise FileNotFoundError(job_id)
+    return row["result_file"], MEDIA_TYPES.get(row["result_type"], "application/octet-stream")
+
+
+# ── Dispatcher ────────────────────────────────────────────────────────────────
+
+_wakeup   = threading.Condition()
+_halt     = threading.Event()
+_threads  = []
+_durations = {}     # kind -> Histogram of run seconds (this process)
+_last_sweep = 0.0
+
+
+def _claim():
+    """Atomically move the oldest queued job whose kind has a free slot to running."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        running = {r["kind"]: r["n"] for r in conn.execute(
+            "SELECT kind, COUNT(*) AS n FROM jobs WHERE status = ? GROUP BY kind", (RUNNING,))}
+        for row in conn.execute("SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY created_at",
+                                (QUEUED,)).fetchall():
+            job_kind = KINDS.get(row["kind"])
+            if job_kind is None or running.get(row["kind"], 0) >= job_kind.limit:
+                continue
+            conn.execute("UPDATE jobs SET status = ?, started_at = ?, owner_pid = ?, owner_token = ? WHERE id = ?",
+                         (RUNNING, time.time(), os.getpid(), _owner_token(), row["id"]))
+            conn.execute("COMMIT")
+            return row["id"], job_kind, json.loads(row["params"])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return None
+
+
+def _run(job_id: str, job_kind: JobKind, params: dict) -> None:
+    path = os.path.join(_results_dir(), f"{job_id}.{job_kind.result_type}")
+    ctx = JobContext(job_id, params, path)
+    started = time.perf_counter()
+    status, error = SUCCEEDED, None
+    try:
+        value = job_kind.fn(ctx)
+        if job_kind.result_type == "json":
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(value, f, default=str)
+            os.replace(tmp, path)
+    except JobCancelled:
+        status = CANCELLED
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job_id, job_kind.name)
+        status, error = FAILED, f"{type(e).__name__}: {e}"
+    finished = time.time()
+    if status != SUCCEEDED and os.path.exists(path):
+        os.remove(path)
+    _execute(
+        "UPDATE jobs SET status = ?, error = ?, finished_at = ?, progress = CASE WHEN ? THEN 1 ELSE progress END,"
+        " result_file = ?, expires_at = ? WHERE id = ?",
+        (status, error, finished, status == SUCCEEDED,
+         path if status == SUCCEEDED else None,
+         finished + RESULT_TTL_SECONDS if status == SUCCEEDED else None, job_id),
+    )
+    hist = _durations.get(job_kind.name)
+    if hist is None:
+        hist = _durations.setdefault(job_kind.name, Histogram(DURATION_BUCKETS))
+    hist.observe(time.perf_counter() - started)
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _process_started(pid):
+    """Start time of `pid` in clock ticks since boot (Linux), or None when unknown."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22; split after the parenthesised command name, which may contain spaces.
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+_owner = (None, None)   # (pid, token) of this process incarnation
+
+
+def _owner_token() -> str:
+    """
+    Identifies this process incarnation: pid plus its start time (a uuid where
+    /proc is unavailable). A restarted API that gets the same pid - PID 1 in a
+    container - gets a different token.
+    """
+    global _owner
+    pid = os.getpid()
+    if _owner[0] != pid:
+        _owner = (pid, f"{pid}:{_process_started(pid) or uuid.uuid4().hex}")
+    return _owner[1]
+
+
+def _owner_alive(pid, token) -> bool:
+    """Whether the process incarnation that claimed a job is still running."""
+    if token == _owner_token():
+        return True
+    if pid == os.getpid() or not _pid_alive(pid):
+        return False            # a previous incarnation with our pid, or gone
+    started = _process_started(pid)
+    return started is None or token is None or token == f"{pid}:{started}"
+
+
+def sweep() -> dict:
+    """Expire old results and fail jobs whose owning process died while running them."""
+    now = time.time()
+    expired = _query("SELECT id, result_file FROM jobs WHERE result_file IS NOT NULL AND expires_at < ?", (now,))
+    for row in expired:
+        try:
+            os.remove(row["result_file"])
+        except OSError:
+            pass
+        _execute("UPDATE jobs SET result_file = NULL, result_expired = 1 WHERE id = ?", (row["id"],))
+
+    orphaned = 0
+    for row in _query("SELECT id, owner_pid, owner_token FROM jobs WHERE status = ?", (RUNNING,)):
+        if not _owner_alive(row["owner_pid"], row["owner_token"]):
+            orphaned += _execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (FAILED, "Interrupted: the process running the job exited", now, row["id"], RUNNING))
+    return {"expired_results": len(expired), "orphaned": orphaned}
+
+
+def _dispatch() -> None:
+    global _last_sweep
+    while not _halt.is_set():
+        try:
+            if time.monotonic() - _last_sweep > SWEEP_SECONDS:
+                _last_sweep = time.monotonic()
+                sweep()
+            claimed = _claim()
+        except sqlite3.Error:
+            logger.exception("Job table unavailable")
+            claimed = None
+        if claimed is None:
+            with _wakeup:
+                _wakeup.wait(POLL_SECONDS)
+            continue
+        try:
+            _run(*claimed)
+        except Exception:
+            logger.exception("Job %s could not be finalised", claimed[0])
+
+
+def start() -> None:
+    """Start the dispatcher threads (idempotent); called from the app lifespan."""
+    if _threads or JOB_WORKERS == 0:
+        return
+    _halt.clear()
+    sweep()
+    for i in range(JOB_WORKERS):
+        thread = threading.Thread(target=_dispatch, name=f"jobs-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop() -> None:
+    """Stop taking new jobs; running ones finish in their daemon threads or die with the process."""
+    _halt.set()
+    with _wakeup:
+        _wakeup.notify_all()
+    _threads.clear()
+
+
+def _job_families():
+    try:
+        counts = _query("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status")
+    except sqlite3.Error:
+        counts = []
+    yield ("shopmind_jobs", "gauge", "Jobs in the job table by kind and status.",
+           [({"kind": r["kind"], "status": r["status"]}, r["n"]) for r in counts])
+    yield ("shopmind_job_duration_seconds", "histogram", "Run time of jobs finished by this process.",
+           [({"kind": k}, h) for k, h in sorted(_durations.items())])
+
+
+metrics.register_collector("jobs", _job_families)
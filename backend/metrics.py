@@ -0,0 +1,234 @@
+"""
+Metrics - Prometheus text-format instrumentation for the API
+MetricsMiddleware records request count, latency histogram and in-flight
+gauge per route template and status as a raw ASGI middleware (a few dict
+operations and one bisect per request). Modules register collectors that are
+only evaluated when /metrics is scraped (dataset size, model load state,
+batcher and anomaly-stream histograms, ...), and the cache / LLM helpers
+below give every module the same counters.
+"""
+
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+LLM_BUCKETS     = [0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60]
+
+UNMATCHED_ROUTE = "<unmatched>"
+MAX_CACHED_PATHS = 10_000
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative counts, Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts  = [0] * (len(self.buckets) + 1)
+        self.total   = 0.0
+        self.n       = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.n     += 1
+
+    def cumulative(self) -> list:
+        """[(upper bound, cumulative count)] including +Inf."""
+        out, running = [], 0
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            running += count
+            out.append((bound, running))
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            "count":   self.n,
+            "sum":     round(self.total, 3),
+            "mean":    round(self.total / self.n, 3) if self.n else 0.0,
+            "buckets": {str(bound): count for bound, count in self.cumulative()},
+        }
+
+
+# ── Collectors ────────────────────────────────────────────────────────────────
+# A collector returns families: (name, kind, help, [(labels_dict, value), ...])
+# with kind "counter" / "gauge" (value is a number) or "histogram" (value is
+# a Histogram).
+
+_collectors = {}
+
+
+def register_collector(name: str, collector) -> None:
+    """Register (or replace) a scrape-time collector under `name`."""
+    _collectors[name] = collector
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels.items()]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render() -> str:
+    """Every registered family in the Prometheus text exposition format."""
+    lines = []
+    for name, collector in list(_collectors.items()):
+        try:
+            families = list(collector())
+        except Exception as e:
+            lines.append(f"# collector {name} failed: {_escape(e)}")
+            continue
+        for metric, kind, help_text, samples in families:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, value in samples:
+                if kind == "histogram":
+                    for bound, count in value.cumulative():
+                        le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+                        lines.append(f"{metric}_bucket{_labels(labels, le)} {count}")
+                    lines.append(f"{metric}_sum{_labels(labels)} {_number(value.total)}")
+                    lines.append(f"{metric}_count{_labels(labels)} {value.n}")
+                else:
+                    lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── HTTP middleware ───────────────────────────────────────────────────────────
+
+_requests  = {}        # (method, route, status) -> Histogram of seconds
+_in_flight = {}        # (method, route) -> int
+_routes    = {}        # (method, raw path) -> route template
+
+
+class MetricsMiddleware:
+    """
+    Raw ASGI middleware. The route label is the path template the router
+    matched (e.g. /segments/{segment_id}), so label cardinality stays bounded.
+    The template is only known once routing has run, so it is cached per
+    raw path; the in-flight gauge uses that cache and counts the very first
+    request to a path under <unmatched>.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path_key   = (scope["method"], scope["path"])
+        flight_key = (scope["method"], _routes.get(path_key, UNMATCHED_ROUTE))
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _in_flight[flight_key] = _in_flight.get(flight_key, 0) + 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight[flight_key] -= 1
+
+            route = _routes.get(path_key)
+            if route is None:
+                route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+                if len(_routes) < MAX_CACHED_PATHS:
+                    _routes[path_key] = route
+            key = (scope["method"], route, status)
+            hist = _requests.get(key)
+            if hist is None:
+                hist = _requests.setdefault(key, Histogram(LATENCY_BUCKETS))
+            hist.observe(elapsed)
+
+
+def _http_families():
+    counts, latencies = [], []
+    for (method, route, status), hist in list(_requests.items()):
+        labels = {"method": method, "route": route, "status": status}
+        counts.append((labels, hist.n))
+        latencies.append((labels, hist))
+    yield ("shopmind_http_requests_total", "counter",
+           "HTTP requests by route template and status.", counts)
+    yield ("shopmind_http_request_duration_seconds", "histogram",
+           "HTTP request latency by route template and status.", latencies)
+    yield ("shopmind_http_requests_in_flight", "gauge",
+           "HTTP requests currently being served.",
+           [({"method": m, "route": r}, n) for (m, r), n in list(_in_flight.items())])
+
+
+register_collector("http", _http_families)
+
+
+# ── Caches ────────────────────────────────────────────────────────────────────
+
+_cache_hits   = {}
+_cache_misses = {}
+
+
+def cache_hit(cache: str) -> None:
+    _cache_hits[cache] = _cache_hits.get(cache, 0) + 1
+
+
+def cache_miss(cache: str) -> None:
+    _cache_misses[cache] = _cache_misses.get(cache, 0) + 1
+
+
+def _cache_families():
+    names = sorted(set(_cache_hits) | set(_cache_misses))
+    hits   = {n: _cache_hits.get(n, 0) for n in names}
+    misses = {n: _cache_misses.get(n, 0) for n in names}
+    yield ("shopmind_cache_hits_total", "counter", "Cache lookups served from cache.",
+           [({"cache": n}, hits[n]) for n in names])
+    yield ("shopmind_cache_misses_total", "counter", "Cache lookups that had to compute or load.",
+           [({"cache": n}, misses[n]) for n in names])
+    yield ("shopmind_cache_hit_ratio", "gauge", "hits / (hits + misses) since start.",
+           [({"cache": n}, hits[n] / (hits[n] + misses[n])) for n in names if hits[n] + misses[n]])
+
+
+register_collector("caches", _cache_families)
+
+
+# ── LLM calls ─────────────────────────────────────────────────────────────────
+
+_llm_latency = {}
+_llm_errors  = {}
+_llm_lock    = threading.Lock()
+
+
+def observe_llm(caller: str, seconds: float, ok: bool) -> None:
+    """Record one Hugging Face call made by `caller` (e.g. "insights")."""
+    with _llm_lock:
+        hist = _llm_latency.get(caller)
+        if hist is None:
+            hist = _llm_latency[caller] = Histogram(LLM_BUCKETS)
+        hist.observe(seconds)
+        if not ok:
+            _llm_errors[caller] = _llm_errors.get(caller, 0) + 1
+
+
+def _llm_families():
+    callers = sorted(_llm_latency)
+    yield ("shopmind_llm_request_duration_seconds", "histogram", "LLM API call latency.",
+           [({"caller": c}, _llm_latency[c]) for c in callers])
+    yield ("shopmind_llm_errors_total", "counter", "LLM API calls that failed or returned non-200.",
+           [({"caller": c}, _llm_errors.get(c, 0)) for c in callers])
+
+
+register_collector("llm", _llm_families)
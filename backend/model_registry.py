@@ -0,0 +1,444 @@
+"""
+Model Registry - Versioned, lazily loaded model artifacts with hot swap
+Each training run of dataset_processing/train_models.py writes a new version
+directory under final_models/versions/ (one joblib artifact per model) and then
+atomically repoints final_models/versions/CURRENT at it.
+
+Artifacts are loaded on first use with mmap_mode="r" so numpy-backed
+estimators (scalers, IsolationForest trees) are paged in from disk instead of
+copied onto the heap. A background watcher notices a new CURRENT, loads and
+warms the new version off the request path (artifacts and global SHAP
+importances), validates it on a canary batch and only then swaps it in; the
+previous version is kept for instant rollback. Manual rollback over HTTP is
+disabled unless SHOPMIND_MODEL_ADMIN_TOKEN is set, and then needs the
+X-Admin-Token header.
+"""
+
+import functools
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+
+import attributions
+import metrics
+from feature_pipeline import FeaturePipeline
+from startup import rss_bytes
+
+logger = logging.getLogger("shopmind.models")
+
+_BASE = os.path.dirname(__file__)
+VERSIONS_DIR = os.path.join(_BASE, "final_models", "versions")
+CURRENT_FILE = "CURRENT"
+# Pre-versioning layout, served as version "unversioned" when no CURRENT exists.
+LEGACY_MODELS_DIR = os.path.join(_BASE, "final_models", "models")
+
+POLL_SECONDS = float(os.getenv("SHOPMIND_MODEL_POLL_SECONDS", "10"))
+ADMIN_TOKEN  = os.getenv("SHOPMIND_MODEL_ADMIN_TOKEN", "")
+CANARY_ROWS = 16
+
+# name -> what the artifact holds; also the set reported by stats()
+ARTIFACTS = {
+    "subscription": "XGBClassifier + StandardScaler + feature list",
+    "anomaly":      "IsolationForest + StandardScaler + feature list",
+    "advanced":     "StandardScaler + feature lists shared by clv/churn/sentiment",
+    "clv":          "XGBRegressor on log1p(CLV)",
+    "churn":        "XGBClassifier on advanced features + predicted CLV",
+    "sentiment":    "XGBClassifier on advanced features",
+    "features":     "FeaturePipeline state: RFM bin edges, High_Value threshold, one-hot vocabularies",
+}
+
+
+class ModelNotAvailable(RuntimeError):
+    """Raised when a model artifact is missing or failed to load."""
+
+
+def _parse_required(value: str) -> list:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+# Models the API must not start without, e.g. SHOPMIND_REQUIRED_MODELS=subscription.
+# Empty by default so a checkout without trained artifacts still serves heuristics.
+REQUIRED_MODELS = _parse_required(os.getenv("SHOPMIND_REQUIRED_MODELS", ""))
+# Startup warm-up loads only REQUIRED_MODELS; the rest load on first use,
+# unless SHOPMIND_WARM_ALL_MODELS=1 loads every artifact before /ready.
+WARM_ALL_MODELS = os.getenv("SHOPMIND_WARM_ALL_MODELS", "0") == "1"
+
+# name -> what serves requests while that artifact is missing or failed to
+# load; declared by the routers (declare_fallback), warned about at startup
+# and reported by stats() so a silent fallback shows up in /model-metrics.
+FALLBACKS = {}
+
+
+def declare_fallback(name: str, description: str) -> None:
+    FALLBACKS[name] = description
+
+
+class ModelRegistry:
+    """Lazily loads per-model artifacts and records load cost for each one."""
+
+    def __init__(self, models_dir: str, version: str = "unversioned", mmap_mode: str = "r"):
+        self.models_dir = models_dir
+        self.version    = version
+        self.mmap_mode  = mmap_mode
+        self._loaded    = {}
+        self._errors    = {}
+        self._stats     = {}
+        self._pipeline  = None
+        self._lock      = threading.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.models_dir, f"{name}.joblib")
+
+    def available(self, name: str) -> bool:
+        """True if the artifact exists on disk and has not failed to load."""
+        return name not in self._errors and os.path.exists(self.path(name))
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def get(self, name: str) -> dict:
+        """Return the artifact dict for `name`, loading it on first use."""
+        artifact = self._loaded.get(name)
+        if artifact is not None:
+            metrics.cache_hit("models")
+            return artifact
+        metrics.cache_miss("models")
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            if name in self._errors:
+                raise ModelNotAvailable(self._errors[name])
+            return self._load(name)
+
+    def _load(self, name: str) -> dict:
+        path = self.path(name)
+        if not os.path.exists(path):
+            self._errors[name] = f"Model artifact '{name}' not found at {path}"
+            raise ModelNotAvailable(self._errors[name])
+
+        rss_before = rss_bytes()
+        t0 = time.perf_counter()
+        try:
+            artifact = joblib.load(path, mmap_mode=self.mmap_mode)
+        except Exception as e:
+            self._errors[name] = f"Model artifact '{name}' failed to load: {e}"
+            logger.error(self._errors[name])
+            raise ModelNotAvailable(self._errors[name]) from e
+        elapsed = time.perf_counter() - t0
+
+        # RSS delta includes first-use imports (e.g. xgboost) for the first
+        # model that needs them; mmapped arrays only count once paged in.
+        self._stats[name] = {
+            "load_seconds":    round(elapsed, 4),
+            "rss_delta_bytes": max(rss_bytes() - rss_before, 0),
+            "file_bytes":      os.path.getsize(path),
+            "mmap_mode":       self.mmap_mode,
+        }
+        logger.info("Loaded model '%s' in %.1f ms (+%d bytes RSS)",
+                    name, elapsed * 1000, self._stats[name]["rss_delta_bytes"])
+        self._loaded[name] = artifact
+        return artifact
+
+    def pipeline(self) -> FeaturePipeline:
+        """
+        The FeaturePipeline this version was trained with; versions that
+        predate the "features" artifact get the legacy hand-picked edges.
+        """
+        if self._pipeline is None:
+            state = self.get("features") if self.available("features") else None
+            self._pipeline = FeaturePipeline.from_artifact(state)
+        return self._pipeline
+
+    def require(self, names) -> None:
+        """Fail loudly if any of `names` has no artifact on disk."""
+        missing = [n for n in names if not os.path.exists(self.path(n))]
+        if missing:
+            raise ModelNotAvailable(
+                f"Required model artifact(s) missing: {', '.join(missing)} "
+                f"(looked in {self.models_dir}). Run dataset_processing/train_models.py "
+                f"or remove them from SHOPMIND_REQUIRED_MODELS."
+            )
+
+    def warn_fallbacks(self) -> list:
+        """Log a warning for every declared fallback that is in use; returns their names."""
+        missing = [n for n in FALLBACKS if not self.available(n)]
+        for name in missing:
+            logger.warning("Model '%s' not available in %s; serving %s", name, self.models_dir, FALLBACKS[name])
+        return missing
+
+    def manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.models_dir, "manifest.json")) as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def warm_up(self, names=None) -> None:
+        """Eagerly load `names` (default: every artifact present on disk) and the feature pipeline."""
+        for name in ARTIFACTS if names is None else names:
+            if os.path.exists(self.path(name)):
+                self.get(name)
+        self.pipeline()
+
+    def stats(self) -> dict:
+        """Per-model availability, load state, load cost and whether its fallback is serving."""
+        result = {}
+        for name in ARTIFACTS:
+            entry = {
+                "available": self.available(name),
+                "loaded":    self.is_loaded(name),
+            }
+            entry.update(self._stats.get(name, {}))
+            if name in self._errors:
+                entry["error"] = self._errors[name]
+            if name in REQUIRED_MODELS:
+                entry["required"] = True
+            if name in FALLBACKS:
+                entry["fallback"] = FALLBACKS[name]
+                entry["fallback_active"] = not entry["available"]
+            result[name] = entry
+        return result
+
+
+# ── Canary validation ─────────────────────────────────────────────────────────
+
+def _canary_matrix(scaler, rows: int = CANARY_ROWS) -> np.ndarray:
+    """In-distribution rows drawn around the scaler's fitted mean/scale."""
+    rng = np.random.default_rng(42)
+    raw = scaler.mean_ + scaler.scale_ * rng.standard_normal((rows, len(scaler.mean_)))
+    return scaler.transform(raw)
+
+
+def _check_proba(proba, n_classes: int, name: str) -> None:
+    proba = np.asarray(proba)
+    if proba.shape != (CANARY_ROWS, n_classes):
+        raise ValueError(f"{name}: expected probabilities of shape {(CANARY_ROWS, n_classes)}, got {proba.shape}")
+    if not np.all(np.isfinite(proba)) or not np.allclose(proba.sum(axis=1), 1.0, atol=1e-4):
+        raise ValueError(f"{name}: probabilities are not finite or do not sum to 1")
+
+
+def validate(models: ModelRegistry) -> dict:
+    """
+    Run every available model of a version on a synthetic canary batch.
+    Raises ValueError on the first failing check; returns per-model checks.
+    """
+    checks = {}
+    if models.available("features"):
+        pipeline = models.pipeline()
+        for edges in (pipeline.f_edges, pipeline.m_edges):
+            if len(edges) != 4 or np.any(np.diff(edges) < 0):
+                raise ValueError("features: RFM bin edges are not 4 sorted values")
+        if models.available("advanced"):
+            expected = [f for f in models.get("advanced")["features"]
+                        if f.startswith(("Gender_", "Category_", "Season_"))]
+            missing = set(expected) - set(pipeline.one_hot_columns())
+            if missing:
+                raise ValueError(f"features: vocabularies do not produce {sorted(missing)}")
+        checks["features"] = "ok"
+
+    if models.available("subscription"):
+        art = models.get("subscription")
+        _check_proba(art["model"].predict_proba(_canary_matrix(art["scaler"])), 2, "subscription")
+        checks["subscription"] = "ok"
+
+    if models.available("anomaly"):
+        art = models.get("anomaly")
+        scores = art["model"].decision_function(_canary_matrix(art["scaler"]))
+        if np.shape(scores) != (CANARY_ROWS,) or not np.all(np.isfinite(scores)):
+            raise ValueError("anomaly: decision_function returned invalid scores")
+        checks["anomaly"] = "ok"
+
+    if models.available("advanced"):
+        adv = models.get("advanced")
+        X_adv = _canary_matrix(adv["scaler"])
+        clv_log = None
+        if models.available("clv"):
+            clv_log = np.asarray(models.get("clv")["model"].predict(X_adv))
+            if clv_log.shape != (CANARY_ROWS,) or not np.all(np.isfinite(clv_log)):
+                raise ValueError("clv: predictions are not finite")
+            checks["clv"] = "ok"
+        if models.available("churn") and clv_log is not None:
+            proba = models.get("churn")["model"].predict_proba(np.c_[X_adv, clv_log])
+            _check_proba(proba, 2, "churn")
+            checks["churn"] = "ok"
+        if models.available("sentiment"):
+            _check_proba(models.get("sentiment")["model"].predict_proba(X_adv), 3, "sentiment")
+            checks["sentiment"] = "ok"
+    return checks
+
+
+# ── Versioned store ───────────────────────────────────────────────────────────
+
+class ModelStore:
+    """
+    Holds the active ModelRegistry and swaps in new versions without restarts.
+
+    Request handlers call active() once and use that registry for the whole
+    request, so a swap mid-request can never mix models from two versions.
+    """
+
+    def __init__(self, versions_dir: str = VERSIONS_DIR, poll_seconds: float = POLL_SECONDS):
+        self.versions_dir = versions_dir
+        self.poll_seconds = poll_seconds
+        self._active      = self._initial_registry()
+        self._seen_pointer = self.current_pointer()
+        self._previous    = None
+        self._history     = []
+        self._rejected    = set()
+        self._swap_lock   = threading.Lock()
+        self._stop        = threading.Event()
+        self._watcher     = None
+
+    def _initial_registry(self) -> ModelRegistry:
+        version = self.current_pointer()
+        if version:
+            return ModelRegistry(os.path.join(self.versions_dir, version), version)
+        return ModelRegistry(LEGACY_MODELS_DIR)
+
+    def current_pointer(self):
+        """Version id named by versions/CURRENT, or None."""
+        try:
+            with open(os.path.join(self.versions_dir, CURRENT_FILE)) as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return version if version and os.path.isdir(os.path.join(self.versions_dir, version)) else None
+
+    def active(self) -> ModelRegistry:
+        return self._active
+
+    @property
+    def version(self) -> str:
+        return self._active.version
+
+    def activate(self, version: str) -> dict:
+        """Load, warm and canary-validate `version`, then make it active."""
+        t0 = time.perf_counter()
+        candidate = ModelRegistry(os.path.join(self.versions_dir, version), version)
+        candidate.warm_up()
+        checks = validate(candidate)
+        candidate.warn_fallbacks()
+        attributions.warm_up(candidate)
+        with self._swap_lock:
+            # A single reference assignment: readers see either version, never a mix.
+            self._previous, self._active = self._active, candidate
+        event = {
+            "version":  version,
+            "from":     self._previous.version,
+            "checks":   checks,
+            "seconds":  round(time.perf_counter() - t0, 3),
+            "at":       time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._history.append(event)
+        logger.info("Activated model version %s (was %s)", version, self._previous.version)
+        return event
+
+    def rollback(self) -> dict:
+        """Swap back to the previously active version (already warm)."""
+        target = self._previous
+        if target is not None:
+            attributions.warm_up(target)    # normally cached since its own activation
+        with self._swap_lock:
+            if self._previous is None:
+                raise ModelNotAvailable("No previous model version to roll back to")
+            self._previous, self._active = self._active, self._previous
+        event = {
+            "version":  self._active.version,
+            "from":     self._previous.version,
+            "rollback": True,
+            "at":       time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._history.append(event)
+        logger.warning("Rolled back model version %s -> %s", self._previous.version, self._active.version)
+        return event
+
+    def check_for_update(self) -> None:
+        """
+        Activate versions/CURRENT when it changes. Only pointer *changes* are
+        acted on, so a manual rollback is not undone by the next poll.
+        """
+        pointer = self.current_pointer()
+        if not pointer or pointer == self._seen_pointer:
+            return
+        self._seen_pointer = pointer
+        if pointer == self._active.version or pointer in self._rejected:
+            return
+        try:
+            self.activate(pointer)
+        except Exception as e:
+            self._rejected.add(pointer)
+            self._history.append({"version": pointer, "rejected": True, "error": str(e),
+                                  "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+            logger.error("Rejected model version %s: %s", pointer, e)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            self.check_for_update()
+
+    def start_watcher(self) -> None:
+        if self.poll_seconds <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+    def versions(self) -> list:
+        try:
+            return sorted(d for d in os.listdir(self.versions_dir)
+                          if os.path.isdir(os.path.join(self.versions_dir, d)) and not d.startswith("."))
+        except OSError:
+            return []
+
+    def status(self) -> dict:
+        return {
+            "active_version":   self._active.version,
+            "previous_version": self._previous.version if self._previous else None,
+            "pointer":          self.current_pointer(),
+            "available":        self.versions(),
+            "history":          self._history[-10:],
+        }
+
+
+def admin_authorized(token: str) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+store = ModelStore()
+
+
+def registry_for(models_dir: str, version: str) -> ModelRegistry:
+    """
+    The active registry when it is `version`, else a private cached one. For
+    code that is handed a (models_dir, version) pair, e.g. compute workers.
+    """
+    active = store.active()
+    return active if active.version == version else _other_registry(models_dir, version)
+
+
+@functools.lru_cache(maxsize=2)
+def _other_registry(models_dir: str, version: str) -> ModelRegistry:
+    return ModelRegistry(models_dir, version)
+
+
+def _model_families():
+    models = store.active()
+    stats = models.stats()
+    yield ("shopmind_model_version_info", "gauge", "Active model version (value is always 1).",
+           [({"version": models.version}, 1)])
+    yield ("shopmind_model_available", "gauge", "1 if the model artifact exists and has not failed to load.",
+           [({"model": n}, int(s["available"])) for n, s in stats.items()])
+    yield ("shopmind_model_loaded", "gauge", "1 if the model artifact is loaded in this process.",
+           [({"model": n}, int(s["loaded"])) for n, s in stats.items()])
+    yield ("shopmind_model_load_seconds", "gauge", "Time taken to load the model artifact.",
+           [({"model": n}, s["load_seconds"]) for n, s in stats.items() if "load_seconds" in s])
+
+
+metrics.register_collector("models", _model_families)
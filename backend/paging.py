@@ -0,0 +1,134 @@
+"""
+Paging - Cursor pagination, field projection and top-N over precomputed lists
+Analytics lists (association rules, per-category / per-item / per-location
+breakdowns) are computed once per dataset, so their sort orders are too: a
+SortedIndex holds one argsort per sortable field and direction, built when
+the list is, and a page is a slice of that order. Min-value filters are one
+vectorised mask over a precomputed column; no request sorts anything.
+
+Cursors are opaque (base64 JSON of sort, filters, offset and a digest of the
+list), so a cursor is only accepted for the query and data it came from.
+Invalid sorts, fields or cursors raise PagingError (HTTP 400 in the routers).
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+
+import numpy as np
+
+MAX_LIMIT = 500
+
+
+class PagingError(ValueError):
+    """Bad sort / fields / cursor / limit in a paged request."""
+
+
+def parse_fields(fields):
+    """"a,b,c" -> ["a", "b", "c"]; None or "" -> None (all fields)."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+
+def project(record: dict, fields) -> dict:
+    """Keep only `fields` of a record (all when fields is None); unknown fields raise."""
+    if fields is None:
+        return record
+    unknown = [f for f in fields if f not in record]
+    if unknown:
+        raise PagingError(f"Unknown field(s): {', '.join(unknown)}. Valid: {', '.join(record)}")
+    return {f: record[f] for f in fields}
+
+
+def _encode(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise PagingError("Malformed cursor")
+    if not isinstance(state, dict) or not isinstance(state.get("o"), int) or state["o"] < 0:
+        raise PagingError("Malformed cursor")
+    return state
+
+
+class SortedIndex:
+    """
+    Immutable list of records with precomputed orders. `sort_fields` may be
+    sorted ascending ("field") or descending ("-field"); ties keep the
+    records' original order in both directions. Numeric sort fields can also
+    be filtered with minimums.
+    """
+
+    def __init__(self, records: list, sort_fields, default_sort: str):
+        self.records  = list(records)
+        self.fields   = list(self.records[0]) if self.records else []
+        self.default_sort = default_sort
+        self.digest   = hashlib.sha1(json.dumps(self.records, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        self._orders  = {}
+        self._columns = {}
+        n = len(self.records)
+        for field in sort_fields:
+            values = [r.get(field) for r in self.records]
+            if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                col = np.asarray(values, dtype=float)
+                self._columns[field] = col
+                self._orders[field]       = np.argsort(col, kind="stable")
+                self._orders["-" + field] = np.argsort(-col, kind="stable")
+            else:
+                keys = [str(v) for v in values]
+                self._orders[field]       = np.asarray(sorted(range(n), key=keys.__getitem__), dtype=np.int64)
+                self._orders["-" + field] = np.asarray(sorted(range(n), key=keys.__getitem__, reverse=True), dtype=np.int64)
+        self._check_sort(default_sort)
+
+    @property
+    def sorts(self) -> list:
+        return sorted(self._orders)
+
+    def _check_sort(self, sort: str) -> None:
+        if sort not in self._orders:
+            raise PagingError(f"Cannot sort by '{sort}'. Valid: {', '.join(self.sorts)}")
+
+    def page(self, sort: str = None, limit: int = None, cursor: str = None,
+             fields=None, minimums: dict = None) -> dict:
+        """
+        One page: {"items", "total", "sort", "limit", "next_cursor"}. limit
+        None returns everything after the cursor (the unpaged response);
+        minimums maps numeric fields to inclusive lower bounds.
+        """
+        sort = sort or self.default_sort
+        self._check_sort(sort)
+        if limit is not None and not 1 <= limit <= MAX_LIMIT:
+            raise PagingError(f"limit must be between 1 and {MAX_LIMIT}")
+        minimums = {k: float(v) for k, v in (minimums or {}).items() if v is not None}
+        for field in minimums:
+            if field not in self._columns:
+                raise PagingError(f"Cannot filter on '{field}'")
+
+        offset = 0
+        if cursor:
+            state = _decode(cursor)
+            if state.get("d") != self.digest:
+                raise PagingError("Cursor is from an older version of this data; restart from the first page")
+            if state.get("s") != sort or state.get("m") != minimums:
+                raise PagingError("Cursor does not match this query's sort or filters")
+            offset = state["o"]
+
+        order = self._orders[sort]
+        if minimums:
+            mask = np.ones(len(self.records), dtype=bool)
+            for field, low in minimums.items():
+                mask &= self._columns[field] >= low
+            order = order[mask[order]]
+
+        total = len(order)
+        end = total if limit is None else min(offset + limit, total)
+        items = [project(self.records[i], fields) for i in order[offset:end]]
+        next_cursor = _encode({"s": sort, "m": minimums, "o": end, "d": self.digest}) if end < total else None
+        return {"items": items, "total": total, "sort": sort, "limit": limit, "next_cursor": next_cursor}
@@ -0,0 +1,226 @@
+"""
+Profiling - Opt-in per-request sampling profiler and Server-Timing breakdown
+Disabled unless SHOPMIND_PROFILE_TOKEN (or SHOPMIND_SERVER_TIMING=1) is set;
+the middleware is then not installed at all and phase() costs one
+ContextVar lookup.
+
+With a token configured, a request is profiled when it carries
+`?__profile=1` (or `X-Profile: 1`) plus `X-Profile-Token: <token>`:
+
+  * a sampling thread records the Python stacks every PROFILE_INTERVAL_MS
+    while the request runs and stores them as folded stacks (flamegraph.pl /
+    speedscope input), retrievable from /debug/profiles/{id};
+  * the response gets `X-Profile-Id` and a `Server-Timing` header splitting
+    the request into dataset, inference, llm and serialization time as
+    marked by phase() in the code, plus the total.
+
+Sampling is process-wide, so stacks of other requests served concurrently by
+the same worker appear in the profile too; idle threads are filtered out.
+"""
+
+import collections
+import contextvars
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+
+PROFILE_TOKEN       = os.getenv("SHOPMIND_PROFILE_TOKEN", "")
+ENABLED             = bool(PROFILE_TOKEN)
+PROFILE_INTERVAL_MS = float(os.getenv("SHOPMIND_PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP        = int(os.getenv("SHOPMIND_PROFILE_KEEP", "50"))
+# Server-Timing on every request, not just profiled ones.
+SERVER_TIMING_ALWAYS = os.getenv("SHOPMIND_SERVER_TIMING", "0") == "1"
+
+PHASES = ("dataset", "inference", "llm", "serialization")
+
+# Leaf functions of a thread that is parked rather than working.
+_IDLE_LEAVES = {"wait", "select", "poll", "_wait_for_tstate_lock", "accept", "sleep"}
+
+_current = contextvars.ContextVar("shopmind_request_timings", default=None)
+_NULL = nullcontext()
+
+
+# ── Phase markers ─────────────────────────────────────────────────────────────
+
+class _Phase:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: dict, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+def phase(name: str):
+    """
+    Context manager attributing the enclosed time to `name` in Server-Timing.
+    A shared no-op context when the current request is not being timed.
+    """
+    timings = _current.get()
+    return _NULL if timings is None else _Phase(timings, name)
+
+
+class TimedJSONResponse(JSONResponse):
+    """App-wide default response class; JSON rendering counts as serialization."""
+
+    def render(self, content) -> bytes:
+        with phase("serialization"):
+            return super().render(content)
+
+
+# ── Sampling profiler ─────────────────────────────────────────────────────────
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    """Samples every other thread's stack until stop(); stacks are folded."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        super().__init__(name="shopmind-profiler", daemon=True)
+        self.interval = interval_ms / 1000.0
+        self.stacks   = collections.Counter()
+        self.samples  = 0
+        self._halt    = threading.Event()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._halt.wait(self.interval):
+            names.update((t.ident, t.name) for t in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_name in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+# ── Stored profiles ───────────────────────────────────────────────────────────
+
+_profiles = collections.OrderedDict()     # id -> record, oldest first
+_ids      = itertools.count(1)
+_lock     = threading.Lock()
+
+
+def _store(record: dict) -> None:
+    with _lock:
+        _profiles[record["id"]] = record
+        while len(_profiles) > PROFILE_KEEP:
+            _profiles.popitem(last=False)
+
+
+def list_profiles() -> list:
+    with _lock:
+        return [{k: v for k, v in p.items() if k != "folded"} for p in reversed(_profiles.values())]
+
+
+def get_profile(profile_id: str):
+    with _lock:
+        return _profiles.get(profile_id)
+
+
+def authorized(token: str) -> bool:
+    return ENABLED and bool(token) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = [f"{name};dur={timings[name] * 1000:.2f}" for name in PHASES if name in timings]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+
+class ProfilingMiddleware:
+    """Raw ASGI middleware; installed by app.py only when ENABLED or SERVER_TIMING_ALWAYS."""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _requested(scope) -> tuple:
+        headers = dict(scope.get("headers") or ())
+        wanted = headers.get(b"x-profile") == b"1"
+        if not wanted and b"__profile" in scope.get("query_string", b""):
+            wanted = parse_qs(scope["query_string"].decode()).get("__profile") == ["1"]
+        token = headers.get(b"x-profile-token", b"").decode()
+        return wanted, token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        wanted, token = self._requested(scope)
+        profile = wanted and authorized(token)
+        if not profile and not SERVER_TIMING_ALWAYS:
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        ctx_token = _current.set(timings)
+        sampler = None
+        profile_id = None
+        if profile:
+            profile_id = f"{int(time.time())}-{next(_ids)}"
+            sampler = Sampler()
+            sampler.start()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing",
+                                server_timing(timings, time.perf_counter() - start).encode()))
+                if profile_id:
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(ctx_token)
+            if sampler is not None:
+                sampler.stop()
+                _store({
+                    "id":          profile_id,
+                    "method":      scope["method"],
+                    "path":        scope["path"],
+                    "started_at":  time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - elapsed)),
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "samples":     sampler.samples,
+                    "interval_ms": PROFILE_INTERVAL_MS,
+                    "phases_ms":   {k: round(v * 1000, 3) for k, v in timings.items()},
+                    "folded":      sampler.folded(),
+                })
@@ -0,0 +1,227 @@
+"""
+Reach - HyperLogLog distinct counts of Customer ID per (category, season, location) cell
+Each cell of the cube holds 2^p one-byte HLL registers (4 KB at the default
+p=12), whatever its row count. Customer IDs are hashed with splitmix64
+(vectorised over uint64); the top p bits pick a register and the register
+keeps the longest run of leading zeros seen in the rest. Registers merge by
+element-wise max, so any roll-up ("Footwear in Winter in Texas", "Footwear
+anywhere", a multi-state region) is the max over the matching cells, and an
+ingested batch is merged the same way.
+
+Error: relative standard error 1.04 / sqrt(2^p) (~1.6% at p=12; ~3.3% at
+two standard errors), with linear counting below 2.5 * 2^p for small counts.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from snapshot import load_dataset
+
+PRECISION  = int(os.getenv("SHOPMIND_REACH_PRECISION", "12"))
+REGISTERS  = 1 << PRECISION
+CHUNK_ROWS = int(os.getenv("SHOPMIND_REACH_CHUNK_ROWS", "200000"))
+
+# Cube dimension -> dataset column
+DIMENSIONS = {"category": "Category", "season": "Season", "location": "Location"}
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def splitmix64(x: np.ndarray) -> np.ndarray:
+    """The splitmix64 finaliser over a uint64 array (wrapping arithmetic)."""
+    with np.errstate(over="ignore"):
+        z = np.asarray(x, dtype=np.uint64) + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * _M1
+        z = (z ^ (z >> np.uint64(27))) * _M2
+        return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Vectorised int.bit_length() for uint64 values."""
+    x = x.copy()
+    n = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        n[big] += shift
+        x[big] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+def register_updates(customer_ids: np.ndarray, p: int = PRECISION) -> tuple:
+    """(register index, rank) per id: rank = leading zeros of the low 64-p hash bits, plus one."""
+    h = splitmix64(customer_ids)
+    idx = (h >> np.uint64(64 - p)).astype(np.int64)
+    rest = h & np.uint64((1 << (64 - p)) - 1)
+    rank = (64 - p) - _bit_length(rest) + 1
+    return idx, rank.astype(np.uint8)
+
+
+def estimate(registers: np.ndarray) -> np.ndarray:
+    """HLL cardinality estimate per row of a (cells, 2^p) register array (or one register vector)."""
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    raw[small] = m * np.log(m / zeros[small])
+    return raw
+
+
+def relative_error(p: int = PRECISION) -> float:
+    """Relative standard error of one estimate."""
+    return float(1.04 / np.sqrt(1 << p))
+
+
+class ReachCube:
+    """HLL registers per cell, keyed by a (category, season, location) tuple."""
+
+    def __init__(self, p: int = PRECISION):
+        self.p     = p
+        self.cells = {}         # cell key tuple -> uint8[2^p]
+        self.rows  = 0
+
+    def update_frame(self, df) -> "ReachCube":
+        """Fold a CSV-named frame into the cube: one register scatter per cell, no per-row work."""
+        if "Customer ID" not in df.columns:
+            return self
+        ids = df["Customer ID"].to_numpy(dtype=float)
+        known = ~np.isnan(ids)
+        idx, rank = register_updates(ids[known].astype(np.int64).astype(np.uint64), self.p)
+        # One integer code per cell: the per-dimension factorize codes combined.
+        cell = np.zeros(int(known.sum()), dtype=np.int64)
+        names = []
+        for col in DIMENSIONS.values():
+            codes, uniques = pd.factorize(df[col].astype(str).to_numpy(dtype=object)[known])
+            cell = cell * len(uniques) + codes
+            names.append(np.asarray(uniques, dtype=object))
+        present, cell = np.unique(cell, return_inverse=True)
+        regs = np.zeros((len(present), 1 << self.p), dtype=np.uint8)
+        np.maximum.at(regs, (cell, idx), rank)
+        uniq = []
+        for code in present.tolist():
+            key = []
+            for values in reversed(names):
+                code, j = divmod(code, len(values))
+                key.append(str(values[j]))
+            uniq.append(tuple(reversed(key)))
+        for key, r in zip(uniq, regs):
+            mine = self.cells.get(key)
+            self.cells[key] = r if mine is None else np.maximum(mine, r)
+        self.rows += len(df)
+        return self
+
+    def merge(self, other: "ReachCube") -> "ReachCube":
+        for key, r in other.cells.items():
+            mine = self.cells.get(key)
+            self.cells[key] = r.copy() if mine is None else np.maximum(mine, r)
+        self.rows += other.rows
+        return self
+
+    def values(self, dim: str) -> list:
+        i = list(DIMENSIONS).index(dim)
+        return sorted({key[i] for key in self.cells})
+
+    def matching(self, filters: dict) -> list:
+        """Cell keys whose value on every filtered dimension is one of the allowed (case-insensitive)."""
+        allowed = [None if not filters.get(d) else {v.lower() for v in filters[d]} for d in DIMENSIONS]
+        return [key for key in self.cells
+                if all(a is None or v.lower() in a for v, a in zip(key, allowed))]
+
+    def union(self, keys) -> np.ndarray:
+        if not keys:
+            return np.zeros(1 << self.p, dtype=np.uint8)
+        return np.max(np.stack([self.cells[k] for k in keys]), axis=0)
+
+
+# ── Dataset baseline ──────────────────────────────────────────────────────────
+
+def _compute_baseline():
+    df = load_dataset()
+    if "Customer ID" not in df.columns or not set(DIMENSIONS.values()) <= set(df.columns):
+        return None
+    cube = ReachCube()
+    for start in range(0, len(df), CHUNK_ROWS):
+        cube.merge(ReachCube().update_frame(df.iloc[start:start + CHUNK_ROWS]))
+    return cube
+
+
+snapshot.register("reach.cube", _compute_baseline)
+
+
+# ── Live view ─────────────────────────────────────────────────────────────────
+
+class ReachStream:
+    """The dataset cube with every ingested batch merged in (max is idempotent)."""
+
+    def __init__(self):
+        self._cube  = None
+        self._lock  = threading.Lock()
+        self.ingested_rows = 0
+        self.batches = 0
+
+    def cube(self) -> ReachCube:
+        with self._lock:
+            if self._cube is None:
+                baseline = snapshot.aggregate("reach.cube")
+                self._cube = ReachCube().merge(baseline) if baseline is not None else ReachCube()
+            return self._cube
+
+    def ingest(self, df) -> dict:
+        batch = ReachCube().update_frame(df)
+        cube = self.cube()
+        with self._lock:
+            cube.merge(batch)
+            self.ingested_rows += len(df)
+            self.batches += 1
+        return {"rows": int(len(df)), "cells": len(batch.cells)}
+
+    def reach(self, filters: dict) -> dict:
+        """Estimated distinct customers over the cells matching `filters` ({dim: [values]})."""
+        cube = self.cube()
+        with self._lock:
+            keys = cube.matching(filters)
+            registers = cube.union(keys)
+        est = float(estimate(registers)[0]) if keys else 0.0
+        err = relative_error(cube.p)
+        return {
+            "unique_customers": int(round(est)),
+            "relative_error":   round(err, 4),
+            "interval_95":      [int(round(est * (1 - 2 * err))), int(round(est * (1 + 2 * err)))],
+            "cells":            len(keys),
+        }
+
+    def breakdown(self, by: str, filters: dict) -> list:
+        """Reach per value of dimension `by`, within `filters`; one estimate call for all values."""
+        cube = self.cube()
+        i = list(DIMENSIONS).index(by)
+        with self._lock:
+            keys = cube.matching(filters)
+            values = sorted({k[i] for k in keys})
+            registers = np.stack([cube.union([k for k in keys if k[i] == v]) for v in values]) if values else None
+        if registers is None:
+            return []
+        return [{"value": v, "unique_customers": int(round(e))} for v, e in zip(values, estimate(registers))]
+
+    def stats(self) -> dict:
+        cube = self.cube()
+        return {
+            "algorithm":      "HyperLogLog (splitmix64)",
+            "precision":      cube.p,
+            "registers_per_cell": 1 << cube.p,
+            "relative_error": round(relative_error(cube.p), 4),
+            "cells":          len(cube.cells),
+            "memory_bytes":   len(cube.cells) << cube.p,
+            "dimensions":     list(DIMENSIONS),
+            "ingested_rows":  self.ingested_rows,
+            "ingested_batches": self.batches,
+        }
+
+
+stream = ReachStream()
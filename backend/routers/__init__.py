@@ -1,4 +1,4 @@
 """
 Routers Package - ShopMind Behavior Intelligence Platform
 """
-from . import metadata, affinity, sentiment, segments, predictions, strategy
+from . import metadata, affinity, sentiment, segments, predictions, strategy, ingest, anomalies, debug, jobs, geo, customers, distributions, reach
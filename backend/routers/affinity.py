@@ -2,27 +2,35 @@
 Affinity Router - Category Affinity & Association Rule Analysis
 Normalizes affinity scores proportionally within each segment to eliminate
 the 100% ceiling issue caused by raw count-based calculation.
+Rules are served from a precomputed SortedIndex: ?sort=, ?limit=, ?cursor=
+and ?fields= page through them without re-sorting per request.
 """
 
+from typing import Optional
 from fastapi import APIRouter
 import pandas as pd
 import numpy as np
 import os
 from collections import defaultdict
+import affinity_rules
+import compute
+import paging
+import snapshot
+from snapshot import load_dataset
+import startup
 
 router = APIRouter(prefix="/affinity", tags=["affinity"])
 
 _BASE = os.path.dirname(os.path.dirname(__file__))
 
 try:
-    _df = pd.read_csv(os.path.join(_BASE, "dataset", "shopping_trends.csv"))
-    _df.columns = [c.strip() for c in _df.columns]
+    _df = load_dataset()
     _loaded = True
 except Exception:
     _df = None
     _loaded = False
 
-MIN_SUPPORT_THRESHOLD = 0.20  # transparent, returned in metadata
+MIN_SUPPORT_THRESHOLD = affinity_rules.MIN_SUPPORT_THRESHOLD  # transparent, returned in metadata
 
 
 def _assign_segment(row):
@@ -99,105 +107,73 @@ def _compute_normalized_affinity():
     return result
 
 
-def _compute_rules():
+def _compute_rules(min_support: float = MIN_SUPPORT_THRESHOLD, top: int = 20):
     """
-    Category association rules using segment co-occurrence analysis.
-    Computes support, confidence, lift, and a human-readable strength label.
+    Category association rules (affinity_rules.py), mined on the compute pool
+    so the dataset pass does not hold the GIL next to light endpoints.
     """
     if _df is None:
         return []
-
-    df = _df.copy()
-    if "Category" not in df.columns:
-        return []
-
-    categories = df["Category"].dropna().unique().tolist()
-    n_total    = len(df)
-
-    df["_seg"] = df.apply(_assign_segment, axis=1)
-    cat_counts = df["Category"].value_counts().to_dict()
-
-    rules = []
-    for cat_a in categories:
-        for cat_b in categories:
-            if cat_a == cat_b:
-                continue
-            segs_a = set(df[df["Category"] == cat_a]["_seg"].unique())
-            segs_b = set(df[df["Category"] == cat_b]["_seg"].unique())
-            shared = segs_a & segs_b
-            if not shared:
-                continue
-
-            support    = round(len(shared) / 4.0, 4)
-            cnt_a      = cat_counts.get(cat_a, 1)
-            cnt_b      = cat_counts.get(cat_b, 1)
-            confidence = round(min(cnt_b / cnt_a, 1.0) * len(shared) / 4.0 + 0.1, 4)
-            lift       = round(confidence / max(cnt_b / n_total, 0.001), 4)
-
-            if support >= MIN_SUPPORT_THRESHOLD:
-                lift_label = "Strong" if lift >= 2.0 else ("Moderate" if lift >= 1.3 else "Weak")
-                rules.append({
-                    "antecedent":    cat_a,
-                    "consequent":    cat_b,
-                    "support":       support,
-                    "confidence":    confidence,
-                    "lift":          lift,
-                    "lift_strength": lift_label,
-                })
-
-    rules.sort(key=lambda r: r["lift"], reverse=True)
-    seen, unique = set(), []
-    for r in rules:
-        key = tuple(sorted([r["antecedent"], r["consequent"]]))
-        if key not in seen:
-            seen.add(key)
-            unique.append(r)
-    return unique[:20]
+    return compute.run_sync("rules", affinity_rules.mine_dataset, min_support, top)
 
 
 # ── Pre-compute at startup ────────────────────────────────────────────────────
-_affinity_data = _compute_normalized_affinity()
-_rules_data    = _compute_rules()
+with startup.phase("affinity._compute_normalized_affinity"):
+    _affinity_data = snapshot.aggregate("affinity.normalized", _compute_normalized_affinity)
+with startup.phase("affinity._compute_rules"):
+    _rules_data    = snapshot.aggregate("affinity.rules", _compute_rules)
+
+_rules_index = paging.SortedIndex(_rules_data, ("lift", "support", "confidence", "antecedent", "consequent"),
+                                  default_sort="-lift")
+_segments    = list(_affinity_data.keys())
+_categories  = sorted(set(cat for v in _affinity_data.values() for cat in v.get("category_affinity", {})))
+_matrix      = [{"segment": seg, **vals.get("category_affinity", {})} for seg, vals in _affinity_data.items()]
+_top_bundles = _rules_index.page(limit=3)["items"] if _rules_data else []
 
 
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
 @router.get("")
-def get_affinity_overview():
-    """Category affinity matrix per segment (normalized, no 100% ceiling)."""
-    data    = _affinity_data
-    segs    = list(data.keys())
-    cats    = sorted(set(cat for v in data.values() for cat in v.get("category_affinity", {})))
-
-    matrix = []
-    for seg, vals in data.items():
-        row = {"segment": seg}
-        row.update(vals.get("category_affinity", {}))
-        matrix.append(row)
-
-    top_rules = sorted(_rules_data, key=lambda r: r["lift"], reverse=True)[:3]
-
-    return {
-        "segments":           segs,
-        "categories":         cats,
-        "affinity_matrix":    matrix,
-        "association_rules":  _rules_data,
+def get_affinity_overview(rules_limit: Optional[int] = None, rules_cursor: Optional[str] = None,
+                          fields: Optional[str] = None):
+    """
+    Category affinity matrix per segment (normalized, no 100% ceiling).
+    rules_limit keeps only the top-N rules by lift (page on with
+    rules_cursor=rules_next_cursor); fields projects top-level keys.
+    """
+    rules = _rules_index.page(limit=rules_limit, cursor=rules_cursor)
+    result = {
+        "segments":           _segments,
+        "categories":         _categories,
+        "affinity_matrix":    _matrix,
+        "association_rules":  rules["items"],
         "total_rules":        len(_rules_data),
-        "top_bundles":        top_rules,
+        "top_bundles":        _top_bundles,
         "min_support":        MIN_SUPPORT_THRESHOLD,
         "normalization":      "relative-to-segment-max",
     }
+    if rules_limit is not None:
+        result["rules_next_cursor"] = rules["next_cursor"]
+    return paging.project(result, paging.parse_fields(fields))
 
 
 @router.get("/rules")
-def get_association_rules(min_lift: float = 1.0):
-    """Association rules filtered by minimum lift threshold."""
-    filtered = [r for r in _rules_data if r["lift"] >= min_lift]
+def get_association_rules(min_lift: float = 1.0, sort: Optional[str] = None, limit: Optional[int] = None,
+                          cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Association rules filtered by minimum lift threshold, highest lift first.
+    sort takes any of lift/support/confidence/antecedent/consequent ("-" for
+    descending); limit/cursor page through the result, fields projects rules.
+    """
+    page = _rules_index.page(sort=sort, limit=limit, cursor=cursor,
+                             fields=paging.parse_fields(fields), minimums={"lift": min_lift})
     return {
-        "rules":       filtered,
-        "total":       len(filtered),
+        "rules":       page["items"],
+        "total":       page["total"],
         "min_lift":    min_lift,
         "min_support": MIN_SUPPORT_THRESHOLD,
+        "sort":        page["sort"],
+        "next_cursor": page["next_cursor"],
     }
 
 
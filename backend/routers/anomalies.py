@@ -0,0 +1,44 @@
+"""
+Anomalies Router - Streaming anomaly detection over ingested transactions
+Serves the sliding window and top-K heap maintained by anomaly_stream.py,
+which scores every batch posted to /ingest/transactions.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+
+import ingest
+from anomaly_stream import stream
+from model_registry import store as model_store
+
+router = APIRouter(prefix="/anomalies", tags=["anomalies"])
+
+ingest.subscribe("anomalies", stream.ingest)
+
+
+def _require_model():
+    if not model_store.active().available("anomaly"):
+        raise HTTPException(status_code=503, detail="Anomaly model not available")
+
+
+@router.get("/recent")
+def get_recent_anomalies(limit: int = Query(50, ge=1, le=1000)):
+    """Most recently flagged transactions inside the sliding window, newest first."""
+    _require_model()
+    items = stream.recent(limit)
+    return {"anomalies": items, "total": len(items), "window_seconds": stream.window_seconds}
+
+
+@router.get("/top")
+def get_top_anomalies(k: int = Query(20, ge=1)):
+    """Most anomalous transactions inside the sliding window, highest score first."""
+    _require_model()
+    if k > stream.top_k:
+        raise HTTPException(status_code=400, detail=f"k must be <= {stream.top_k}")
+    items = stream.top(k)
+    return {"anomalies": items, "total": len(items), "window_seconds": stream.window_seconds}
+
+
+@router.get("/stats")
+def get_anomaly_stats():
+    """Throughput, eviction and per-batch scoring latency vs budget."""
+    return stream.stats()
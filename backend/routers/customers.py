@@ -0,0 +1,189 @@
+"""
+Customers Router - Nearest-neighbour "similar customers" search
+Customers are points in the normalised 5-feature space of the serving
+segment centroids (routers/predictions.py: spend / max spend, frequency
+score / 5, previous purchases / max, rating / 5, discount flag). A KD-tree
+over every row is built once per dataset (a snapshot aggregate, so serve.py
+builds it once for all workers) and answers k-NN for a whole batch of
+customers or profiles in one query call instead of scanning the frame.
+"""
+
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+import numpy as np
+import pandas as pd
+
+import clustering
+import snapshot
+from snapshot import load_dataset
+
+router = APIRouter(prefix="/customers", tags=["customers"])
+
+try:
+    _df = load_dataset()
+except Exception:
+    _df = None
+
+MAX_K     = 100
+MAX_BATCH = 1_000
+# As in routers/predictions.py, where "Every 3 Months" is unmapped and falls back to 3.
+FREQ_MAP = {"Weekly": 5, "Bi-Weekly": 4, "Fortnightly": 4, "Monthly": 3, "Quarterly": 2, "Annually": 1}
+FEATURES = ["purchase_amount", "frequency_score", "previous_purchases", "review_rating", "discount_applied"]
+DETAIL_COLUMNS = {"age": "Age", "gender": "Gender", "category": "Category", "location": "Location"}
+
+
+class SimilarProfile(BaseModel):
+    purchase_amount:    float = Field(60.0, ge=0)
+    frequency_score:    int   = Field(3, ge=1, le=5)
+    previous_purchases: int   = Field(10, ge=0)
+    review_rating:      float = Field(4.0, ge=0, le=5)
+    discount_applied:   int   = Field(0, ge=0, le=1)
+
+
+class SimilarQuery(BaseModel):
+    """A batch of customers (by id) and/or profiles; each gets its own k nearest neighbours."""
+    customer_ids: List[int]            = Field(default_factory=list)
+    profiles:     List[SimilarProfile] = Field(default_factory=list)
+    k:            int                  = Field(10, ge=1, le=MAX_K)
+
+
+def _feature_matrix(df) -> np.ndarray:
+    """Raw [spend, freq_score, prev_purchases, rating, discount_flag] per row."""
+    return np.column_stack([
+        df["Purchase Amount (USD)"].to_numpy(dtype=float),
+        df["Frequency of Purchases"].astype(str).map(FREQ_MAP).fillna(3).to_numpy(dtype=float),
+        df["Previous Purchases"].to_numpy(dtype=float),
+        df["Review Rating"].to_numpy(dtype=float),
+        (df["Discount Applied"].astype(str).str.lower() == "yes").to_numpy(dtype=float),
+    ])
+
+
+def _build_index():
+    """KD-tree over every row's normalised features, plus the id -> row lookup."""
+    centroids = snapshot.aggregate("predictions.centroids")
+    if _df is None or centroids is None or "Customer ID" not in _df.columns:
+        return None
+    from sklearn.neighbors import KDTree
+
+    scale = centroids["scale"]
+    tree = KDTree(np.nan_to_num(_feature_matrix(_df) / scale), leaf_size=40)
+    ids = _df["Customer ID"].to_numpy(dtype=np.int64)
+    id_order = np.argsort(ids, kind="stable")
+    return {
+        "scale":    scale,
+        "tree":     tree,
+        "points":   np.asarray(tree.get_arrays()[0]),     # the tree's own copy, not a second one
+        "ids":      ids,
+        "id_order": id_order,
+        "sorted_ids": ids[id_order],
+        # Detail columns as (codes, values) so a batch of neighbours is one integer gather.
+        "details":  {key: (codes, np.array(uniques.tolist(), dtype=object))
+                     for key, col in DETAIL_COLUMNS.items() if col in _df.columns
+                     for codes, uniques in [pd.factorize(_df[col], use_na_sentinel=False)]},
+    }
+
+
+# Built on first use / by the app warm-up, not at import.
+snapshot.register("customers.index", _build_index)
+
+
+def _index():
+    index = snapshot.aggregate("customers.index")
+    if index is None:
+        raise HTTPException(status_code=503, detail="Customer data not available")
+    return index
+
+
+def _rows_for_ids(index: dict, customer_ids) -> np.ndarray:
+    """First dataset row of each customer id; unknown ids -> 404."""
+    wanted = np.asarray(customer_ids, dtype=np.int64)
+    pos = np.searchsorted(index["sorted_ids"], wanted)
+    pos_c = np.minimum(pos, len(index["sorted_ids"]) - 1)
+    found = index["sorted_ids"][pos_c] == wanted
+    if not found.all():
+        missing = ", ".join(str(int(i)) for i in wanted[~found][:20])
+        raise HTTPException(status_code=404, detail=f"Unknown customer id(s): {missing}")
+    return index["id_order"][pos_c]
+
+
+def _neighbours(index: dict, points: np.ndarray, k: int, exclude_ids=None) -> list:
+    """
+    k nearest rows for every query point in one KD-tree call. Rows whose
+    customer id is the query's own (exclude_ids) are skipped, so a customer
+    is never its own neighbour.
+    """
+    extra = 0
+    if exclude_ids is not None:
+        lo = np.searchsorted(index["sorted_ids"], exclude_ids, side="left")
+        hi = np.searchsorted(index["sorted_ids"], exclude_ids, side="right")
+        extra = int((hi - lo).max()) if len(exclude_ids) else 0
+    n_rows = len(index["ids"])
+    dist, rows = index["tree"].query(points, k=min(k + extra, n_rows))
+
+    # Flatten the kept (row, distance) pairs so every column is gathered once for the whole batch.
+    kept_rows, kept_dist, counts = [], [], []
+    for q in range(len(points)):
+        keep = np.ones(rows.shape[1], dtype=bool) if exclude_ids is None else index["ids"][rows[q]] != exclude_ids[q]
+        kept_rows.append(rows[q][keep][:k])
+        kept_dist.append(dist[q][keep][:k])
+        counts.append(len(kept_rows[-1]))
+    flat = np.concatenate(kept_rows)
+    raw = index["points"][flat] * index["scale"]
+    columns = {
+        "customer_id":        index["ids"][flat].tolist(),
+        "distance":           np.round(np.concatenate(kept_dist), 4).tolist(),
+        "purchase_amount":    np.round(raw[:, 0], 2).tolist(),
+        "frequency_score":    np.rint(raw[:, 1]).astype(int).tolist(),
+        "previous_purchases": np.rint(raw[:, 2]).astype(int).tolist(),
+        "review_rating":      np.round(raw[:, 3], 2).tolist(),
+        "discount_applied":   np.rint(raw[:, 4]).astype(int).tolist(),
+    }
+    for key, (codes, values) in index["details"].items():
+        columns[key] = values[codes[flat]].tolist()
+    if clustering.load_model() is not None:
+        labels = np.asarray(clustering.SEGMENT_LABELS, dtype=object)
+        columns["segment"] = labels[np.asarray(clustering.cluster_ids())[flat]].tolist()
+
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    bounds = np.cumsum([0] + counts)
+    return [records[bounds[q]:bounds[q + 1]] for q in range(len(points))]
+
+
+# ── Endpoints ────────────────────────────────────────────────────────────────
+
+@router.get("/{customer_id}/similar")
+def get_similar_customers(customer_id: int, k: int = 10):
+    """The k customers closest to `customer_id` in the normalised 5-feature segment space."""
+    if not 1 <= k <= MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_K}")
+    index = _index()
+    rows = _rows_for_ids(index, [customer_id])
+    similar = _neighbours(index, index["points"][rows], k, exclude_ids=index["ids"][rows])[0]
+    return {"customer_id": customer_id, "k": k, "similar": similar}
+
+
+@router.post("/similar")
+def find_similar(query: SimilarQuery):
+    """
+    Batched k-NN: neighbours for each customer id and each profile, in the
+    order given. Profiles are normalised exactly as dataset rows are.
+    """
+    n = len(query.customer_ids) + len(query.profiles)
+    if n == 0:
+        raise HTTPException(status_code=400, detail="Give at least one customer id or profile")
+    if n > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH} customers and profiles per request")
+    index = _index()
+
+    result = {"k": query.k}
+    if query.customer_ids:
+        rows = _rows_for_ids(index, query.customer_ids)
+        found = _neighbours(index, index["points"][rows], query.k, exclude_ids=index["ids"][rows])
+        result["customers"] = [{"customer_id": cid, "similar": s} for cid, s in zip(query.customer_ids, found)]
+    if query.profiles:
+        X = np.array([[getattr(p, f) for f in FEATURES] for p in query.profiles], dtype=float)
+        found = _neighbours(index, X / index["scale"], query.k)
+        result["profiles"] = [{"profile": p.model_dump(), "similar": s} for p, s in zip(query.profiles, found)]
+    return result
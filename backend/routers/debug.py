@@ -0,0 +1,46 @@
+"""
+Debug Router - Stored request profiles from the opt-in sampling profiler
+Every endpoint requires the X-Profile-Token header (SHOPMIND_PROFILE_TOKEN)
+and answers 404 when profiling is not enabled.
+"""
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+import profiling
+
+router = APIRouter(prefix="/debug/profiles", tags=["debug"])
+
+
+def _check(token: str) -> None:
+    if not profiling.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not profiling.authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+
+@router.get("")
+def list_profiles(x_profile_token: str = Header("")):
+    """Stored profiles, newest first (without their stacks)."""
+    _check(x_profile_token)
+    profiles = profiling.list_profiles()
+    return {"profiles": profiles, "total": len(profiles), "keep": profiling.PROFILE_KEEP}
+
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def get_profile_stacks(profile_id: str, x_profile_token: str = Header("")):
+    """Folded stacks ("frame;frame;frame count" per line) for flamegraph.pl or speedscope."""
+    _check(x_profile_token)
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return PlainTextResponse(profile["folded"])
+
+
+@router.get("/{profile_id}/summary")
+def get_profile_summary(profile_id: str, x_profile_token: str = Header("")):
+    _check(x_profile_token)
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return {k: v for k, v in profile.items() if k != "folded"}
@@ -0,0 +1,106 @@
+"""
+Distributions Router - Quantiles and histograms of spend, rating and purchases
+Served from the KLL sketches in distributions.py (dataset baseline merged
+with every batch posted to /ingest/transactions), per rule-based segment,
+per category or overall, with bounded memory and rank error.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+import distributions
+import ingest
+from distributions import stream, SKETCHED, GROUPINGS
+
+router = APIRouter(prefix="/distributions", tags=["distributions"])
+
+ingest.subscribe("distributions", stream.ingest)
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+MAX_QUANTILES     = 20
+
+
+def _parse_quantiles(quantiles: Optional[str]) -> tuple:
+    if not quantiles:
+        return DEFAULT_QUANTILES
+    try:
+        qs = tuple(float(q) for q in quantiles.split(",") if q.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="quantiles must be comma-separated numbers in [0, 1]")
+    if not qs or len(qs) > MAX_QUANTILES or any(not 0 <= q <= 1 for q in qs):
+        raise HTTPException(status_code=400, detail=f"Give 1-{MAX_QUANTILES} quantiles in [0, 1]")
+    return qs
+
+
+def _check(by: str, metric: str) -> None:
+    if by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"Unknown grouping '{by}'. Valid: {', '.join(GROUPINGS)}")
+    if metric not in SKETCHED:
+        raise HTTPException(status_code=400, detail=f"Unknown metric '{metric}'. Valid: {', '.join(SKETCHED)}")
+
+
+def _label(q: float) -> str:
+    """0.5 -> "p50", 0.999 -> "p99.9"."""
+    return "p" + f"{q * 100:.10g}"
+
+
+def _summary(sketch, qs: tuple) -> dict:
+    return {
+        "count": sketch.n,
+        "min":   round(sketch.min, 3),
+        "max":   round(sketch.max, 3),
+        **{_label(q): round(v, 3) for q, v in zip(qs, sketch.quantiles(qs))},
+    }
+
+
+# ── Endpoints ────────────────────────────────────────────────────────────────
+
+@router.get("")
+def get_distributions(metric: str = "spend", by: str = "segment", quantiles: Optional[str] = None):
+    """Per-group count, min, max and quantiles (default p50/p90/p99) of `metric`."""
+    _check(by, metric)
+    qs = _parse_quantiles(quantiles)
+    view = stream.view()
+    groups = []
+    for key in view.keys(by):
+        sketch = view.get(by, key, metric)
+        if sketch.n:
+            groups.append({"key": key, **_summary(sketch, qs)})
+    return {
+        "metric":     metric,
+        "column":     SKETCHED[metric],
+        "by":         by,
+        "quantiles":  [_label(q) for q in qs],
+        "rank_error": round(distributions.KLLSketch.rank_error(), 4),
+        "groups":     groups,
+    }
+
+
+@router.get("/histogram")
+def get_histogram(metric: str = "spend", by: str = "overall", key: Optional[str] = None,
+                  bins: int = Query(20, ge=1, le=200)):
+    """Estimated equal-width histogram of `metric` for one group (or overall)."""
+    _check(by, metric)
+    view = stream.view()
+    if by == "overall":
+        key = "overall"
+    match = {k.lower(): k for k in view.keys(by)}.get((key or "").strip().lower())
+    if match is None:
+        raise HTTPException(status_code=404, detail=f"Unknown {by} '{key}'. Valid: {', '.join(view.keys(by))}")
+    sketch = view.get(by, match, metric)
+    edges, counts = sketch.histogram(bins)
+    return {
+        "metric":  metric,
+        "by":      by,
+        "key":     match,
+        "count":   sketch.n,
+        "bins":    [{"low": round(float(lo), 3), "high": round(float(hi), 3), "count": int(round(c))}
+                    for lo, hi, c in zip(edges[:-1], edges[1:], counts)],
+    }
+
+
+@router.get("/stats")
+def get_distribution_stats():
+    """Sketch parameters, error bound, memory and ingested volume."""
+    return stream.stats()
@@ -0,0 +1,185 @@
+"""
+Geo Router - Location-level analytics per US state
+Every per-state statistic is a sum over rows, so the dataset is reduced once
+(per dataset version, shared through the snapshot) into an array-backed table
+of per-state counts and sums: segment mix, spend, rating histogram, sentiment,
+subscriptions and per-category counts/spend, each one np.bincount over the
+factorized Location codes. A state or a multi-state region is then a sum of
+table rows — no request scans the transactions. Unique customers are not
+additive across states, so those come from the HyperLogLog cube (reach.py).
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+import numpy as np
+import pandas as pd
+
+import clustering
+import paging
+import reach
+import snapshot
+from snapshot import load_dataset
+import startup
+
+router = APIRouter(prefix="/geo", tags=["geo"])
+
+try:
+    _df = load_dataset()
+except Exception:
+    _df = None
+
+SEGMENTS      = clustering.SEGMENT_LABELS
+SENTIMENTS    = ["Negative", "Neutral", "Positive"]
+RATING_BINS   = ["1-2", "2-3", "3-4", "4-5"]
+TOP_CATEGORIES = 3
+
+
+def _compute_geo_table():
+    """
+    One grouped pass over the dataset -> {"states", "categories", arrays...};
+    every array has one row per state (sorted by name).
+    """
+    if _df is None or "Location" not in _df.columns:
+        return None
+    df = _df[_df["Location"].notna()]
+    loc, states = pd.factorize(df["Location"].astype(str), sort=True)
+    cat, categories = pd.factorize(df["Category"].astype(str), sort=True)
+    n_states, n_cats = len(states), len(categories)
+
+    spend  = df["Purchase Amount (USD)"].to_numpy(dtype=float)
+    rating = df["Review Rating"].to_numpy(dtype=float)
+    rated  = ~np.isnan(rating)
+    sentiment = np.where(rating >= 4.0, 2, np.where(rating >= 3.0, 1, 0)).astype(np.int64)
+    rating_bin = np.clip(np.floor(np.nan_to_num(rating, nan=1.0)), 1, 4).astype(np.int64) - 1
+    subscribed = (df["Subscription Status"].astype(str) == "Yes").to_numpy()
+
+    def counts(codes, width):
+        return np.bincount(loc * width + codes, minlength=n_states * width).reshape(n_states, width)
+
+    def rated_counts(codes, width):
+        return np.bincount(loc[rated] * width + codes[rated], minlength=n_states * width).reshape(n_states, width)
+
+    return {
+        "states":         [str(s) for s in states],
+        "categories":     [str(c) for c in categories],
+        "rows":           np.bincount(loc, minlength=n_states),
+        "spend":          np.bincount(loc, weights=spend, minlength=n_states),
+        "rating_sum":     np.bincount(loc[rated], weights=rating[rated], minlength=n_states),
+        "rated":          np.bincount(loc[rated], minlength=n_states),
+        "subscribed":     np.bincount(loc[subscribed], minlength=n_states),
+        "segments":       counts(clustering.rule_segment_codes(df), len(SEGMENTS)),
+        "sentiment":      rated_counts(sentiment, len(SENTIMENTS)),
+        "rating_hist":    rated_counts(rating_bin, len(RATING_BINS)),
+        "category_rows":  counts(cat, n_cats),
+        "category_spend": np.bincount(loc * n_cats + cat, weights=spend,
+                                      minlength=n_states * n_cats).reshape(n_states, n_cats),
+    }
+
+
+def _summarise(rows: np.ndarray, detail: bool = True) -> dict:
+    """Metrics for the union of the given table rows (one state or a region)."""
+    t = _table
+    n        = int(t["rows"][rows].sum())
+    rated    = int(t["rated"][rows].sum())
+    spend    = float(t["spend"][rows].sum())
+    avg_r    = round(float(t["rating_sum"][rows].sum()) / rated, 3) if rated else None
+    segs     = t["segments"][rows].sum(axis=0)
+    cat_rows = t["category_rows"][rows].sum(axis=0)
+    summary = {
+        "customers":         n,
+        "avg_spend":         round(spend / n, 2) if n else 0.0,
+        "avg_rating":        avg_r,
+        "subscription_rate": round(int(t["subscribed"][rows].sum()) / n, 4) if n else 0.0,
+        "dominant_segment":  SEGMENTS[int(segs.argmax())] if n else None,
+        "top_category":      t["categories"][int(cat_rows.argmax())] if n else None,
+    }
+    if not detail:
+        return summary
+
+    sent     = t["sentiment"][rows].sum(axis=0)
+    hist     = t["rating_hist"][rows].sum(axis=0)
+    cat_sp   = t["category_spend"][rows].sum(axis=0)
+    top      = np.argsort(-cat_rows, kind="stable")[:TOP_CATEGORIES]
+    return {
+        **summary,
+        "total_spend":    round(spend, 2),
+        "segment_mix":    [{"segment": s, "count": int(c), "share": round(int(c) / n, 4) if n else 0.0}
+                           for s, c in zip(SEGMENTS, segs)],
+        "sentiment":      {s: {"count": int(c), "pct": round(int(c) / rated * 100, 1) if rated else 0.0}
+                           for s, c in zip(SENTIMENTS, sent)},
+        "rating_distribution": {b: int(c) for b, c in zip(RATING_BINS, hist)},
+        "top_categories": [{"category": t["categories"][i], "count": int(cat_rows[i]),
+                            "share": round(int(cat_rows[i]) / n, 4) if n else 0.0,
+                            "avg_spend": round(float(cat_sp[i]) / int(cat_rows[i]), 2) if cat_rows[i] else 0.0}
+                           for i in top if cat_rows[i] > 0],
+    }
+
+
+def _state_rows(names) -> np.ndarray:
+    """Table rows for state names (case-insensitive); unknown names -> 404."""
+    rows, unknown = [], []
+    for name in names:
+        i = _state_lookup.get(name.strip().lower())
+        if i is None:
+            unknown.append(name.strip())
+        else:
+            rows.append(i)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown state(s): {', '.join(unknown)}")
+    return np.unique(np.asarray(rows, dtype=np.int64))
+
+
+# ── Pre-compute at startup ────────────────────────────────────────────────────
+with startup.phase("geo._compute_geo_table"):
+    _table = snapshot.aggregate("geo.table", _compute_geo_table)
+
+if _table is not None:
+    _state_lookup = {s.lower(): i for i, s in enumerate(_table["states"])}
+    _state_index  = paging.SortedIndex(
+        [{"state": s, **_summarise(np.array([i]), detail=False)} for i, s in enumerate(_table["states"])],
+        ("state", "customers", "avg_spend", "avg_rating", "subscription_rate"), default_sort="state")
+else:
+    _state_lookup = {}
+    _state_index  = paging.SortedIndex([], ("state",), default_sort="state")
+
+
+# ── Endpoints ────────────────────────────────────────────────────────────────
+
+@router.get("")
+def get_geo_overview(sort: Optional[str] = None, limit: Optional[int] = None,
+                     cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Per-state summary (customers, spend, rating, subscription rate, dominant segment, top category)."""
+    if _table is None:
+        return {"error": "Data not available", "states": [], "total": 0}
+    page = _state_index.page(sort=sort, limit=limit, cursor=cursor, fields=paging.parse_fields(fields))
+    return {
+        "states":      page["items"],
+        "total":       page["total"],
+        "sort":        page["sort"],
+        "next_cursor": page["next_cursor"],
+        "overall":     _summarise(np.arange(len(_table["states"])), detail=False),
+    }
+
+
+@router.get("/states/{state}")
+def get_state(state: str):
+    """Full breakdown for one state."""
+    if _table is None:
+        raise HTTPException(status_code=503, detail="Data not available")
+    rows = _state_rows([state])
+    name = _table["states"][int(rows[0])]
+    return {"state": name, **_summarise(rows), "reach": reach.stream.reach({"location": [name]})}
+
+
+@router.get("/region")
+def get_region(states: str):
+    """Combined breakdown for a comma-separated set of states, e.g. ?states=California,Oregon,Washington."""
+    if _table is None:
+        raise HTTPException(status_code=503, detail="Data not available")
+    names = [s for s in states.split(",") if s.strip()]
+    if not names:
+        raise HTTPException(status_code=400, detail="states must name at least one state")
+    rows = _state_rows(names)
+    states = [_table["states"][int(i)] for i in rows]
+    return {"states": states, **_summarise(rows), "reach": reach.stream.reach({"location": states})}
@@ -0,0 +1,91 @@
+"""
+Ingest Router - Transaction batch intake for streaming subsystems
+Validates a batch of transactions, converts it once into a CSV-named frame
+and fans it out to every ingest subscriber (see ingest.py).
+"""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List
+import pandas as pd
+
+import ingest
+from profiling import phase
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+MAX_BATCH_ROWS = 50_000
+
+
+class Transaction(BaseModel):
+    customer_id:              int   = 0
+    age:                      int   = Field(30, ge=0, le=120)
+    gender:                   str   = "Female"
+    item_purchased:           str   = ""
+    category:                 str   = "Clothing"
+    purchase_amount:          float = Field(60.0, ge=0)
+    location:                 str   = ""
+    size:                     str   = ""
+    color:                    str   = ""
+    season:                   str   = "Summer"
+    review_rating:            float = Field(4.0, ge=0, le=5)
+    subscription_status:      str   = "No"
+    payment_method:           str   = ""
+    shipping_type:            str   = ""
+    discount_applied:         str   = "No"
+    promo_code_used:          str   = "No"
+    previous_purchases:       int   = Field(0, ge=0)
+    preferred_payment_method: str   = ""
+    frequency_of_purchases:   str   = "Monthly"
+
+
+class TransactionBatch(BaseModel):
+    transactions: List[Transaction]
+
+
+# snake_case field -> column name in shopping_trends.csv
+COLUMN_NAMES = {
+    "customer_id":              "Customer ID",
+    "age":                      "Age",
+    "gender":                   "Gender",
+    "item_purchased":           "Item Purchased",
+    "category":                 "Category",
+    "purchase_amount":          "Purchase Amount (USD)",
+    "location":                 "Location",
+    "size":                     "Size",
+    "color":                    "Color",
+    "season":                   "Season",
+    "review_rating":            "Review Rating",
+    "subscription_status":      "Subscription Status",
+    "payment_method":           "Payment Method",
+    "shipping_type":            "Shipping Type",
+    "discount_applied":         "Discount Applied",
+    "promo_code_used":          "Promo Code Used",
+    "previous_purchases":       "Previous Purchases",
+    "preferred_payment_method": "Preferred Payment Method",
+    "frequency_of_purchases":   "Frequency of Purchases",
+}
+
+
+def to_frame(transactions: list) -> pd.DataFrame:
+    """Validated transactions -> CSV-named DataFrame (column-wise, no per-row dicts)."""
+    columns = {field: [] for field in COLUMN_NAMES}
+    for t in transactions:
+        for field in COLUMN_NAMES:
+            columns[field].append(getattr(t, field))
+    return pd.DataFrame({COLUMN_NAMES[f]: values for f, values in columns.items()})
+
+
+@router.post("/transactions")
+def ingest_transactions(batch: TransactionBatch):
+    """Publish a batch of transactions to every streaming subscriber."""
+    n = len(batch.transactions)
+    if n == 0:
+        return {"rows": 0, "subscribers": {}}
+    if n > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large ({n} > {MAX_BATCH_ROWS} rows)")
+    with phase("dataset"):
+        df = to_frame(batch.transactions)
+    with phase("inference"):
+        results = ingest.publish(df)
+    return {"rows": n, "subscribers": results}
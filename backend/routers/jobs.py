@@ -0,0 +1,78 @@
+"""
+Jobs Router - Submit, track, cancel and download background jobs
+POST /jobs/{kind} queues a job (202) and returns its record; poll
+GET /jobs/{id} for status and progress, fetch GET /jobs/{id}/result once it
+has succeeded, DELETE /jobs/{id} to cancel. Kinds and their parameters are
+listed by GET /jobs/kinds.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Body, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+
+import jobs
+import job_kinds  # noqa: F401 - registers the job kinds
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/kinds")
+def list_kinds():
+    return {"kinds": [k.describe() for k in jobs.KINDS.values()], "workers": jobs.JOB_WORKERS,
+            "result_ttl_seconds": jobs.RESULT_TTL_SECONDS}
+
+
+@router.get("")
+def list_jobs(kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    """Most recent jobs first, optionally filtered by kind and status."""
+    items = jobs.list_jobs(kind, status, max(1, min(limit, 500)))
+    return {"jobs": items, "total": len(items)}
+
+
+@router.post("/{kind}", status_code=202)
+def submit_job(kind: str, params: Optional[dict] = Body(None)):
+    """Queue a job of `kind`; the body holds its parameters (see /jobs/kinds)."""
+    try:
+        job = jobs.submit(kind, params)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind '{kind}'. Valid: {sorted(jobs.KINDS)}")
+    except jobs.JobError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return JSONResponse(status_code=202, content=job, headers={"Location": f"/jobs/{job['id']}"})
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a queued job, or ask a running one to stop at its next checkpoint."""
+    try:
+        job = jobs.cancel(job_id)
+    except jobs.JobError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    try:
+        found = jobs.result(job_id)
+    except jobs.JobError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail=f"Result of job '{job_id}' has expired")
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    path, media_type = found
+    job = jobs.get(job_id)
+    return FileResponse(path, media_type=media_type,
+                        filename=f"{job['kind']}-{job_id}.{path.rsplit('.', 1)[-1]}")
@@ -1,33 +1,59 @@
 """
-Predictions Router - Revenue Regression & Subscription Classification
+Predictions Router - Revenue Regression, Subscription Classification & Customer Profile
 Uses centroid-based segment assignment for reliable, model-consistent predictions.
-Feature importance is always a clean numeric list (no NaN/None values).
+Feature importance is always a clean numeric list (no NaN/None values): each
+feature's share of the modifier adjustments in that prediction. The CLV
+model's global TreeSHAP importance (attributions.py) is a different model's
+ranking and is only served, labelled, under ?explain=true, read from the
+table precomputed at warm-up.
+The customer profile endpoint serves the trained CLV, churn, sentiment and
+anomaly models from a single shared feature-encoding pass. ?explain=true adds
+per-prediction TreeSHAP attributions, computed in the same batch.
 """
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional, Union
 import pandas as pd
 import numpy as np
-import joblib
 import json
+import logging
+import math
 import os
+import time
+
+from model_registry import store as model_store, REQUIRED_MODELS, ModelNotAvailable, declare_fallback
+import attributions
+from compute import ComputeBusy
+from genai_insights import generate_advanced_insights
+from batching import MicroBatcher
+from profiling import phase, TimedJSONResponse
+from feature_pipeline import FREQ_LABELS
+import snapshot
+from snapshot import load_dataset
+import startup
 
 router = APIRouter(prefix="/predictions", tags=["predictions"])
+logger = logging.getLogger("shopmind.predictions")
 
 _BASE = os.path.dirname(os.path.dirname(__file__))
 
-# ── Load models & data ────────────────────────────────────────────────────────
+# ── Load data; models are loaded lazily through the registry ─────────────────
 try:
-    _adv_bundle = joblib.load(os.path.join(_BASE, "final_models", "advanced_models.pkl"))
-    _raw_df     = pd.read_csv(os.path.join(_BASE, "dataset", "shopping_trends.csv"))
-    _raw_df.columns = [c.strip() for c in _raw_df.columns]
+    _raw_df     = load_dataset()
     with open(os.path.join(_BASE, "final_models", "segment_knowledge.json")) as f:
         _knowledge = json.load(f)
-    _models_loaded = True
 except Exception:
-    _models_loaded = False
-    _adv_bundle = _raw_df = None
-    _knowledge  = {}
+    _raw_df    = None
+    _knowledge = {}
+
+# Refuse to start if a model declared in SHOPMIND_REQUIRED_MODELS is missing;
+# anything else that is missing is logged and served by the heuristic fallback.
+model_store.active().require(REQUIRED_MODELS)
+declare_fallback("subscription", "the rule-based subscription probability (_subscription_heuristic)")
+model_store.active().warn_fallbacks()
+
 
 FREQ_MAP = {"Weekly": 5, "Bi-Weekly": 4, "Fortnightly": 4, "Monthly": 3, "Quarterly": 2, "Annually": 1}
 
@@ -46,17 +72,13 @@ def _assign_segment_rule(discount: bool, prev: int, rating: float, sub: bool) ->
     else:                           return "Occasional Buyers"
 
 
-def _assign_segment_centroid(amt: float, freq: int, prev: int,
-                              rating: float, discount: bool) -> tuple[str, float]:
+def _compute_centroids():
     """
-    Assign segment using nearest centroid in 5-feature space.
-    Features: spend (0-110), freq_score (1-5), prev_purchases (0-50),
-              rating (0-5), discount_flag (0/1).
-    Normalised to [0,1] before distance calc.
-    Returns (segment_label, confidence_0_1).
+    Segment centroids in the normalised 5-feature space. They depend only on
+    the dataset, so they are computed once instead of on every request.
     """
     if _raw_df is None:
-        return _assign_segment_rule(discount, prev, rating, False), 0.5
+        return None
 
     df = _raw_df.copy()
 
@@ -74,12 +96,12 @@ def _assign_segment_centroid(amt: float, freq: int, prev: int,
     spend_max = df["Purchase Amount (USD)"].max() if "Purchase Amount (USD)" in df.columns else 110
     prev_max  = df["Previous Purchases"].max()    if "Previous Purchases"   in df.columns else 50
 
-    # Compute centroids
-    centroids = {}
+    labels, rows = [], []
     for seg in SEGMENT_LABELS:
         s = df[df["_seg"] == seg]
         if len(s) == 0: continue
-        centroids[seg] = np.array([
+        labels.append(seg)
+        rows.append([
             s["Purchase Amount (USD)"].mean() / max(spend_max, 1),
             s["_freq"].mean() / 5.0,
             s["Previous Purchases"].mean() / max(prev_max, 1),
@@ -87,22 +109,52 @@ def _assign_segment_centroid(amt: float, freq: int, prev: int,
             (s["Discount Applied"].str.lower() == "yes").mean(),
         ])
 
-    # Input vector (normalised)
-    inp = np.array([
-        amt / max(spend_max, 1),
-        freq / 5.0,
-        prev / max(prev_max, 1),
-        rating / 5.0,
-        1.0 if discount else 0.0,
-    ])
+    return {
+        "labels":    labels,
+        "matrix":    np.array(rows, dtype=float),
+        # Normalisation: spend / max spend, freq / 5, prev / max prev, rating / 5, discount flag
+        "scale":     np.array([max(spend_max, 1), 5.0, max(prev_max, 1), 5.0, 1.0], dtype=float),
+    }
+
+
+with startup.phase("predictions._compute_centroids"):
+    _CENTROIDS = snapshot.aggregate("predictions.centroids", _compute_centroids)
+
+
+def _nearest_centroids(X: np.ndarray) -> tuple:
+    """
+    Vectorised nearest-centroid assignment for an (n, 5) matrix of raw
+    [spend, freq_score, prev_purchases, rating, discount_flag] rows.
+    Returns (centroid indices, confidences) with confidence =
+    1 - nearest / sum(dists), capped at 0.99 and rounded to 3 places.
+    """
+    inp   = np.asarray(X, dtype=float) / _CENTROIDS["scale"]
+    dists = np.linalg.norm(inp[:, None, :] - _CENTROIDS["matrix"][None, :, :], axis=2)
+    idx   = dists.argmin(axis=1)
+    nearest = dists[np.arange(len(idx)), idx]
+    conf  = 1.0 - nearest / np.maximum(dists.sum(axis=1), 1e-9)
+    return idx, np.round(np.minimum(conf, 0.99), 3)
 
-    dists = {seg: float(np.linalg.norm(inp - c)) for seg, c in centroids.items()}
-    nearest = min(dists, key=dists.get)
 
-    # Confidence: 1 - (nearest_dist / sum_dists)
-    total = sum(dists.values())
-    conf  = 1.0 - (dists[nearest] / max(total, 1e-9))
-    return nearest, round(min(conf, 0.99), 3)
+def _assign_segments_centroid(X: np.ndarray):
+    """(labels, confidences) lists for _nearest_centroids."""
+    idx, conf = _nearest_centroids(X)
+    return [_CENTROIDS["labels"][i] for i in idx], [float(c) for c in conf]
+
+
+def _assign_segment_centroid(amt: float, freq: int, prev: int,
+                              rating: float, discount: bool) -> tuple[str, float]:
+    """
+    Assign segment using nearest centroid in 5-feature space.
+    Features: spend (0-110), freq_score (1-5), prev_purchases (0-50),
+              rating (0-5), discount_flag (0/1).
+    Normalised to [0,1] before distance calc.
+    Returns (segment_label, confidence_0_1).
+    """
+    if _CENTROIDS is None:
+        return _assign_segment_rule(discount, prev, rating, False), 0.5
+    labels, conf = _assign_segments_centroid([[amt, freq, prev, rating, 1.0 if discount else 0.0]])
+    return labels[0], conf[0]
 
 
 # ── Input Schemas ─────────────────────────────────────────────────────────────
@@ -134,44 +186,165 @@ class SubscriptionInput(BaseModel):
     season:             str   = "Summer"
 
 
+class CustomerProfileInput(BaseModel):
+    age:                 int   = Field(30, ge=15, le=100)
+    gender:              str   = "Female"
+    category:            str   = "Clothing"
+    season:              str   = "Summer"
+    purchase_amount:     float = Field(60.0, ge=0)
+    previous_purchases:  int   = Field(10, ge=0)
+    review_rating:       float = Field(4.0, ge=0, le=5)
+    discount_applied:    int   = Field(0, ge=0, le=1)
+    promo_code_used:     int   = Field(0, ge=0, le=1)
+    subscription_status: int   = Field(0, ge=0, le=1)
+    frequency_score:     int   = Field(3, ge=1, le=5)
+
+
+MAX_SCENARIOS = int(os.getenv("SHOPMIND_MAX_SCENARIOS", "20000"))
+
+
+class ScenarioRange(BaseModel):
+    start: float
+    stop:  float
+    step:  float = Field(1.0, gt=0)
+
+
+class ScenarioInput(BaseModel):
+    """A base profile plus, per field, the values to sweep (a list or an inclusive start/stop/step range)."""
+    base: CustomerProfileInput = Field(default_factory=CustomerProfileInput)
+    vary: Dict[str, Union[List[Union[int, float, str]], ScenarioRange]] = Field(default_factory=dict)
+
+
 # ── Prediction Logic ──────────────────────────────────────────────────────────
 
-def _compute_revenue_prediction(data: RevenueInput):
-    disc = bool(data.discount_applied)
-    sub  = bool(data.subscription_status)
-
-    # Centroid-based segment assignment
-    seg_label, seg_conf = _assign_segment_centroid(
-        amt=data.purchase_amount,
-        freq=data.frequency_score,
-        prev=data.previous_purchases,
-        rating=data.review_rating,
-        discount=disc,
-    )
-
-    kb         = _knowledge.get(seg_label, {})
-    base_spend = float(kb.get("avg_spend", 60.0))
-
-    # Modifier stack (transparent, no black-box)
-    freq_mod  = round((data.frequency_score - 3) * 4.0, 2)
-    rat_mod   = round((data.review_rating - 3.5) * 3.0, 2)
-    disc_mod  = -8.0 if disc else 0.0
-    promo_mod = -4.0 if data.promo_code_used else 0.0
-    age_mod   = round((data.age - 35) * 0.3, 2)
-    prev_mod  = round(min(data.previous_purchases * 0.5, 12.0), 2)
-
-    predicted = round(max(20.0, base_spend + freq_mod + rat_mod + disc_mod + promo_mod + age_mod + prev_mod), 2)
-
-    # Feature importance — always clean floats, sum to 1.0
-    feature_importance = [
-        {"feature": "Previous Purchases", "importance": 0.28},
-        {"feature": "Frequency Score",    "importance": 0.22},
-        {"feature": "Review Rating",      "importance": 0.18},
-        {"feature": "Age",                "importance": 0.12},
-        {"feature": "Discount Applied",   "importance": 0.10},
-        {"feature": "Promo Code Used",    "importance": 0.06},
-        {"feature": "Subscription",       "importance": 0.04},
-    ]
+# Modifier -> the input feature it is computed from.
+MODIFIER_FEATURES = {
+    "history_bonus":    "Previous Purchases",
+    "frequency_bonus":  "Frequency Score",
+    "rating_bonus":     "Review Rating",
+    "age_adjustment":   "Age",
+    "discount_penalty": "Discount Applied",
+    "promo_penalty":    "Promo Code Used",
+}
+
+
+def _modifier_importance(mods: dict) -> list:
+    """
+    This prediction's feature importance: each feature's share of the total
+    |adjustment| the modifier stack applied to the segment's base spend
+    (all 0.0 when no modifier moved it), largest first.
+    """
+    total = sum(abs(v) for v in mods.values())
+    shares = {MODIFIER_FEATURES[k]: (abs(v) / total if total else 0.0) for k, v in mods.items()}
+    return [{"feature": f, "importance": round(v, 4)}
+            for f, v in sorted(shares.items(), key=lambda kv: -kv[1])]
+
+
+def _model_record(d) -> dict:
+    """Raw-column record for the feature pipeline from a revenue / profile input."""
+    return {
+        "Age":                    d.age,
+        "Purchase Amount (USD)":  d.purchase_amount,
+        "Previous Purchases":     d.previous_purchases,
+        "Review Rating":          d.review_rating,
+        "Discount Applied":       "Yes" if d.discount_applied else "No",
+        "Promo Code Used":        "Yes" if d.promo_code_used  else "No",
+        "Frequency of Purchases": FREQ_LABELS.get(d.frequency_score, "Monthly"),
+        "Gender":                 d.gender,
+        "Category":               d.category,
+        "Season":                 d.season,
+    }
+
+
+def _clv_importance(models):
+    """The CLV model's precomputed global importance for this version, or None (never computed here)."""
+    imp = attributions.cached_importance(models, "clv")
+    if imp is None:
+        return None
+    return {
+        "model":    f"XGBRegressor (clv) {models.version}",
+        "method":   f"{imp['method']} over {imp['rows']:,} rows",
+        "features": [{"feature": f["feature"], "importance": f["importance"]} for f in imp["features"]],
+    }
+
+
+def _revenue_attributions(models, items: list) -> list:
+    """CLV TreeSHAP attributions for the given revenue inputs (one call for the batch)."""
+    adv = models.get("advanced")
+    df_enc = models.pipeline().transform([_model_record(d) for d in items])
+    X_adv = adv["scaler"].transform(df_enc.reindex(columns=adv["features"], fill_value=0))
+    contribs = attributions.contributions(models.get("clv")["model"], X_adv)
+    return [attributions.explain_row(c, adv["features"], attributions.MARGINS["clv"]) for c in contribs]
+
+
+def _revenue_batch(items: list) -> list:
+    """
+    Revenue predictions for a batch of (input, explain) pairs; segment
+    assignment is one vectorised call, and the rows that asked for an
+    explanation share one CLV attribution call. Runs in-process only: a
+    light route never queues on the compute pool.
+    """
+    items, explain = [d for d, _ in items], [e for _, e in items]
+    if _CENTROIDS is None:
+        assigned = [(_assign_segment_rule(bool(d.discount_applied), d.previous_purchases,
+                                          d.review_rating, False), 0.5) for d in items]
+    else:
+        labels, conf = _assign_segments_centroid([
+            [d.purchase_amount, d.frequency_score, d.previous_purchases,
+             d.review_rating, 1.0 if d.discount_applied else 0.0]
+            for d in items
+        ])
+        assigned = list(zip(labels, conf))
+
+    models = model_store.active()
+    explained, clv_importance = {}, None
+    rows = [i for i, e in enumerate(explain) if e]
+    if rows and models.available("clv") and models.available("advanced"):
+        explained = dict(zip(rows, _revenue_attributions(models, [items[i] for i in rows])))
+        clv_importance = _clv_importance(models)
+
+    results = []
+    for i, (d, (seg_label, seg_conf)) in enumerate(zip(items, assigned)):
+        result = _revenue_result(d, seg_label, seg_conf)
+        if explain[i]:
+            result["attributions"] = {"clv": explained.get(i), "clv_feature_importance": clv_importance}
+        results.append(result)
+    return results
+
+
+def _compute_revenue_prediction(data: RevenueInput, explain: bool = False):
+    return _revenue_batch([(data, explain)])[0]
+
+
+def _segment_spend(seg_label: str) -> float:
+    return float(_knowledge.get(seg_label, {}).get("avg_spend", 60.0))
+
+
+def _revenue_modifiers(freq, rating, disc, promo, age, prev) -> dict:
+    """
+    Modifier stack (transparent, no black-box). Works on scalars and on
+    numpy arrays alike, so single predictions and scenario grids share it.
+    """
+    return {
+        "frequency_bonus":  np.round((np.asarray(freq) - 3) * 4.0, 2),
+        "rating_bonus":     np.round((np.asarray(rating) - 3.5) * 3.0, 2),
+        "discount_penalty": np.where(disc, -8.0, 0.0),
+        "promo_penalty":    np.where(promo, -4.0, 0.0),
+        "age_adjustment":   np.round((np.asarray(age) - 35) * 0.3, 2),
+        "history_bonus":    np.round(np.minimum(np.asarray(prev) * 0.5, 12.0), 2),
+    }
+
+
+def _predicted_revenue(base_spend, modifiers: dict):
+    return np.round(np.maximum(20.0, base_spend + sum(modifiers.values())), 2)
+
+
+def _revenue_result(data: RevenueInput, seg_label: str, seg_conf: float) -> dict:
+    base_spend = _segment_spend(seg_label)
+    mods = _revenue_modifiers(data.frequency_score, data.review_rating, bool(data.discount_applied),
+                              bool(data.promo_code_used), data.age, data.previous_purchases)
+    predicted = float(_predicted_revenue(base_spend, mods))
+    mods = {k: float(v) for k, v in mods.items()}
 
     return {
         "predicted_revenue":   predicted,
@@ -179,15 +352,10 @@ def _compute_revenue_prediction(data: RevenueInput):
         "segment_confidence":  seg_conf,
         "segment_avg_spend":   round(base_spend, 2),
         "confidence_range":    [round(predicted * 0.85, 2), round(predicted * 1.15, 2)],
-        "feature_importance":  feature_importance,
+        "feature_importance":  _modifier_importance(mods),
         "modifiers": {
             "base_segment_spend": base_spend,
-            "frequency_bonus":    freq_mod,
-            "rating_bonus":       rat_mod,
-            "discount_penalty":   disc_mod,
-            "promo_penalty":      promo_mod,
-            "age_adjustment":     age_mod,
-            "history_bonus":      prev_mod,
+            **mods,
         },
         "model":       "Centroid-based + modifier stack",
         "explanation": (
@@ -197,51 +365,105 @@ def _compute_revenue_prediction(data: RevenueInput):
     }
 
 
-def _compute_subscription_prediction(data: SubscriptionInput):
-    prob = None
+def _subscription_record(data: SubscriptionInput) -> dict:
+    return {
+        "Age":                  data.age,
+        "Purchase Amount (USD)": data.purchase_amount,
+        "Previous Purchases":   data.previous_purchases,
+        "Review Rating":        data.review_rating,
+        "Discount Applied":     "Yes" if data.discount_applied else "No",
+        "Promo Code Used":      "Yes" if data.promo_code_used  else "No",
+        "Frequency of Purchases": FREQ_LABELS.get(data.frequency_score, "Monthly"),
+        "Gender":    "Female",
+        "Category":  data.category,
+        "Season":    data.season,
+    }
+
+
+def _subscription_matrix(artifact: dict, pipeline, records) -> np.ndarray:
+    """Scaled model input for raw-column records (list of dicts or DataFrame)."""
+    df_enc = pipeline.transform(records)
+    X = df_enc.reindex(columns=artifact["features"], fill_value=0)
+    return artifact["scaler"].transform(X)
+
 
-    if _models_loaded and _adv_bundle:
+def _subscription_scores(artifact: dict, pipeline, items: list, explain: list) -> tuple:
+    """Probabilities for items, plus TreeSHAP attributions for the rows flagged in explain."""
+    X = _subscription_matrix(artifact, pipeline, [_subscription_record(d) for d in items])
+    probs = [float(p) for p in artifact["model"].predict_proba(X)[:, 1]]
+    rows = [i for i, e in enumerate(explain) if e]
+    explained = {}
+    if rows:
+        contribs = attributions.contributions(artifact["model"], X[rows])
+        explained = {i: attributions.explain_row(c, artifact["features"], attributions.MARGINS["subscription"])
+                     for i, c in zip(rows, contribs)}
+    return probs, explained
+
+
+def _subscription_batch(items: list) -> list:
+    """
+    Subscription predictions for a batch of (input, explain) pairs with one
+    predict_proba call (and one attribution call for the explained rows). If
+    the batch fails (e.g. one out-of-range row), rows are retried one by one
+    so only the offending rows fall back to the heuristic.
+    """
+    items, explain = [d for d, _ in items], [e for _, e in items]
+    models = model_store.active()
+    probs = [None] * len(items)
+    explained = {}
+
+    if models.available("subscription"):
         try:
-            df = pd.DataFrame([{
-                "Age":                  data.age,
-                "Purchase Amount (USD)": data.purchase_amount,
-                "Previous Purchases":   data.previous_purchases,
-                "Review Rating":        data.review_rating,
-                "Discount Applied":     "Yes" if data.discount_applied else "No",
-                "Promo Code Used":      "Yes" if data.promo_code_used  else "No",
-                "Frequency of Purchases": {5:"Weekly",4:"Bi-Weekly",3:"Monthly",2:"Quarterly",1:"Annually"}.get(data.frequency_score,"Monthly"),
-                "Gender":    "Female",
-                "Category":  data.category,
-                "Season":    data.season,
-                "Customer ID":         9999,
-                "Subscription Status": "No",
-            }])
-            df["Discount_Flag"]        = df["Discount Applied"].map({"Yes": 1, "No": 0})
-            df["Discount_Sensitivity"] = df["Discount_Flag"]
-            df["F_score"] = pd.cut(df["Previous Purchases"], bins=[-1,5,15,30,45,100], labels=[1,2,3,4,5]).astype(int)
-            df["M_score"] = pd.cut(df["Purchase Amount (USD)"], bins=[-1,30,60,80,95,200], labels=[1,2,3,4,5]).astype(int)
-            df["R_score"] = df["Frequency of Purchases"].map(FREQ_MAP).fillna(1).astype(int)
-            df["RFM_Score"] = df["R_score"] + df["F_score"] + df["M_score"]
-            df["High_Value"] = (df["Purchase Amount (USD)"] > 82.0).astype(int)
-            df_enc = pd.get_dummies(df, columns=["Gender","Category","Season"])
-            features = _adv_bundle["subscription_features"]
-            scaler   = _adv_bundle["subscription_scaler"]
-            model    = _adv_bundle["subscription_model"]
-            X = df_enc.reindex(columns=features, fill_value=0)
-            prob = float(model.predict_proba(scaler.transform(X))[0][1])
+            artifact = models.get("subscription")
+            pipeline = models.pipeline()
+            try:
+                probs, explained = _subscription_scores(artifact, pipeline, items, explain)
+            except Exception:
+                if len(items) == 1:
+                    raise
+                for i, d in enumerate(items):
+                    try:
+                        (probs[i],), one = _subscription_scores(artifact, pipeline, [d], [explain[i]])
+                        if one:
+                            explained[i] = one[0]
+                    except Exception:
+                        logger.exception("Subscription model inference failed; using heuristic fallback")
+        except ModelNotAvailable:
+            pass
         except Exception:
-            prob = None
+            logger.exception("Subscription model inference failed; using heuristic fallback")
+
+    results = []
+    for i, (d, p) in enumerate(zip(items, probs)):
+        result = _subscription_result(d, p, models.version)
+        if explain[i]:
+            result["attributions"] = {"subscription": explained.get(i)}
+        results.append(result)
+    return results
+
+
+def _compute_subscription_prediction(data: SubscriptionInput, explain: bool = False):
+    return _subscription_batch([(data, explain)])[0]
+
+
+def _subscription_heuristic(prev, freq, amount, rating, disc, promo):
+    """Clean rule-based fallback probability; scalars or numpy arrays."""
+    score = (0.05
+             + np.where(np.asarray(prev) > 15, 0.20, 0.05)
+             + np.where(np.asarray(freq) >= 4, 0.15, 0.03)
+             + np.where(np.asarray(amount) > 70, 0.15, 0.04)
+             + np.where(np.asarray(rating) >= 4.0, 0.10, 0.02)
+             + np.where(disc, 0.08, 0.01)
+             + np.where(promo, 0.05, 0.01))
+    return np.round(np.clip(score, 0.05, 0.95), 4)
+
+
+def _subscription_result(data: SubscriptionInput, prob, model_version: str) -> dict:
+    model_used_ml = prob is not None
 
     if prob is None:
-        # Clean rule-based fallback
-        score = 0.05
-        score += 0.20 if data.previous_purchases > 15 else 0.05
-        score += 0.15 if data.frequency_score >= 4  else 0.03
-        score += 0.15 if data.purchase_amount > 70  else 0.04
-        score += 0.10 if data.review_rating >= 4.0  else 0.02
-        score += 0.08 if data.discount_applied      else 0.01
-        score += 0.05 if data.promo_code_used        else 0.01
-        prob = round(min(0.95, max(0.05, score)), 4)
+        prob = float(_subscription_heuristic(data.previous_purchases, data.frequency_score, data.purchase_amount,
+                                             data.review_rating, data.discount_applied, data.promo_code_used))
 
     # Ensure clean float, not NaN
     if prob is None or np.isnan(prob):
@@ -261,8 +483,9 @@ def _compute_subscription_prediction(data: SubscriptionInput):
         "probability_percent":       round(prob * 100, 1),
         "likelihood_label":          churn_label,
         "key_drivers":               drivers[:3],
-        "model":                     "RandomForestClassifier" if _models_loaded else "Heuristic fallback",
-        "model_used_ml":             _models_loaded,
+        "model":                     "XGBClassifier" if model_used_ml else "Heuristic fallback",
+        "model_used_ml":             model_used_ml,
+        "model_version":             model_version,
         "explanation": (
             f"Subscription probability: {round(prob*100,1)}%. "
             f"Key signals: {', '.join(drivers[:2])}."
@@ -270,35 +493,369 @@ def _compute_subscription_prediction(data: SubscriptionInput):
     }
 
 
+SENTIMENT_LABELS = {0: "Negative", 1: "Neutral", 2: "Positive"}
+PROFILE_MODELS   = ("advanced", "clv", "churn", "sentiment", "anomaly")
+
+
+def _customer_profile_batch(items: list) -> list:
+    """
+    Run the CLV, churn, sentiment and anomaly models on a batch of
+    (profile, explain) pairs. advanced_features are encoded and scaled once;
+    the CLV prediction (log scale, as in training) is appended to form
+    churn_features_ordered. Rows flagged explain get CLV, churn and sentiment
+    attributions from one TreeSHAP call per model over just those rows.
+    Latencies are per batch and shared by every profile in it.
+    """
+    items, explain = [d for d, _ in items], [e for _, e in items]
+    models = model_store.active()
+    missing = [name for name in PROFILE_MODELS if not models.available(name)]
+    if missing:
+        raise ModelNotAvailable(f"Model(s) not available: {', '.join(missing)}")
+
+    latency = {}
+    t_start = time.perf_counter()
+
+    def _lap(key, t0):
+        latency[key] = round((time.perf_counter() - t0) * 1000, 3)
+        return time.perf_counter()
+
+    # First call on a version pays the lazy artifact loads; report them apart.
+    t0 = time.perf_counter()
+    arts = {name: models.get(name) for name in PROFILE_MODELS}
+    pipeline = models.pipeline()
+    t0 = _lap("model_load", t0)
+
+    adv = arts["advanced"]
+    df_enc = pipeline.transform([_model_record(d) for d in items])
+    X_adv = adv["scaler"].transform(df_enc.reindex(columns=adv["features"], fill_value=0))
+    t0 = _lap("encoding", t0)
+
+    clv_log = arts["clv"]["model"].predict(X_adv)
+    t0 = _lap("clv", t0)
+
+    churn_prob = arts["churn"]["model"].predict_proba(np.c_[X_adv, clv_log])[:, 1]
+    t0 = _lap("churn", t0)
+
+    sent_proba = arts["sentiment"]["model"].predict_proba(X_adv)
+    t0 = _lap("sentiment", t0)
+
+    anom = arts["anomaly"]
+    X_anom = anom["scaler"].transform(df_enc.reindex(columns=anom["features"], fill_value=0))
+    anom_scores = anom["model"].decision_function(X_anom)
+    t0 = _lap("anomaly", t0)
+
+    rows = [i for i, e in enumerate(explain) if e]
+    explained = {}
+    if rows:
+        X_churn = np.c_[X_adv, clv_log][rows]
+        contribs = {
+            "clv":       attributions.contributions(arts["clv"]["model"], X_adv[rows]),
+            "churn":     attributions.contributions(arts["churn"]["model"], X_churn),
+            "sentiment": attributions.contributions(arts["sentiment"]["model"], X_adv[rows]),
+        }
+        for j, i in enumerate(rows):
+            predicted = int(np.argmax(sent_proba[i]))
+            explained[i] = {
+                "clv":       attributions.explain_row(contribs["clv"][j], adv["features"], attributions.MARGINS["clv"]),
+                "churn":     attributions.explain_row(contribs["churn"][j], adv["churn_features_ordered"],
+                                                      attributions.MARGINS["churn"]),
+                "sentiment": attributions.explain_row(contribs["sentiment"][j][predicted], adv["features"],
+                                                      f"log_odds:{SENTIMENT_LABELS[predicted]}"),
+            }
+        _lap("explain", t0)
+    latency["total"] = round((time.perf_counter() - t_start) * 1000, 3)
+    latency["batch_size"] = len(items)
+
+    results = []
+    for i, d in enumerate(items):
+        clv        = float(np.expm1(clv_log[i]))
+        churn      = float(churn_prob[i])
+        sentiment  = int(np.argmax(sent_proba[i]))
+        anom_score = float(anom_scores[i])
+        results.append({
+            "customer_input":     d.model_dump(),
+            "clv":                round(clv, 2),
+            "churn_probability":  round(churn, 4),
+            "churn_risk":         "High" if churn > 0.65 else "Medium" if churn > 0.35 else "Low",
+            "sentiment":          sentiment,
+            "sentiment_label":    SENTIMENT_LABELS[sentiment],
+            "sentiment_probabilities": {SENTIMENT_LABELS[k]: round(float(p), 4) for k, p in enumerate(sent_proba[i])},
+            "anomaly": {
+                "is_anomaly": anom_score < 0,
+                "score":      round(anom_score, 4),
+            },
+            "latency_ms":    dict(latency),
+            "model_version": models.version,
+        })
+        if explain[i]:
+            results[-1]["attributions"] = explained[i]
+    return results
+
+
+def _compute_customer_profile(data: CustomerProfileInput, explain: bool = False):
+    return _customer_profile_batch([(data, explain)])[0]
+
+
+# ── Scenario sweeps ───────────────────────────────────────────────────────────
+
+def _axis_length(field: str, spec) -> int:
+    """Values on one axis, from the spec alone (nothing is built)."""
+    if not isinstance(spec, ScenarioRange):
+        return len(spec)
+    if not all(math.isfinite(v) for v in (spec.start, spec.stop, spec.step)):
+        raise ValueError(f"'{field}' range must be finite")
+    steps = (spec.stop - spec.start) / spec.step
+    if not math.isfinite(steps) or steps >= MAX_SCENARIOS:
+        raise ValueError(f"Grid has more than {MAX_SCENARIOS} scenarios; narrow the ranges")
+    return max(math.floor(steps + 1e-9) + 1, 0)
+
+
+def _scenario_axes(req: ScenarioInput) -> dict:
+    """
+    field -> list of validated values. The grid size is checked against
+    MAX_SCENARIOS from the axis lengths before any value is built; each value
+    is then checked once against the CustomerProfileInput constraints (not
+    once per scenario). A bad field, value or grid size raises ValueError.
+    """
+    fields = CustomerProfileInput.model_fields
+    size = 1
+    for field, spec in req.vary.items():
+        if field not in fields:
+            raise ValueError(f"Cannot vary '{field}'. Valid: {', '.join(fields)}")
+        n = _axis_length(field, spec)
+        if not n:
+            raise ValueError(f"'{field}' has no values to sweep")
+        size *= n
+        if size > MAX_SCENARIOS:
+            raise ValueError(f"Grid has more than {MAX_SCENARIOS} scenarios; narrow the ranges")
+
+    base = req.base.model_dump()
+    axes = {}
+    for field, spec in req.vary.items():
+        if isinstance(spec, ScenarioRange):
+            n = _axis_length(field, spec)
+            values = np.round(spec.start + spec.step * np.arange(n), 6).tolist()
+        else:
+            values = list(dict.fromkeys(spec))
+        checked = []
+        for v in values:
+            try:
+                checked.append(getattr(CustomerProfileInput(**{**base, field: v}), field))
+            except ValidationError as e:
+                raise ValueError(f"{field}={v!r}: {e.errors()[0]['msg']}")
+        axes[field] = list(dict.fromkeys(checked))
+    return axes
+
+
+def _scenario_grid(base: dict, axes: dict) -> pd.DataFrame:
+    """Cartesian product of the axes (last field varies fastest); other fields keep the base value."""
+    n = int(np.prod([len(v) for v in axes.values()])) if axes else 1
+    idx = np.indices([len(v) for v in axes.values()]).reshape(len(axes), -1) if axes else None
+    grid = {}
+    for field, value in base.items():
+        if field in axes:
+            grid[field] = np.asarray(axes[field], dtype=object if isinstance(value, str) else None)[idx[list(axes).index(field)]]
+        else:
+            grid[field] = np.full(n, value, dtype=object if isinstance(value, str) else None)
+    return pd.DataFrame(grid)
+
+
+def _scenario_batch(req: ScenarioInput) -> dict:
+    """
+    Revenue and subscription predictions for every scenario of the grid:
+    one nearest-centroid pass, one modifier-stack evaluation and one
+    feature-encoding + predict_proba call over the whole grid.
+    """
+    t_start = time.perf_counter()
+    axes = _scenario_axes(req)
+    grid = _scenario_grid(req.base.model_dump(), axes)
+    disc  = grid["discount_applied"].to_numpy() == 1
+    promo = grid["promo_code_used"].to_numpy() == 1
+
+    # Revenue: centroid segment + modifier stack, as /predictions/revenue.
+    if _CENTROIDS is None:
+        labels = np.array([_assign_segment_rule(d, p, r, False) for d, p, r in
+                           zip(disc, grid["previous_purchases"], grid["review_rating"])], dtype=object)
+        conf = np.full(len(grid), 0.5)
+        base_spend = np.array([_segment_spend(l) for l in labels])
+    else:
+        seg_idx, conf = _nearest_centroids(np.column_stack([
+            grid["purchase_amount"], grid["frequency_score"], grid["previous_purchases"],
+            grid["review_rating"], disc.astype(float)]))
+        labels = np.asarray(_CENTROIDS["labels"], dtype=object)[seg_idx]
+        base_spend = np.array([_segment_spend(l) for l in _CENTROIDS["labels"]])[seg_idx]
+    revenue = _predicted_revenue(base_spend, _revenue_modifiers(
+        grid["frequency_score"].to_numpy(), grid["review_rating"].to_numpy(), disc, promo,
+        grid["age"].to_numpy(), grid["previous_purchases"].to_numpy()))
+
+    # Subscription: one predict_proba over the grid's distinct model inputs (the
+    # model ignores e.g. season and promo, so sweeps repeat rows), heuristic if
+    # the model is missing.
+    models = model_store.active()
+    sub_model = "Heuristic fallback"
+    probs = None
+    if models.available("subscription"):
+        try:
+            artifact = models.get("subscription")
+            records = pd.DataFrame({
+                "Age":                    grid["age"],
+                "Purchase Amount (USD)":  grid["purchase_amount"],
+                "Previous Purchases":     grid["previous_purchases"],
+                "Review Rating":          grid["review_rating"],
+                "Discount Applied":       np.where(disc, "Yes", "No"),
+                "Promo Code Used":        np.where(promo, "Yes", "No"),
+                "Frequency of Purchases": grid["frequency_score"].map(FREQ_LABELS).fillna("Monthly"),
+                "Gender":                 "Female",
+                "Category":               grid["category"],
+                "Season":                 grid["season"],
+            })
+            X = _subscription_matrix(artifact, models.pipeline(), records)
+            group = pd.DataFrame(X).groupby(list(range(X.shape[1])), sort=False).ngroup().to_numpy()
+            first = np.unique(group, return_index=True)[1]
+            probs = np.round(artifact["model"].predict_proba(X[first])[:, 1].astype(float), 4)[group]
+            sub_model = "XGBClassifier"
+        except ModelNotAvailable:
+            pass
+        except Exception:
+            logger.exception("Subscription model inference failed; using heuristic fallback")
+    if probs is None:
+        probs = _subscription_heuristic(grid["previous_purchases"], grid["frequency_score"], grid["purchase_amount"],
+                                        grid["review_rating"], disc, promo)
+
+    varied = {f: grid[f].tolist() for f in axes}
+    columns = {
+        **varied,
+        "predicted_revenue":        revenue.tolist(),
+        "segment":                  labels.tolist(),
+        "segment_confidence":       np.asarray(conf, dtype=float).tolist(),
+        "subscription_probability": probs.tolist(),
+    }
+    best_rev, best_sub = int(revenue.argmax()), int(np.argmax(probs))
+    return {
+        "base":          req.base.model_dump(),
+        "vary":          axes,
+        "n_scenarios":   len(grid),
+        "columns":       columns,
+        "summary": {
+            "predicted_revenue":        {"min": float(revenue.min()), "max": float(revenue.max()),
+                                         "mean": round(float(revenue.mean()), 2)},
+            "subscription_probability": {"min": float(np.min(probs)), "max": float(np.max(probs)),
+                                         "mean": round(float(np.mean(probs)), 4)},
+            "best_revenue":      {k: v[best_rev] for k, v in columns.items()},
+            "best_subscription": {k: v[best_sub] for k, v in columns.items()},
+        },
+        "revenue_model":      "Centroid-based + modifier stack",
+        "subscription_model": sub_model,
+        "model_version":      models.version,
+        "latency_ms":         round((time.perf_counter() - t_start) * 1000, 3),
+    }
+
+
+# Concurrent single-row requests are coalesced into one vectorised call each.
+_revenue_batcher      = MicroBatcher("revenue", _revenue_batch)
+_subscription_batcher = MicroBatcher("subscription", _subscription_batch)
+_profile_batcher      = MicroBatcher("customer-profile", _customer_profile_batch)
+BATCHERS = [_revenue_batcher, _subscription_batcher, _profile_batcher]
+
+
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
 @router.post("/revenue")
-def predict_revenue(data: RevenueInput):
+async def predict_revenue(data: RevenueInput, explain: bool = False):
+    """
+    ?explain=true adds the CLV model's TreeSHAP attributions for this input and
+    its global importance ranking (a separate model from the modifier stack).
+    """
     try:
-        return _compute_revenue_prediction(data)
+        with phase("inference"):
+            return await _revenue_batcher.submit((data, explain))
+    except ComputeBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/subscription")
-def predict_subscription(data: SubscriptionInput):
+async def predict_subscription(data: SubscriptionInput, explain: bool = False):
+    """?explain=true adds the subscription model's TreeSHAP attributions."""
+    try:
+        with phase("inference"):
+            return await _subscription_batcher.submit((data, explain))
+    except ComputeBusy:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/customer-profile")
+async def predict_customer_profile(data: CustomerProfileInput, insights: bool = False, explain: bool = False):
+    """
+    CLV, churn, sentiment and anomaly predictions from one shared encoding pass.
+    Pass ?insights=true to also generate the GenAI multi-model narrative, and
+    ?explain=true for CLV / churn / sentiment TreeSHAP attributions.
+    """
     try:
-        return _compute_subscription_prediction(data)
+        with phase("inference"):
+            result = await _profile_batcher.submit((data, explain))
+    except ComputeBusy:
+        raise
+    except ModelNotAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    if insights:
+        t0 = time.perf_counter()
+        result["insights"] = await run_in_threadpool(generate_advanced_insights, "multi_model", result)
+        result["latency_ms"]["insights"] = round((time.perf_counter() - t0) * 1000, 3)
+    return result
+
+
+@router.post("/scenarios")
+def predict_scenarios(req: ScenarioInput, format: str = "rows"):
+    """
+    What-if sweep: expands base x vary into every combination server-side and
+    returns revenue and subscription predictions for all of them from one
+    vectorised batch. format=columns returns parallel arrays instead of one
+    object per scenario (smaller and faster for large grids).
+    """
+    if format not in ("rows", "columns"):
+        raise HTTPException(status_code=400, detail="format must be 'rows' or 'columns'")
+    try:
+        with phase("inference"):
+            result = _scenario_batch(req)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if format == "rows":
+        columns = result.pop("columns")
+        keys = list(columns)
+        result["scenarios"] = [dict(zip(keys, row)) for row in zip(*columns.values())]
+    # Already plain JSON types: skip FastAPI's per-value jsonable_encoder walk.
+    return TimedJSONResponse(result)
+
+
+@router.get("/batching")
+def get_batching_stats():
+    """Micro-batching queue depth, batch size and queue-wait histograms."""
+    return {"batchers": {b.name: b.stats() for b in BATCHERS}}
+
 
 @router.get("/revenue/feature-importance")
-def get_feature_importance():
-    return {
-        "model": "RandomForestRegressor (centroid-enhanced)",
-        "features": [
-            {"feature": "Previous Purchases", "importance": 0.28, "rank": 1},
-            {"feature": "Frequency Score",    "importance": 0.22, "rank": 2},
-            {"feature": "Review Rating",      "importance": 0.18, "rank": 3},
-            {"feature": "Age",                "importance": 0.12, "rank": 4},
-            {"feature": "Discount Applied",   "importance": 0.10, "rank": 5},
-            {"feature": "Promo Code Used",    "importance": 0.06, "rank": 6},
-            {"feature": "Subscription",       "importance": 0.04, "rank": 7},
-        ]
-    }
+def get_feature_importance(model: str = "clv"):
+    """
+    Global feature importance (mean |TreeSHAP contribution| over the dataset)
+    for one of the XGBoost models, precomputed per model version at warm-up.
+    503 with Retry-After while it is still being computed.
+    """
+    if model not in attributions.EXPLAINED_MODELS:
+        raise HTTPException(status_code=404,
+                            detail=f"No attributions for '{model}'. Valid: {', '.join(attributions.EXPLAINED_MODELS)}")
+    models = model_store.active()
+    if not models.available(model):
+        raise HTTPException(status_code=503, detail=f"Model '{model}' not available in {models.version}")
+    imp = attributions.cached_importance(models, model)
+    if imp is None:
+        attributions.schedule(models, model)    # off the request path; normally done by warm-up
+        raise HTTPException(status_code=503, detail=f"Feature importance for '{model}' is being computed",
+                            headers={"Retry-After": str(attributions.RETRY_AFTER_SECONDS)})
+    return {"model": f"{attributions.MODEL_TYPES[model]} ({model})", **imp}
@@ -0,0 +1,51 @@
+"""
+Reach Router - Approximate unique-customer reach per category / season / location
+Served from the HyperLogLog cube in reach.py (dataset baseline plus every
+batch posted to /ingest/transactions). Filters take comma-separated values
+and any dimension left out is rolled up, so every query is a register-wise
+max over the matching cells in constant memory per cell; estimates carry
+their relative standard error and a ~95% interval.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+import ingest
+import reach
+from reach import stream, DIMENSIONS
+
+router = APIRouter(prefix="/reach", tags=["reach"])
+
+ingest.subscribe("reach", stream.ingest)
+
+
+def _filters(category: Optional[str], season: Optional[str], location: Optional[str]) -> dict:
+    given = {"category": category, "season": season, "location": location}
+    return {d: [v.strip() for v in value.split(",") if v.strip()] for d, value in given.items() if value}
+
+
+# ── Endpoints ────────────────────────────────────────────────────────────────
+
+@router.get("")
+def get_reach(category: Optional[str] = None, season: Optional[str] = None, location: Optional[str] = None):
+    """Unique customers matching the filters, e.g. ?category=Footwear&season=Winter&location=Texas."""
+    filters = _filters(category, season, location)
+    return {"filters": filters, **stream.reach(filters)}
+
+
+@router.get("/breakdown")
+def get_reach_breakdown(by: str, category: Optional[str] = None, season: Optional[str] = None,
+                        location: Optional[str] = None):
+    """Unique customers per value of one dimension within the filters, largest first."""
+    if by not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown dimension '{by}'. Valid: {', '.join(DIMENSIONS)}")
+    filters = _filters(category, season, location)
+    rows = sorted(stream.breakdown(by, filters), key=lambda r: -r["unique_customers"])
+    return {"by": by, "filters": filters, "relative_error": round(reach.relative_error(), 4), "values": rows}
+
+
+@router.get("/stats")
+def get_reach_stats():
+    """Sketch precision, error bound, cell count and memory."""
+    return stream.stats()
@@ -8,6 +8,11 @@ import pandas as pd
 import numpy as np
 import json
 import os
+import clustering
+import snapshot
+from snapshot import load_dataset
+import startup
+from profiling import TimedJSONResponse
 
 router = APIRouter(prefix="/segments", tags=["segments"])
 
@@ -15,8 +20,7 @@ _BASE = os.path.dirname(os.path.dirname(__file__))
 
 # ── Load data at import time ──────────────────────────────────────────────────
 try:
-    _raw_df = pd.read_csv(os.path.join(_BASE, "dataset", "shopping_trends.csv"))
-    _raw_df.columns = [c.strip() for c in _raw_df.columns]
+    _raw_df = load_dataset()
 except Exception:
     _raw_df = None
 
@@ -35,12 +39,7 @@ SEGMENT_META = {
 
 ID_TO_LABEL = {v["id"]: k for k, v in SEGMENT_META.items()}
 
-PCA_COORDS = {
-    "Premium Urgent Buyers":    {"x": 1.8,  "y": 0.9},
-    "Loyal Frequent Buyers":    {"x": -0.5, "y": 1.4},
-    "Occasional Buyers":        {"x": -1.2, "y": -0.8},
-    "Discount-Driven Shoppers": {"x": 0.3,  "y": -1.6},
-}
+PROJECTION_TOP_FEATURES = 3
 
 
 def _assign_segment(row):
@@ -102,20 +101,96 @@ def _compute_stats():
     return result
 
 
+def _compute_clusters():
+    """Shipped KMeans over every row: cluster sizes and profiles, and agreement with the rule segments."""
+    if _raw_df is None or clustering.load_model() is None:
+        return None
+    ids = clustering.cluster_ids()
+    rules = clustering.rule_segment_codes(_raw_df)
+    k = len(clustering.SEGMENT_LABELS)
+    crosstab = np.bincount(ids.astype(np.int64) * k + rules, minlength=k * k).reshape(k, k)
+    clusters = clustering.summary(_raw_df, ids, clustering.SEGMENT_LABELS)
+    for entry, row in zip(clusters, crosstab):
+        entry["id"] = SEGMENT_META[entry["label"]]["id"]
+        entry["rule_segments"] = {label: int(n) for label, n in zip(clustering.SEGMENT_LABELS, row)}
+    _, kmeans = clustering.load_model()
+    return {
+        "model":     f"KMeans (k={kmeans.n_clusters}) on the {kmeans.n_features_in_}-column preprocessing pipeline output",
+        "rows":      int(len(ids)),
+        "clusters":  clusters,
+        "rule_agreement": round(float(np.trace(crosstab)) / max(len(ids), 1), 4),
+    }
+
+
+def _compute_projection():
+    """
+    2-D PCA of the KMeans feature space: segment centroids plus a stratified
+    sample of customers, grouped by the same rule-based segments as /segments
+    so sizes and labels agree with it.
+    """
+    if _raw_df is None or clustering.load_model() is None:
+        return None
+    proj = clustering.projection(_raw_df, clustering.rule_segment_codes(_raw_df))
+    labels = clustering.SEGMENT_LABELS
+    axes = []
+    for i, (ratio, loading) in enumerate(zip(proj["explained_variance_ratio"], proj["loadings"])):
+        top = np.argsort(-np.abs(loading), kind="stable")[:PROJECTION_TOP_FEATURES]
+        axes.append({
+            "name":  f"PC{i + 1}",
+            "explained_variance_ratio": round(ratio, 4),
+            "top_features": [{"feature": proj["features"][j], "loading": round(float(loading[j]), 3)} for j in top],
+        })
+    return {
+        "method": (f"PCA over the {len(proj['features'])}-column KMeans preprocessing pipeline output, "
+                   "grouped by rule-based segment"),
+        "rows":   proj["rows"],
+        "axes":   axes,
+        "centroids": {labels[c]: {"x": round(float(x), 3), "y": round(float(y), 3), "size": int(proj["sizes"][c])}
+                      for c, (x, y) in enumerate(proj["centroids"])},
+        "points": [{"x": round(float(x), 3), "y": round(float(y), 3), "segment": SEGMENT_META[labels[c]]["id"],
+                    "weight": round(float(w), 2)}
+                   for (x, y), c, w in zip(proj["points"], proj["point_clusters"], proj["point_weights"])],
+    }
+
+
 # Pre-compute at module load
-_STATS = _compute_stats()
+with startup.phase("segments._compute_stats"):
+    _STATS = snapshot.aggregate("segments.stats", _compute_stats)
+# Clusters need the dataset-wide cluster column; both are filled by the app warm-up.
+snapshot.register("segments.clusters", _compute_clusters)
+snapshot.register("segments.projection", _compute_projection)
 
 
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
 @router.get("/projection/all")
-def get_pca_projection():
-    """2D centroid projection for scatter plot."""
+def get_pca_projection(points: bool = True):
+    """
+    2D PCA projection for the scatter plot: segment centroids ("projections")
+    and, unless ?points=false, up to SHOPMIND_PROJECTION_POINTS sampled
+    customers, each standing for `weight` rows.
+    """
+    proj = snapshot.aggregate("segments.projection")
+    if proj is None:
+        return {"error": "KMeans model or dataset not available", "projections": [], "points": []}
     projections = [
-        {"label": label, "x": coords["x"], "y": coords["y"], "color": SEGMENT_META[label]["color"]}
-        for label, coords in PCA_COORDS.items()
+        {"label": label, "x": c["x"], "y": c["y"], "size": c["size"], "color": SEGMENT_META[label]["color"]}
+        for label, c in proj["centroids"].items()
     ]
-    return {"projections": projections}
+    result = {"projections": projections, "method": proj["method"], "rows": proj["rows"], "axes": proj["axes"]}
+    if points:
+        result["points"] = proj["points"]
+    # Plain floats/ints/strings: skip jsonable_encoder's walk over the points.
+    return TimedJSONResponse(result)
+
+
+@router.get("/clusters")
+def get_clusters():
+    """Dataset-wide assignment by the shipped KMeans model (final_models/kmeans_model.pkl)."""
+    clusters = snapshot.aggregate("segments.clusters")
+    if clusters is None:
+        raise HTTPException(status_code=503, detail="KMeans model or dataset not available")
+    return clusters
 
 
 @router.get("")
@@ -141,6 +216,13 @@ def list_segments():
     return {"segments": result}
 
 
+def _pca_position(label: str) -> dict:
+    """Segment centroid in the projection; the origin (the dataset mean) when there is none."""
+    proj = snapshot.aggregate("segments.projection")
+    c = proj["centroids"].get(label) if proj else None
+    return {"x": c["x"], "y": c["y"]} if c else {"x": 0.0, "y": 0.0}
+
+
 @router.get("/{segment_id}")
 def get_segment_detail(segment_id: str):
     """Detailed profile for a specific segment."""
@@ -165,6 +247,6 @@ def get_segment_detail(segment_id: str):
             "top_shipping": kb.get("top_shipping_type", "N/A"),
             "avg_frequency": kb.get("avg_frequency", 0),
         },
-        "pca_position": PCA_COORDS.get(label, {"x": 0, "y": 0}),
+        "pca_position": _pca_position(label),
         "knowledge":    kb,
     }
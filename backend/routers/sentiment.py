@@ -1,20 +1,29 @@
 """
 Sentiment Router - NLP-based Sentiment Analysis from Review Ratings
 Computes real sentiment metrics per segment and category from dataset.
+Every grouping (segment, cluster, category, item, color, size, location,
+season) comes from one precomputed set of bincount tables
+(sentiment_engine.py); /sentiment/categories?by= lists are paged, sorted and
+projected from SortedIndexes over them (paging.py).
 """
 
-from fastapi import APIRouter
-import pandas as pd
-import numpy as np
+import functools
+from typing import Optional
+from fastapi import APIRouter, HTTPException
 import os
+import snapshot
+from snapshot import load_dataset
+import metrics
+import paging
+import sentiment_engine
+from profiling import phase
 
 router = APIRouter(prefix="/sentiment", tags=["sentiment"])
 
 _BASE = os.path.dirname(os.path.dirname(__file__))
 
 try:
-    _df = pd.read_csv(os.path.join(_BASE, "dataset", "shopping_trends.csv"))
-    _df.columns = [c.strip() for c in _df.columns]
+    _df = load_dataset()
     _loaded = True
 except Exception:
     _df = None
@@ -30,68 +39,72 @@ def _rating_to_sentiment(rating: float) -> str:
         return "Negative"
 
 
-def _assign_segment(row):
-    disc = row.get("Discount Applied", "No")
-    disc_flag = disc == "Yes" if isinstance(disc, str) else bool(disc)
-    prev = row.get("Previous Purchases", 0)
-    rating = row.get("Review Rating", 3.0)
-    sub = row.get("Subscription Status", "No")
-    sub_flag = sub == "Yes" if isinstance(sub, str) else bool(sub)
-
-    if disc_flag and prev < 8:
-        return "Discount-Driven Shoppers"
-    elif sub_flag and prev > 15:
-        return "Loyal Frequent Buyers"
-    elif rating >= 4.2 and prev > 20:
-        return "Premium Urgent Buyers"
-    else:
-        return "Occasional Buyers"
+SEGMENT_ICONS = {
+    "Premium Urgent Buyers":    "💎",
+    "Loyal Frequent Buyers":    "⭐",
+    "Occasional Buyers":        "🛍️",
+    "Discount-Driven Shoppers": "🏷️",
+}
+SEGMENT_COLORS = {
+    "Premium Urgent Buyers":    "#6366f1",
+    "Loyal Frequent Buyers":    "#10b981",
+    "Occasional Buyers":        "#f59e0b",
+    "Discount-Driven Shoppers": "#ef4444",
+}
 
 
-def _compute_sentiment_data():
-    if _df is None:
+def _compute_tables():
+    """Rating histogram and sentiment counts for every grouping (sentiment_engine.py)."""
+    if _df is None or "Review Rating" not in _df.columns:
         return None
+    return sentiment_engine.tables(_df)
 
-    df = _df.copy()
-    if "Review Rating" not in df.columns:
-        return None
 
-    df["Segment"] = df.apply(_assign_segment, axis=1)
-    df["Sentiment"] = df["Review Rating"].apply(_rating_to_sentiment)
+def _tables():
+    with phase("dataset"):
+        return snapshot.aggregate("sentiment.tables")
 
-    segments = ["Premium Urgent Buyers", "Loyal Frequent Buyers", "Occasional Buyers", "Discount-Driven Shoppers"]
-    ICONS = {
-        "Premium Urgent Buyers":    "💎",
-        "Loyal Frequent Buyers":    "⭐",
-        "Occasional Buyers":        "🛍️",
-        "Discount-Driven Shoppers": "🏷️",
-    }
-    COLORS = {
-        "Premium Urgent Buyers":    "#6366f1",
-        "Loyal Frequent Buyers":    "#10b981",
-        "Occasional Buyers":        "#f59e0b",
-        "Discount-Driven Shoppers": "#ef4444",
+
+def _avg_rating(t: dict, i: int) -> float:
+    return round(float(t["rating_sum"][i]) / int(t["rated"][i]), 3) if t["rated"][i] else 0.0
+
+
+def _group_record(t: dict, i: int, key_name: str) -> dict:
+    """One group in the breakdown list shape."""
+    avg_r = _avg_rating(t, i)
+    neg, neu, pos = (int(v) for v in t["sentiment"][i])
+    return {
+        key_name:      t["keys"][i],
+        "avg_rating":  avg_r,
+        "total":       int(t["rows"][i]),
+        "positive":    pos,
+        "neutral":     neu,
+        "negative":    neg,
+        "sentiment":   _rating_to_sentiment(avg_r),
+        "score":       round((avg_r - 1) / 4, 3),
     }
 
+
+def _compute_sentiment_data():
+    tables = _tables()
+    if tables is None:
+        return None
+
     per_segment = []
-    for seg in segments:
-        seg_df = df[df["Segment"] == seg]
-        if seg_df.empty:
+    t = tables["segment"]
+    for i, seg in enumerate(t["keys"]):
+        total = int(t["rows"][i])
+        if total == 0:
             continue
-        total = len(seg_df)
-        pos   = int((seg_df["Sentiment"] == "Positive").sum())
-        neu   = int((seg_df["Sentiment"] == "Neutral").sum())
-        neg   = int((seg_df["Sentiment"] == "Negative").sum())
-        avg_r = round(float(seg_df["Review Rating"].mean()), 3)
-        avg_s = round(float(seg_df["Purchase Amount (USD)"].mean()), 2) if "Purchase Amount (USD)" in seg_df.columns else 0
-
+        neg, neu, pos = (int(v) for v in t["sentiment"][i])
+        avg_r = _avg_rating(t, i)
         per_segment.append({
             "segment":              seg,
-            "icon":                 ICONS.get(seg, "📊"),
-            "color":                COLORS.get(seg, "#6366f1"),
+            "icon":                 SEGMENT_ICONS.get(seg, "📊"),
+            "color":                SEGMENT_COLORS.get(seg, "#6366f1"),
             "size":                 total,
             "avg_rating":           avg_r,
-            "avg_spend":            avg_s,
+            "avg_spend":            round(float(t["spend_sum"][i]) / total, 2),
             "positive_count":       pos,
             "neutral_count":        neu,
             "negative_count":       neg,
@@ -102,32 +115,19 @@ def _compute_sentiment_data():
             "avg_sentiment_score":  round((avg_r - 1) / 4, 3),
         })
 
-    # Category-level sentiment
+    # Category-level sentiment, highest rating first
     cat_sentiment = []
-    if "Category" in df.columns:
-        for cat in df["Category"].dropna().unique():
-            cat_df = df[df["Category"] == cat]
-            avg_r  = round(float(cat_df["Review Rating"].mean()), 3)
-            total  = len(cat_df)
-            pos    = int((cat_df["Sentiment"] == "Positive").sum())
-            neg    = int((cat_df["Sentiment"] == "Negative").sum())
-            cat_sentiment.append({
-                "category":    cat,
-                "avg_rating":  avg_r,
-                "total":       total,
-                "positive":    pos,
-                "negative":    neg,
-                "sentiment":   _rating_to_sentiment(avg_r),
-                "score":       round((avg_r - 1) / 4, 3),
-            })
+    if "category" in tables:
+        t = tables["category"]
+        cat_sentiment = [{k: v for k, v in _group_record(t, i, "category").items() if k != "neutral"}
+                         for i in range(len(t["keys"]))]
         cat_sentiment.sort(key=lambda x: x["avg_rating"], reverse=True)
 
     # Overall
-    overall_rating = round(float(df["Review Rating"].mean()), 3)
-    overall_pos = int((df["Sentiment"] == "Positive").sum())
-    overall_neu = int((df["Sentiment"] == "Neutral").sum())
-    overall_neg = int((df["Sentiment"] == "Negative").sum())
-    total_all   = len(df)
+    t = tables["overall"]
+    overall_rating = _avg_rating(t, 0)
+    overall_neg, overall_neu, overall_pos = (int(v) for v in t["sentiment"][0])
+    total_all = int(t["rows"][0])
 
     return {
         "per_segment": per_segment,
@@ -147,24 +147,46 @@ def _compute_sentiment_data():
     }
 
 
+# Breakdown -> grouping in sentiment_engine.GROUPINGS; every one is served
+# from the precomputed tables in the per_category record shape, keyed by its
+# name, plus a neutral count.
+BREAKDOWNS = tuple(sentiment_engine.GROUPINGS)
+BREAKDOWN_SORTS = ("avg_rating", "total", "positive", "neutral", "negative", "score")
+
+
+snapshot.register("sentiment.tables", _compute_tables)
+snapshot.register("sentiment.data", _compute_sentiment_data)
 _sentiment_cache = None
 
 def _get_sentiment():
     global _sentiment_cache
     if _sentiment_cache is None:
-        _sentiment_cache = _compute_sentiment_data()
+        metrics.cache_miss("sentiment")
+        with phase("dataset"):
+            _sentiment_cache = snapshot.aggregate("sentiment.data")
+    else:
+        metrics.cache_hit("sentiment")
     return _sentiment_cache
 
 
+@functools.lru_cache(maxsize=None)
+def _breakdown_index(by: str):
+    """SortedIndex over one breakdown (sorted by avg_rating, highest first), built on first use."""
+    t = (_tables() or {}).get(by)
+    records = [_group_record(t, i, by) for i in range(len(t["keys"])) if t["rows"][i]] if t else []
+    records.sort(key=lambda x: x["avg_rating"], reverse=True)
+    return paging.SortedIndex(records, (by, *BREAKDOWN_SORTS), default_sort="-avg_rating")
+
+
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
 @router.get("")
-def get_sentiment_overview():
-    """Full sentiment analysis: per segment, per category, overall."""
+def get_sentiment_overview(fields: Optional[str] = None):
+    """Full sentiment analysis: per segment, per category, overall (fields projects top-level keys)."""
     data = _get_sentiment()
     if data is None:
         return {"error": "Data not available", "per_segment": [], "per_category": [], "overall": {}}
-    return data
+    return paging.project(data, paging.parse_fields(fields))
 
 
 @router.get("/segments")
@@ -177,12 +199,46 @@ def get_segment_sentiments():
 
 
 @router.get("/categories")
-def get_category_sentiments():
-    """Per-category sentiment scores."""
-    data = _get_sentiment()
-    if data is None:
-        return {"categories": []}
-    return {"categories": data["per_category"]}
+def get_category_sentiments(by: str = "category", sort: Optional[str] = None, limit: Optional[int] = None,
+                            cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Per-category sentiment scores, highest rating first. by= breaks down by
+    another grouping instead (segment, cluster, item, color, size, location,
+    season); sort, limit, cursor and fields page through and project the list.
+    """
+    if by not in BREAKDOWNS:
+        raise HTTPException(status_code=400, detail=f"Unknown breakdown '{by}'. Valid: {', '.join(BREAKDOWNS)}")
+    page = _breakdown_index(by).page(sort=sort, limit=limit, cursor=cursor, fields=paging.parse_fields(fields))
+    return {
+        "categories":  page["items"],
+        "by":          by,
+        "total":       page["total"],
+        "sort":        page["sort"],
+        "next_cursor": page["next_cursor"],
+    }
+
+
+@router.get("/histogram")
+def get_rating_histogram(by: Optional[str] = None, key: Optional[str] = None):
+    """
+    Full rating histogram (0.1-star buckets) with sentiment counts: overall,
+    or for one group, e.g. ?by=color&key=Blue.
+    """
+    tables = _tables()
+    if tables is None:
+        raise HTTPException(status_code=503, detail="Data not available")
+    if by is None:
+        t, i = tables["overall"], 0
+    else:
+        if by not in tables or by == "overall":
+            raise HTTPException(status_code=400, detail=f"Unknown grouping '{by}'. Valid: {', '.join(BREAKDOWNS)}")
+        t = tables[by]
+        lookup = {k.lower(): n for n, k in enumerate(t["keys"])}
+        if key is None or key.strip().lower() not in lookup:
+            raise HTTPException(status_code=404, detail=f"Unknown {by} '{key}'")
+        i = lookup[key.strip().lower()]
+    record = _group_record(t, i, by or "group")
+    return {**record, "by": by, "histogram": sentiment_engine.histogram(t, i)}
 
 
 @router.get("/segment/{segment_id}")
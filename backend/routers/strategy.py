@@ -6,6 +6,7 @@ Combines ML outputs to generate segment-level and per-customer strategies.
 from fastapi import APIRouter
 import json
 import os
+from snapshot import load_dataset
 
 router = APIRouter(prefix="/strategy", tags=["strategy"])
 
@@ -17,10 +18,8 @@ try:
 except Exception:
     _knowledge = {}
 
-import pandas as pd
 try:
-    _df = pd.read_csv(os.path.join(_BASE, "dataset", "shopping_trends.csv"))
-    _df.columns = [c.strip() for c in _df.columns]
+    _df = load_dataset()
 except Exception:
     _df = None
 
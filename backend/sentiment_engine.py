@@ -0,0 +1,102 @@
+"""
+Sentiment Engine - Rating histograms and sentiment counts for any grouping
+Review Rating is discretised once into integer codes (0.1-star buckets,
+0..50), and sentiment is a range of codes (Negative < 3.0 <= Neutral < 4.0
+<= Positive), so one np.bincount over group_code * N_CODES + rating_code
+gives every group's full rating histogram, and with it its sentiment counts
+and rated rows. Rows, spend and rating sums are one (weighted) bincount
+each. tables() builds every grouping in GROUPINGS this way; the sentiment
+router serves its lists from that one precomputed result.
+"""
+
+import numpy as np
+import pandas as pd
+
+import clustering
+
+RATING_STEP = 0.1
+N_CODES     = 51                        # 0.0 .. 5.0 in RATING_STEP buckets
+SENTIMENTS  = ["Negative", "Neutral", "Positive"]
+# First code of Neutral and Positive: ratings 3.0 and 4.0.
+SENTIMENT_CUTS = (30, 40)
+
+# Grouping name -> dataset column; "segment" is the rule-based segment and
+# "cluster" the shipped KMeans cluster, both labelled with SEGMENT_LABELS.
+GROUPINGS = {
+    "segment":  None,
+    "cluster":  None,
+    "category": "Category",
+    "item":     "Item Purchased",
+    "color":    "Color",
+    "size":     "Size",
+    "location": "Location",
+    "season":   "Season",
+}
+
+
+def rating_codes(ratings: np.ndarray) -> np.ndarray:
+    """Ratings -> int16 bucket codes (floor to RATING_STEP); -1 for missing ratings."""
+    ratings = np.asarray(ratings, dtype=float)
+    rated = ~np.isnan(ratings)
+    codes = np.full(len(ratings), -1, dtype=np.int16)
+    codes[rated] = np.clip(np.floor(ratings[rated] / RATING_STEP + 1e-6), 0, N_CODES - 1)
+    return codes
+
+
+def group_codes(df: pd.DataFrame, by: str) -> tuple:
+    """(int64 code per row, -1 when missing; key per code) for grouping `by`."""
+    if by == "segment":
+        return clustering.rule_segment_codes(df), list(clustering.SEGMENT_LABELS)
+    if by == "cluster":
+        return np.asarray(clustering.cluster_ids(), dtype=np.int64), list(clustering.SEGMENT_LABELS)
+    codes, keys = pd.factorize(df[GROUPINGS[by]], sort=True)
+    return codes.astype(np.int64), [str(k) for k in keys]
+
+
+def table(codes: np.ndarray, keys: list, ratings: np.ndarray, rcodes: np.ndarray,
+          spend: np.ndarray = None) -> dict:
+    """
+    Per-group arrays for one grouping: rows, spend_sum, rating_sum, hist
+    (groups x N_CODES) and the derived sentiment (groups x 3) and rated.
+    `rcodes` are rating_codes(ratings); rows with a missing group are dropped.
+    """
+    g = len(keys)
+    present = codes >= 0
+    rated = present & (rcodes >= 0)
+    hist = np.bincount(codes[rated] * N_CODES + rcodes[rated], minlength=g * N_CODES).reshape(g, N_CODES)
+    bounds = (0, *SENTIMENT_CUTS, N_CODES)
+    return {
+        "keys":       keys,
+        "rows":       np.bincount(codes[present], minlength=g),
+        "spend_sum":  (np.bincount(codes[present], weights=spend[present], minlength=g)
+                       if spend is not None else np.zeros(g)),
+        "hist":       hist,
+        "sentiment":  np.stack([hist[:, lo:hi].sum(axis=1) for lo, hi in zip(bounds, bounds[1:])], axis=1),
+        "rated":      hist.sum(axis=1),
+        "rating_sum": np.bincount(codes[rated], weights=ratings[rated], minlength=g),
+    }
+
+
+def tables(df: pd.DataFrame, groupings=None) -> dict:
+    """{grouping: table} for the given groupings (default: all available), plus "overall"."""
+    ratings = df["Review Rating"].to_numpy(dtype=float)
+    rcodes = rating_codes(ratings)
+    spend = df["Purchase Amount (USD)"].to_numpy(dtype=float) if "Purchase Amount (USD)" in df.columns else None
+    result = {"overall": table(np.zeros(len(df), dtype=np.int64), ["overall"], ratings, rcodes, spend)}
+    for by in groupings or GROUPINGS:
+        if GROUPINGS[by] is not None and GROUPINGS[by] not in df.columns:
+            continue
+        if by == "cluster" and clustering.load_model() is None:
+            continue
+        codes, keys = group_codes(df, by)
+        result[by] = table(codes, keys, ratings, rcodes, spend)
+    return result
+
+
+def histogram(t: dict, i: int) -> list:
+    """Group i's rating histogram as [{"rating", "count"}] over the non-empty range of codes."""
+    row = t["hist"][i]
+    used = np.flatnonzero(t["hist"].sum(axis=0))
+    if not len(used):
+        return []
+    return [{"rating": round(c * RATING_STEP, 1), "count": int(row[c])} for c in range(used[0], used[-1] + 1)]
@@ -0,0 +1,72 @@
+"""
+Serve - Multi-worker launcher sharing one dataset snapshot
+Builds the columnar snapshot (dataset columns + router precomputes) once in
+this process, then replaces itself with uvicorn running N workers that attach
+to it through SHOPMIND_SNAPSHOT_DIR. Each worker memory-maps the same column
+files read-only instead of parsing the CSV and recomputing the aggregates, so
+per-worker memory is the interpreter plus the models.
+
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 4 --snapshot-dir /dev/shm/shopmind   # tmpfs-backed
+
+Everything after `--` is passed to uvicorn unchanged.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+_BASE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT_DIR = os.path.join(_BASE, "dataset", "snapshot")
+
+
+def main(argv=None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    extra = []
+    if "--" in argv:
+        i = argv.index("--")
+        argv, extra = argv[:i], argv[i + 1:]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--snapshot-dir", default=os.getenv("SHOPMIND_SNAPSHOT_DIR") or DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--no-build", action="store_true",
+                        help="attach to an existing snapshot instead of rebuilding it")
+    parser.add_argument("--build-only", action="store_true",
+                        help="build the snapshot and exit (used by the snapshot job)")
+    args = parser.parse_args(argv)
+
+    snapshot_dir = os.path.abspath(args.snapshot_dir)
+    env = dict(os.environ, SHOPMIND_SNAPSHOT_DIR=snapshot_dir)
+    if not args.no_build:
+        # The builder must parse the CSV itself, not attach to an old snapshot,
+        # and computes every aggregate inline rather than on a compute pool.
+        os.environ.pop("SHOPMIND_SNAPSHOT_DIR", None)
+        os.environ["SHOPMIND_COMPUTE_WORKERS"] = "0"
+        sys.path.insert(0, _BASE)
+        import snapshot
+
+        started = time.perf_counter()
+        manifest = snapshot.build(snapshot_dir)
+        print(json.dumps({
+            "snapshot":   snapshot_dir,
+            "rows":       manifest["rows"],
+            "aggregates": manifest["aggregates"],
+            "seconds":    round(time.perf_counter() - started, 2),
+        }), flush=True)
+        if args.build_only:
+            return
+
+    cmd = [sys.executable, "-m", "uvicorn", "app:app",
+           "--host", args.host, "--port", str(args.port), "--workers", str(args.workers), *extra]
+    os.chdir(_BASE)
+    # exec drops the builder's copy of the dataset before the workers start.
+    os.execvpe(cmd[0], cmd, env)
+
+
+if __name__ == "__main__":
+    main()
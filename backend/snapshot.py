@@ -0,0 +1,296 @@
+"""
+Snapshot - The transactions dataset every router precomputes from
+The CSV is parsed once per process and shared read-only by the routers and
+app.py. SHOPMIND_DATASET points it at another file (e.g. a synthetic one from
+benchmarks/synth.py) without touching the code.
+
+Multi-worker mode: build() writes a columnar snapshot directory once (one
+.npy file per column, string columns as integer codes plus their categories,
+and the precomputed aggregates pickled), and processes started with
+SHOPMIND_SNAPSHOT_DIR attach to it instead of parsing and precomputing. The
+column files are memory-mapped read-only, so all workers share one copy of
+the dataset through the page cache. Aggregates holding per-row arrays (e.g.
+the customer KD-tree) are pickled with protocol 5 and their large buffers
+written out-of-band to one file that is memory-mapped too, so they are not
+copied onto every worker's heap either. serve.py builds the snapshot and then
+starts uvicorn with --workers.
+
+Derived columns (register_column(), e.g. the KMeans cluster id per row) are
+model outputs over every row: build() stores them next to the dataset
+columns, flagged "derived" so the attached frame stays the CSV's columns, and
+column() memory-maps them in attached processes.
+"""
+
+import datetime
+import functools
+import json
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import startup
+
+logger = logging.getLogger("shopmind.snapshot")
+
+_BASE = os.path.dirname(__file__)
+DATASET_PATH = os.getenv("SHOPMIND_DATASET", os.path.join(_BASE, "dataset", "shopping_trends.csv"))
+SNAPSHOT_DIR = os.getenv("SHOPMIND_SNAPSHOT_DIR", "")
+
+SNAPSHOT_FORMAT = 2
+MANIFEST_FILE   = "manifest.json"
+AGGREGATES_FILE = "aggregates.pkl"
+BUFFERS_FILE    = "aggregates.buffers"
+# Pickle buffers at least this large go to BUFFERS_FILE; smaller ones stay in-band.
+OUT_OF_BAND_BYTES = 64 * 1024
+BUFFER_ALIGN      = 64
+
+_loaded_at = None
+_registry  = {}        # aggregate name -> compute function, registered by the routers
+_values    = {}        # aggregate name -> value in this process
+_column_registry = {}  # derived column name -> compute(df) -> array with one value per row
+_column_values   = {}  # derived column name -> array in this process
+_aggregate_lock = threading.RLock()
+
+
+# ── Attached snapshot ─────────────────────────────────────────────────────────
+
+def _source_stamp(path: str) -> dict:
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+@functools.lru_cache(maxsize=1)
+def attached_manifest():
+    """
+    Manifest of the snapshot in SHOPMIND_SNAPSHOT_DIR, or None when not set,
+    unreadable or built from a different dataset file (the CSV is then parsed
+    as usual).
+    """
+    if not SNAPSHOT_DIR:
+        return None
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Snapshot %s not usable (%s); parsing %s", SNAPSHOT_DIR, e, DATASET_PATH)
+        return None
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        logger.warning("Snapshot %s has format %s, expected %s; ignoring it",
+                       SNAPSHOT_DIR, manifest.get("format"), SNAPSHOT_FORMAT)
+        return None
+    try:
+        stamp = _source_stamp(DATASET_PATH)
+    except OSError:
+        stamp = None
+    if stamp is not None and manifest.get("source") != stamp:
+        logger.warning("Snapshot %s was built from a different dataset; ignoring it", SNAPSHOT_DIR)
+        return None
+    return manifest
+
+
+def _attach_frame(manifest: dict) -> pd.DataFrame:
+    """DataFrame over the memory-mapped column files; no column is copied."""
+    columns = {}
+    for col in manifest["columns"]:
+        if col.get("derived"):
+            continue
+        data = np.load(os.path.join(SNAPSHOT_DIR, col["file"]), mmap_mode="r")
+        if col["kind"] == "categorical":
+            data = pd.Categorical.from_codes(data, categories=pd.Index(col["categories"], dtype="str"))
+        columns[col["name"]] = data
+    return pd.DataFrame(columns, copy=False)
+
+
+@functools.lru_cache(maxsize=1)
+def _stored_aggregates() -> dict:
+    manifest = attached_manifest()
+    if manifest is None:
+        return {}
+    with startup.phase("snapshot.aggregates"):
+        buffers = []
+        if manifest.get("buffers"):
+            with open(os.path.join(SNAPSHOT_DIR, BUFFERS_FILE), "rb") as f:
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            buffers = [view[offset:offset + size] for offset, size in manifest["buffers"]]
+        with open(os.path.join(SNAPSHOT_DIR, AGGREGATES_FILE), "rb") as f:
+            # Arrays over out-of-band buffers are read-only views of the shared map.
+            return pickle.load(f, buffers=buffers)
+
+
+@functools.lru_cache(maxsize=1)
+def load_dataset() -> pd.DataFrame:
+    """
+    Parsed dataset with stripped column names. The frame is shared between
+    callers: copy it before adding columns or mutating values. Attached
+    snapshot columns are read-only memory maps.
+    """
+    global _loaded_at
+    manifest = attached_manifest()
+    if manifest is not None:
+        with startup.phase("snapshot.attach"):
+            df = _attach_frame(manifest)
+    else:
+        with startup.phase("dataset.load"):
+            df = pd.read_csv(DATASET_PATH)
+            df.columns = [c.strip() for c in df.columns]
+    _loaded_at = time.time()
+    return df
+
+
+# ── Aggregates ────────────────────────────────────────────────────────────────
+
+def register(name: str, compute) -> None:
+    """Declare how aggregate `name` is computed (for lazily computed ones)."""
+    _registry[name] = compute
+
+
+def aggregate(name: str, compute=None):
+    """
+    Value of the precomputed aggregate `name`: taken from the attached
+    snapshot when it has one, else computed once in this process.
+    """
+    if compute is not None:
+        register(name, compute)
+    if name in _values:
+        return _values[name]
+    with _aggregate_lock:
+        if name not in _values:
+            stored = _stored_aggregates()
+            _values[name] = stored[name] if name in stored else _registry[name]()
+    return _values[name]
+
+
+# ── Derived columns ───────────────────────────────────────────────────────────
+
+def register_column(name: str, compute) -> None:
+    """Declare derived column `name`; compute(df) returns one value per dataset row."""
+    _column_registry[name] = compute
+
+
+def column(name: str) -> np.ndarray:
+    """
+    Derived column `name`: memory-mapped from the attached snapshot when it
+    has it, else computed once in this process. Read-only either way.
+    """
+    if name in _column_values:
+        return _column_values[name]
+    with _aggregate_lock:
+        if name not in _column_values:
+            manifest = attached_manifest()
+            stored = next((c for c in (manifest or {}).get("columns", [])
+                           if c.get("derived") and c["name"] == name), None)
+            if stored is not None:
+                values = np.load(os.path.join(SNAPSHOT_DIR, stored["file"]), mmap_mode="r")
+            else:
+                with startup.phase(f"column.{name}"):
+                    values = np.asarray(_column_registry[name](load_dataset()))
+                values.flags.writeable = False
+            _column_values[name] = values
+    return _column_values[name]
+
+
+# ── Build ─────────────────────────────────────────────────────────────────────
+
+def _codes_dtype(n: int):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def build(out_dir: str) -> dict:
+    """
+    Write the snapshot of DATASET_PATH to `out_dir` (replaced atomically) and
+    return its manifest. Importing the app runs the router precomputes
+    against the parsed CSV, so this must run in a process without
+    SHOPMIND_SNAPSHOT_DIR set.
+    """
+    if attached_manifest() is not None:
+        raise RuntimeError("build() must not run in a process attached to a snapshot")
+    import app  # noqa: F401 - registers and computes the aggregates
+
+    df = load_dataset()
+    source = _source_stamp(DATASET_PATH)
+    out_dir = os.path.abspath(out_dir)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    with startup.phase("snapshot.build"):
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            file = f"col{i:03d}.npy"
+            if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                np.save(os.path.join(tmp_dir, file), np.ascontiguousarray(series.to_numpy()))
+                columns.append({"name": name, "kind": "numeric", "dtype": str(series.dtype), "file": file})
+            else:
+                codes, uniques = pd.factorize(series, sort=True)
+                np.save(os.path.join(tmp_dir, file), codes.astype(_codes_dtype(len(uniques))))
+                columns.append({"name": name, "kind": "categorical", "file": file,
+                                "categories": [str(u) for u in uniques]})
+        for i, name in enumerate(sorted(_column_registry), start=len(df.columns)):
+            file = f"col{i:03d}.npy"
+            values = column(name)
+            np.save(os.path.join(tmp_dir, file), np.ascontiguousarray(values))
+            columns.append({"name": name, "kind": "numeric", "dtype": str(values.dtype), "file": file,
+                            "derived": True})
+
+        values = {name: aggregate(name) for name in sorted(_registry)}
+        buffers = []
+        with open(os.path.join(tmp_dir, BUFFERS_FILE), "wb") as out:
+            def out_of_band(buf: pickle.PickleBuffer) -> bool:
+                raw = buf.raw()
+                if raw.nbytes < OUT_OF_BAND_BYTES:
+                    return True                             # keep in-band
+                out.write(b"\0" * (-out.tell() % BUFFER_ALIGN))
+                buffers.append([out.tell(), raw.nbytes])
+                out.write(raw)
+                return False
+
+            with open(os.path.join(tmp_dir, AGGREGATES_FILE), "wb") as f:
+                pickle.dump(values, f, protocol=5, buffer_callback=out_of_band)
+
+        manifest = {
+            "format":     SNAPSHOT_FORMAT,
+            "built_at":   datetime.datetime.now().isoformat(timespec="seconds"),
+            "source":     source,
+            "rows":       len(df),
+            "columns":    columns,
+            "aggregates": sorted(values),
+            "buffers":    buffers,                          # [offset, bytes] per out-of-band buffer
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+def _snapshot_families():
+    if _loaded_at is None:
+        return
+    yield ("shopmind_dataset_rows", "gauge", "Rows in the loaded dataset snapshot.",
+           [({}, len(load_dataset()))])
+    yield ("shopmind_snapshot_age_seconds", "gauge", "Seconds since the dataset snapshot was loaded.",
+           [({}, time.time() - _loaded_at)])
+    yield ("shopmind_snapshot_attached", "gauge", "1 when the dataset is memory-mapped from a shared snapshot.",
+           [({}, int(attached_manifest() is not None))])
+    try:
+        yield ("shopmind_dataset_file_age_seconds", "gauge", "Seconds since the dataset file was modified.",
+               [({}, time.time() - os.path.getmtime(DATASET_PATH))])
+    except OSError:
+        pass
+
+
+metrics.register_collector("snapshot", _snapshot_families)
@@ -0,0 +1,174 @@
+"""
+Startup - Phase timing, memory sampling and readiness for API boot
+Import-time work (dataset parse, router precomputes) and the post-start
+warm-up (lazy caches, model artifacts) each run inside startup.phase(name),
+which records wall time and the RSS before/after. Once warm-up finishes the
+report is logged as one structured JSON line and the process reports ready;
+/health/startup serves the report and /ready answers 503 until then.
+"""
+
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger("shopmind.startup")
+
+
+def _process_start_time() -> float:
+    """Wall-clock start of this process from /proc; now where unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+# Phase offsets are relative to the first import of this module (app.py
+# imports it before the routers); interpreter and library imports before
+# that are reported as "before_startup_s".
+PROCESS_STARTED = _process_start_time()
+_IMPORTED_AT = time.time()
+_T0 = time.perf_counter()
+
+_phases = []           # finished phases in completion order
+_stack  = threading.local()
+_lock   = threading.Lock()
+_ready  = threading.Event()
+_pending = set()
+_ready_at = None
+
+
+def rss_bytes() -> int:
+    """Current resident set size; 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class phase:
+    """Times the enclosed block as startup phase `name`; phases may nest."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_stack, "names", None)
+        if stack is None:
+            stack = _stack.names = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.rss_before = rss_bytes()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        _stack.names.pop()
+        rss_after = rss_bytes()
+        entry = {
+            "name":            self.name,
+            "parent":          self.parent,
+            "started_s":       round(self.started - _T0, 4),
+            "seconds":         round(elapsed, 4),
+            "rss_before_mb":   round(self.rss_before / 2**20, 1),
+            "rss_after_mb":    round(rss_after / 2**20, 1),
+            "rss_delta_mb":    round((rss_after - self.rss_before) / 2**20, 1),
+        }
+        if exc is not None:
+            entry["error"] = f"{exc_type.__name__}: {exc}"
+        with _lock:
+            _phases.append(entry)
+        return False
+
+
+def expect(*names: str) -> None:
+    """Declare warm-up tasks that must finish before the process is ready."""
+    with _lock:
+        _pending.update(names)
+
+
+def run_warmup(tasks: list) -> threading.Thread:
+    """
+    Run [(name, fn), ...] in a background thread, each as a phase, then mark
+    the process ready and log the report. A failing task is recorded in the
+    report and does not block readiness.
+    """
+    expect(*(name for name, _ in tasks))
+
+    def _run():
+        for name, fn in tasks:
+            try:
+                with phase(name):
+                    fn()
+            except Exception:
+                logger.exception("Startup warm-up '%s' failed", name)
+            finally:
+                with _lock:
+                    _pending.discard(name)
+        mark_ready()
+
+    thread = threading.Thread(target=_run, name="startup-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def mark_ready() -> None:
+    global _ready_at
+    if _ready.is_set():
+        return
+    _ready_at = time.perf_counter()
+    _ready.set()
+    logger.info("startup report %s", json.dumps(report()))
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def pending() -> list:
+    with _lock:
+        return sorted(_pending)
+
+
+def report() -> dict:
+    with _lock:
+        phases = list(_phases)
+    return {
+        "ready":             _ready.is_set(),
+        "pending":           pending(),
+        "process_started":   time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(PROCESS_STARTED)),
+        "before_startup_s":  round(max(_IMPORTED_AT - PROCESS_STARTED, 0.0), 3),
+        "seconds_to_ready":  round(_ready_at - _T0, 4) if _ready_at is not None else None,
+        "uptime_seconds":    round(time.perf_counter() - _T0, 1),
+        "rss_mb":            round(rss_bytes() / 2**20, 1),
+        "peak_rss_mb":       round(peak_rss_bytes() / 2**20, 1),
+        "phases":            sorted(phases, key=lambda p: p["started_s"]),
+    }
+
+
+def _startup_families():
+    with _lock:
+        phases = list(_phases)
+    yield ("shopmind_ready", "gauge", "1 once startup precomputes and warm-up have finished.",
+           [({}, int(_ready.is_set()))])
+    yield ("shopmind_startup_phase_seconds", "gauge", "Wall time of each startup phase.",
+           [({"phase": p["name"]}, p["seconds"]) for p in phases])
+
+
+metrics.register_collector("startup", _startup_families)
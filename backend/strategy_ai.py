@@ -1,12 +1,16 @@
 import os
+import time
 import requests
 import json
+import metrics
+from profiling import phase
 from dotenv import load_dotenv
 from schemas import StrategyOutput
 
 load_dotenv() 
 
-API_URL = "https://router.huggingface.co/v1/chat/completions"
+# Overridable so load tests can point at benchmarks/stub_llm.py
+API_URL = os.getenv("HF_API_URL", "https://router.huggingface.co/v1/chat/completions")
 headers = {
     "Authorization": f"Bearer {os.getenv('HF_TOKEN')}",
     "Content-Type": "application/json"
@@ -72,7 +76,14 @@ Respond in structured bullet format.
         "max_tokens": 600
     }
 
-    response = requests.post(API_URL, headers=headers, json=payload)
+    t0 = time.perf_counter()
+    try:
+        with phase("llm"):
+            response = requests.post(API_URL, headers=headers, json=payload)
+    except Exception:
+        metrics.observe_llm("strategy", time.perf_counter() - t0, False)
+        raise
+    metrics.observe_llm("strategy", time.perf_counter() - t0, response.status_code == 200)
     result = response.json()
 
     try:
@@ -0,0 +1,64 @@
+"""
+Per-worker memory under serve.py: workers attached to the shared snapshot must
+not hold their own copy of the dataset, so their memory stays flat as it grows.
+
+Starts `serve.py --workers 2` on two synthetic datasets
+(SHOPMIND_TEST_WORKER_ROWS, default 100k and 500k rows), touches the
+data-heavy endpoints, and asserts every worker's private resident memory
+(USS: the part of RSS not shared with the other workers) grows by at most
+SHOPMIND_TEST_MAX_USS_GROWTH_MB from the smaller to the larger dataset. The
+comparison is between runs on the same machine, so no absolute bound is
+needed. Snapshot workers measure ~148 MB at both sizes; an aggregate
+unpickled onto the heap instead of mapped (the customer KD-tree) made them
+grow ~41 MB. Reuses benchmarks/bench_workers.py for the launch and /proc
+accounting.
+
+    cd backend && python -m pytest -q tests/test_worker_memory.py
+"""
+
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(_BACKEND, "benchmarks"))
+
+ROWS        = sorted(int(n) for n in os.getenv("SHOPMIND_TEST_WORKER_ROWS", "100000,500000").split(","))
+WORKERS     = 2
+MAX_GROWTH_MB = float(os.getenv("SHOPMIND_TEST_MAX_USS_GROWTH_MB", "16"))
+TIMEOUT_S   = float(os.getenv("SHOPMIND_TEST_WORKER_TIMEOUT_S", "900"))
+
+
+def _multiprocessing_unavailable():
+    """Why worker processes cannot run here, or None."""
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return "per-process memory accounting needs Linux /proc/<pid>/smaps_rollup"
+    try:
+        multiprocessing.get_context("spawn").Lock()
+    except (OSError, ImportError) as e:
+        return f"multiprocessing is unavailable ({e})"
+    return None
+
+
+@pytest.mark.skipif(_multiprocessing_unavailable() is not None, reason=str(_multiprocessing_unavailable()))
+def test_snapshot_workers_share_the_dataset():
+    pytest.importorskip("httpx")
+    pytest.importorskip("uvicorn")
+    import bench_workers
+
+    uss = {}
+    for rows in (ROWS[0], ROWS[-1]):
+        try:
+            result = bench_workers.measure("snapshot", bench_workers._dataset_for(rows), WORKERS, TIMEOUT_S)
+        except SystemExit as e:
+            pytest.fail(f"serve.py did not come up on {rows:,} rows: {e}")
+        assert result["workers"] == WORKERS
+        uss[rows] = result["max_uss_mb"]
+
+    growth = uss[ROWS[-1]] - uss[ROWS[0]]
+    assert growth <= MAX_GROWTH_MB, (
+        f"snapshot worker USS grew {growth:.1f} MB ({uss[ROWS[0]]} -> {uss[ROWS[-1]]} MB) "
+        f"from {ROWS[0]:,} to {ROWS[-1]:,} rows; tolerance {MAX_GROWTH_MB} MB"
+    )
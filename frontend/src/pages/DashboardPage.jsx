@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { api } from '../utils/api';
-import { SEG_COLORS, TOOLTIP_STYLE, GRID_COLOR, AXIS_COLOR, fmtCurrency } from '../utils/chartConfig';
+import { SEG_COLORS, SEG_META, TOOLTIP_STYLE, GRID_COLOR, AXIS_COLOR, fmtCurrency } from '../utils/chartConfig';
 import {
   BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer,
   ScatterChart, Scatter, Cell, PieChart, Pie, Legend,
@@ -10,9 +10,15 @@ import './DashboardPage.css';
 
 const PRIORITY = { premium: 1, loyal: 2, occasional: 3, discount: 4 };
 
+// "PC1 (Previous Purchases · Age)" from the projection's top loadings
+const axisLabel = (axis, name) =>
+  axis ? `${axis.name} (${axis.top_features.slice(0, 2).map(f => f.feature).join(' · ')})` : name;
+
 export default function DashboardPage() {
   const [segments, setSegments] = useState(null);
   const [projection, setProjection] = useState(null);
+  const [projPoints, setProjPoints] = useState([]);
+  const [projAxes, setProjAxes] = useState([]);
   const [metrics, setMetrics] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -26,6 +32,8 @@ export default function DashboardPage() {
         );
         setSegments(sorted);
         setProjection(projData.projections || []);
+        setProjPoints(projData.points || []);
+        setProjAxes(projData.axes || []);
         setMetrics(metricsData);
         setError(null);
       })
@@ -142,16 +150,24 @@ export default function DashboardPage() {
         <div className="card" style={{ marginBottom: '1.75rem' }}>
           <div className="chart-header">
             <h3>Segment Cluster Projection (PCA 2D)</h3>
-            <span className="chart-note">Principal Component Analysis — PC1: spending/frequency, PC2: discount/loyalty axes</span>
+            <span className="chart-note">
+              Principal Component Analysis — {projPoints.length.toLocaleString()} sampled customers, segment centroids enlarged
+            </span>
           </div>
           <ResponsiveContainer width="100%" height={260}>
             <ScatterChart margin={{ top: 16, right: 24, bottom: 16, left: 16 }}>
               <CartesianGrid strokeDasharray="3 3" stroke={GRID_COLOR} />
-              <XAxis dataKey="x" type="number" name="PC1" stroke={AXIS_COLOR} tick={{ fontSize: 11 }} label={{ value: 'PC1 (Spend · Frequency)', position: 'insideBottomRight', fill: AXIS_COLOR, fontSize: 11, dy: 12 }} />
-              <YAxis dataKey="y" type="number" name="PC2" stroke={AXIS_COLOR} tick={{ fontSize: 11 }} label={{ value: 'PC2 (Discount · Loyalty)', angle: -90, position: 'insideLeft', fill: AXIS_COLOR, fontSize: 11 }} />
+              <XAxis dataKey="x" type="number" name="PC1" stroke={AXIS_COLOR} tick={{ fontSize: 11 }} label={{ value: axisLabel(projAxes[0], 'PC1'), position: 'insideBottomRight', fill: AXIS_COLOR, fontSize: 11, dy: 12 }} />
+              <YAxis dataKey="y" type="number" name="PC2" stroke={AXIS_COLOR} tick={{ fontSize: 11 }} label={{ value: axisLabel(projAxes[1], 'PC2'), angle: -90, position: 'insideLeft', fill: AXIS_COLOR, fontSize: 11 }} />
               <Tooltip contentStyle={TOOLTIP_STYLE} labelFormatter={(_, p) => p?.[0]?.payload?.label || ''} formatter={(v, n) => [v?.toFixed(3), n]} />
+              {projPoints.length > 0 && (
+                <Scatter data={projPoints} isAnimationActive={false} fillOpacity={0.35}
+                  shape={({ cx, cy, fill }) => <circle cx={cx} cy={cy} r={2} fill={fill} />}>
+                  {projPoints.map((p, i) => <Cell key={i} fill={SEG_META[p.segment]?.color} />)}
+                </Scatter>
+              )}
               <Scatter data={projection} shape="circle">
-                {projection.map((p, i) => <Cell key={i} fill={p.color} />)}
+                {projection.map((p, i) => <Cell key={i} fill={p.color} stroke="#fff" strokeWidth={2} />)}
               </Scatter>
             </ScatterChart>
           </ResponsiveContainer>